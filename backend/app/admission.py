@@ -0,0 +1,164 @@
+"""
+NeoBI Admission Control
+/api/chat/message için global ve kullanıcı bazlı eşzamanlılık sınırı.
+
+- Aynı anda en fazla GLOBAL_LIMIT turn çalışır, bir kullanıcı en fazla PER_USER_LIMIT
+- Limit doluysa istek adil (round-robin) bir kuyruğa girer: boşalan slot sırayla
+  farklı kullanıcılara verilir, tek bir kullanıcının burst'ü diğerlerini bekletmez
+- Kuyruk doluysa veya bekleme süresi aşılırsa hemen Retry-After ile reddedilir
+"""
+
+import os
+import time
+import math
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_GLOBAL_LIMIT = int(os.getenv("NEOBI_ADMISSION_GLOBAL_LIMIT", "16"))
+ADMISSION_PER_USER_LIMIT = int(os.getenv("NEOBI_ADMISSION_PER_USER_LIMIT", "2"))
+ADMISSION_MAX_QUEUE = int(os.getenv("NEOBI_ADMISSION_MAX_QUEUE", "64"))
+ADMISSION_MAX_WAIT = float(os.getenv("NEOBI_ADMISSION_MAX_WAIT", "10"))
+
+
+class AdmissionRejected(Exception):
+    """İstek kabul edilmedi; retry_after saniye sonra tekrar denenebilir."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+def user_key_for(token: str = None, client_host: str = None) -> str:
+    """Kullanıcı anahtarı: token'ın hash'i, token yoksa istemci IP'si."""
+    if token:
+        return "token:" + hashlib.sha256(token.encode()).hexdigest()[:16]
+    return f"ip:{client_host or 'unknown'}"
+
+
+class AdmissionController:
+    """Global + kullanıcı bazlı slot yöneticisi, adil kuyruklu."""
+
+    def __init__(self, global_limit: int = ADMISSION_GLOBAL_LIMIT, per_user_limit: int = ADMISSION_PER_USER_LIMIT,
+                 max_queue: int = ADMISSION_MAX_QUEUE, max_wait: float = ADMISSION_MAX_WAIT):
+        self.global_limit = global_limit
+        self.per_user_limit = per_user_limit
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._active_total = 0
+        self._active = {}             # user_key -> çalışan istek sayısı
+        self._queues = OrderedDict()  # user_key -> deque[Future], round-robin sırası
+        self._queued = 0
+        self._avg_duration = 5.0      # Turn süresinin hareketli ortalaması (Retry-After tahmini için)
+        self.rejected = 0
+
+    @asynccontextmanager
+    async def slot(self, user_key: str):
+        """Slot alır, blok bitince bırakır. Alınamazsa AdmissionRejected fırlatır."""
+        await self.acquire(user_key)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._avg_duration = 0.9 * self._avg_duration + 0.1 * (time.monotonic() - started)
+            self.release(user_key)
+
+    async def acquire(self, user_key: str):
+        if user_key not in self._queues and self._has_capacity(user_key):
+            self._grant(user_key)
+            return
+
+        if self._queued >= self.max_queue:
+            self._reject(user_key)
+
+        fut = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(user_key, deque()).append(fut)
+        self._queued += 1
+        try:
+            await asyncio.wait({fut}, timeout=self.max_wait)
+        except asyncio.CancelledError:
+            # İstek iptal edildi: slot verildiyse geri bırak, verilmediyse kuyruktan çık
+            if fut.done():
+                self.release(user_key)
+            else:
+                fut.cancel()
+                self._remove_waiter(user_key, fut)
+            raise
+        if not fut.done():
+            fut.cancel()
+            self._remove_waiter(user_key, fut)
+            self._reject(user_key)
+
+    def release(self, user_key: str):
+        self._active_total -= 1
+        count = self._active.get(user_key, 0) - 1
+        if count <= 0:
+            self._active.pop(user_key, None)
+        else:
+            self._active[user_key] = count
+        self._dispatch()
+
+    def stats(self) -> dict:
+        return {
+            "active": self._active_total,
+            "queued": self._queued,
+            "users_active": len(self._active),
+            "users_queued": len(self._queues),
+            "rejected": self.rejected,
+        }
+
+    def _has_capacity(self, user_key: str) -> bool:
+        return (self._active_total < self.global_limit
+                and self._active.get(user_key, 0) < self.per_user_limit)
+
+    def _grant(self, user_key: str):
+        self._active_total += 1
+        self._active[user_key] = self._active.get(user_key, 0) + 1
+
+    def _dispatch(self):
+        """Boş slotları kuyruktaki kullanıcılara round-robin sırayla dağıtır."""
+        progress = True
+        while progress and self._active_total < self.global_limit:
+            progress = False
+            for user_key in list(self._queues):
+                if self._active_total >= self.global_limit:
+                    break
+                if not self._has_capacity(user_key):
+                    continue
+                waiters = self._queues[user_key]
+                fut = waiters.popleft()
+                self._queued -= 1
+                if waiters:
+                    self._queues.move_to_end(user_key)
+                else:
+                    del self._queues[user_key]
+                self._grant(user_key)
+                fut.set_result(None)
+                progress = True
+
+    def _remove_waiter(self, user_key: str, fut):
+        waiters = self._queues.get(user_key)
+        if waiters is None:
+            return
+        try:
+            waiters.remove(fut)
+            self._queued -= 1
+        except ValueError:
+            return
+        if not waiters:
+            del self._queues[user_key]
+
+    def _reject(self, user_key: str):
+        self.rejected += 1
+        # Kuyruğun boşalması için gereken yaklaşık süre
+        retry_after = max(1, math.ceil(self._avg_duration * (self._queued + 1) / max(1, self.global_limit)))
+        logger.warning("Admission rejected for %s (queued: %d, retry after %ds)", user_key, self._queued, retry_after)
+        raise AdmissionRejected(retry_after)
+
+
+# Singleton instance
+admission_controller = AdmissionController()
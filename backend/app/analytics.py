@@ -0,0 +1,267 @@
+"""
+NeoBI Analytics
+Tool'ların ve /api/analytics/* endpoint'lerinin ortak hesaplama fonksiyonları.
+
+Her fonksiyon (sonuç, kaynak) döndürür. Kaynak, eskilik (stale) uyarısı için
+tool'larda _dumps'a, endpoint'lerde yanıttaki `stale` alanına verilir. Veriler
+bellekteki ürün kataloğu, müşteri indeksi, müşteri istatistikleri ve yerel günlük
+satış geçmişinden (sales_history) gelir; NeoOne'a sadece bu cache'lerin süresi
+dolduğunda gidilir.
+"""
+
+import os
+from datetime import date, timedelta
+
+from .product_catalog import get_product_catalog
+from .customer_index import get_customer_index, normalize_key
+from .customer_stats import customer_stats
+from .sales_history import sales_history
+
+
+def top_bottom_products(limit: int = 3, order: str = "asc") -> tuple:
+    """Satış adedine göre en az (asc) veya en çok (desc) satan ürünler."""
+    catalog = get_product_catalog()
+    ranked = catalog.ranked_by_quantity()
+    if order == "desc":
+        selected = ranked[max(len(ranked) - limit, 0):][::-1]
+    else:
+        selected = ranked[:limit]
+    result = [p.to_dict(("id", "name", "code", "category", "quantity_sold", "total_revenue")) for p in selected]
+    return result, catalog.source
+
+
+def low_selling_products(threshold: int = 100) -> tuple:
+    """Satış adedi eşiğin altındaki ürünler, en az satandan başlayarak."""
+    catalog = get_product_catalog()
+    result = [p.to_dict(("id", "name", "code", "category", "quantity_sold")) for p in catalog.below_quantity(threshold)]
+    return result, catalog.source
+
+
+def customer_counts(group_by: str = None) -> tuple:
+    """Toplam müşteri sayısı; group_by='group' ise müşteri grubu dağılımı ile."""
+    total_count, group_counts = customer_stats.counts()
+    result = {"total_customers": total_count}
+    if group_by == "group":
+        result["by_group"] = [{"group_name": k, "count": v}
+                              for k, v in sorted(group_counts.items(), key=lambda x: x[1], reverse=True)]
+    return result, customer_stats
+
+
+def customer_performance(customer_group_name: str = None, city: str = None, district: str = None,
+                         order_by: str = "revenue_desc", limit: int = 10) -> tuple:
+    """Ciroya göre sıralı müşteriler; şehir, ilçe ve müşteri grubu filtreli."""
+    index = get_customer_index()
+    customers = index.query(
+        city=city,
+        district=district,
+        customer_group=customer_group_name,
+        descending=(order_by == "revenue_desc"),
+        limit=limit,
+    )
+    return [c.to_tool_dict() for c in customers], index.source
+
+
+# ==================== DISCOUNT LIFT ====================
+
+LIFT_NOTE = ("Satış raporunda müşteri grubu kırılımı olmadığı için değerler ürünün tüm müşterilerdeki "
+             "satışıdır; hedef grubun payı ayrıca gösterilemez.")
+LIFT_METRICS = ("quantity", "revenue")
+HISTORY_LOADING = "Günlük satış geçmişi henüz yükleniyor, lütfen birkaç dakika sonra tekrar deneyin."
+
+
+def _parse_day(value):
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+
+def _change_pct(current: float, baseline: float):
+    return round((current - baseline) / baseline * 100, 1) if baseline else None
+
+
+def _lift_row(matrix, product_id, window: tuple, baseline: tuple) -> dict:
+    qty, rev = matrix.window(product_id, *window)
+    base_qty, base_rev = matrix.window(product_id, *baseline)
+    return {
+        "product_id": product_id,
+        "product_name": matrix.product_name(product_id),
+        "discount_quantity": qty,
+        "baseline_quantity": base_qty,
+        "quantity_change": qty - base_qty,
+        "quantity_lift_pct": _change_pct(qty, base_qty),
+        "discount_revenue": round(rev, 2),
+        "baseline_revenue": round(base_rev, 2),
+        "revenue_change": round(rev - base_rev, 2),
+        "revenue_lift_pct": _change_pct(rev, base_rev),
+    }
+
+
+def _discount_lift(matrix, discount: dict) -> dict:
+    """Tek iskonto için iskonto penceresi vs. hemen önceki eşit uzunluktaki baz pencere."""
+    start, end = _parse_day(discount.get("startDate")), _parse_day(discount.get("endDate"))
+    result = {
+        "discount_id": discount.get("id"),
+        "name": discount.get("name"),
+        "discount_percent": discount.get("discountPercent"),
+        "customer_group_ids": [t.get("customerGroupId") for t in discount.get("discountTargets") or []
+                               if t.get("customerGroupId") is not None],
+        "is_active": discount.get("isActive"),
+    }
+    if start is None:
+        return dict(result, status="no_dates")
+    last = min(end or matrix.end, matrix.end)
+    if last < start:
+        return dict(result, status="not_started" if start > matrix.end else "no_history")
+
+    length = (last - start).days + 1
+    window = (start, last)
+    baseline = (start - timedelta(days=length), start - timedelta(days=1))
+    product_ids = [p.get("productId") for p in discount.get("discountProducts") or []
+                   if p.get("productId") is not None]
+    products = [_lift_row(matrix, pid, window, baseline) for pid in product_ids]
+    qty = sum(p["discount_quantity"] for p in products)
+    base_qty = sum(p["baseline_quantity"] for p in products)
+    rev = sum(p["discount_revenue"] for p in products)
+    base_rev = sum(p["baseline_revenue"] for p in products)
+    return dict(
+        result,
+        status="ok",
+        discount_window={"start": start.isoformat(), "end": last.isoformat(), "days": length,
+                         "coverage": round(matrix.coverage(*window), 2)},
+        baseline_window={"start": baseline[0].isoformat(), "end": baseline[1].isoformat(), "days": length,
+                         "coverage": round(matrix.coverage(*baseline), 2)},
+        products=products,
+        total={
+            "quantity_change": qty - base_qty,
+            "quantity_lift_pct": _change_pct(qty, base_qty),
+            "revenue_change": round(rev - base_rev, 2),
+            "revenue_lift_pct": _change_pct(rev, base_rev),
+        },
+    )
+
+
+def discount_lift(discount: dict) -> tuple:
+    """İskontonun satış etkisi (adet/ciro değişimi), yerel günlük satış geçmişinden."""
+    matrix = sales_history.matrix()
+    if not matrix.synced_days:
+        return {"error": HISTORY_LOADING}, matrix
+    return dict(_discount_lift(matrix, discount), note=LIFT_NOTE), matrix
+
+
+def rank_discount_lift(discounts: list, metric: str = "quantity", limit: int = 10, order: str = "desc") -> tuple:
+    """İskontoları tek geçişte lift'e göre sıralar. Lift'i hesaplanamayanlar sonda listelenir."""
+    if metric not in LIFT_METRICS:
+        metric = "quantity"
+    matrix = sales_history.matrix()
+    if not matrix.synced_days:
+        return {"error": HISTORY_LOADING}, matrix
+    key = f"{metric}_lift_pct"
+    lifts = [_discount_lift(matrix, d) for d in discounts]
+    ranked = sorted((l for l in lifts if l.get("total", {}).get(key) is not None),
+                    key=lambda l: l["total"][key], reverse=(order != "asc"))
+    unranked = [l for l in lifts if l.get("total", {}).get(key) is None]
+    compact = [{k: v for k, v in l.items() if k != "products"} for l in (ranked + unranked)[:limit]]
+    return {"metric": metric, "discount_count": len(lifts), "discounts": compact, "note": LIFT_NOTE}, matrix
+
+
+# ==================== TRENDS ====================
+
+# Değişim bu yüzdenin altına düştüğünde düşüş işaretlenir
+TREND_DECLINE_PCT = float(os.getenv("NEOBI_TREND_DECLINE_PCT", "20"))
+# Önceki 30 günde bundan az satan ürünler gürültü sayılır, işaretlenmez
+TREND_MIN_QUANTITY = float(os.getenv("NEOBI_TREND_MIN_QUANTITY", "10"))
+TREND_DIRECTIONS = ("declining", "rising", "all")
+TREND_PERIODS = {"wow": "wow_change_pct", "mom": "mom_change_pct"}
+TREND_NOTE = ("Trendler tüm müşterilerdeki günlük satışlardan hesaplanır; satış raporunda müşteri grubu "
+              "kırılımı olmadığı için grup bazında trend verilemez. Son gün dündür.")
+
+_trend_cache = (None, None)  # (matris, satırlar) - matris günde bir (veya veri değişince) yenilenir
+
+
+def _trend_rows(matrix) -> list:
+    """Tüm ürünler için WoW / MoM değişimi, hareketli ortalamalar ve düşüş işaretleri, tek geçişte."""
+    end = matrix.end
+
+    def column(first_day: int, last_day: int):
+        # Son günden geriye doğru gün aralığı: 0 = dün
+        return matrix.column(end - timedelta(days=last_day), end - timedelta(days=first_day))
+
+    last7, _ = column(0, 6)
+    prev7, _ = column(7, 13)
+    last28, _ = column(0, 27)
+    last30, last30_rev = column(0, 29)
+    prev30, prev30_rev = column(30, 59)
+
+    rows = []
+    for i, product_id in enumerate(matrix.product_ids):
+        if not (last30[i] or prev30[i]):
+            continue
+        info = matrix.products.get(product_id) or {}
+        wow = _change_pct(last7[i], prev7[i])
+        mom = _change_pct(last30[i], prev30[i])
+        ma7, ma28 = last7[i] / 7, last28[i] / 28
+        flags = []
+        if prev30[i] >= TREND_MIN_QUANTITY:
+            if wow is not None and wow <= -TREND_DECLINE_PCT:
+                flags.append("wow_decline")
+            if mom is not None and mom <= -TREND_DECLINE_PCT:
+                flags.append("mom_decline")
+            if ma7 < ma28 * (1 - TREND_DECLINE_PCT / 100):
+                flags.append("below_ma28")
+            if prev7[i] and not last7[i]:
+                flags.append("stopped")
+        rows.append({
+            "product_id": product_id,
+            "product_name": info.get("name") or f"Ürün {product_id}",
+            "category": info.get("category"),
+            "last_7_days": last7[i],
+            "previous_7_days": prev7[i],
+            "wow_change_pct": wow,
+            "last_30_days": last30[i],
+            "previous_30_days": prev30[i],
+            "mom_change_pct": mom,
+            "last_30_days_revenue": round(last30_rev[i], 2),
+            "mom_revenue_change_pct": _change_pct(last30_rev[i], prev30_rev[i]),
+            "moving_avg_7": round(ma7, 2),
+            "moving_avg_28": round(ma28, 2),
+            "flags": flags,
+            "declining": "mom_decline" in flags or "stopped" in flags or
+                         ("wow_decline" in flags and "below_ma28" in flags),
+        })
+    return rows
+
+
+def product_trends(direction: str = "declining", period: str = "mom", category: str = None,
+                   limit: int = 20) -> tuple:
+    """Dönemsel satış trendleri; declining: düşüşteki ürünler, rising: yükselenler."""
+    global _trend_cache
+    matrix = sales_history.matrix()
+    if not matrix.synced_days:
+        return {"error": HISTORY_LOADING}, matrix
+    cached_matrix, rows = _trend_cache
+    if cached_matrix is not matrix:
+        rows = _trend_rows(matrix)
+        _trend_cache = (matrix, rows)
+
+    key = TREND_PERIODS.get(period, "mom_change_pct")
+    selected = rows
+    if category:
+        wanted = normalize_key(category)
+        selected = [r for r in selected if wanted in normalize_key(r["category"] or "")]
+    if direction == "declining":
+        selected = [r for r in selected if r["declining"]]
+    elif direction == "rising":
+        selected = [r for r in selected if r[key] is not None and r[key] > 0]
+    ranked = sorted((r for r in selected if r[key] is not None), key=lambda r: r[key],
+                    reverse=(direction == "rising"))
+    ranked += [r for r in selected if r[key] is None]
+    return {
+        "as_of": matrix.end.isoformat(),
+        "coverage_60_days": round(matrix.coverage(matrix.end - timedelta(days=59), matrix.end), 2),
+        "matching_products": len(selected),
+        "products": ranked[:limit],
+        "note": TREND_NOTE,
+    }, matrix
@@ -4,15 +4,87 @@ Gerçek NeoOne sistemine bağlantı için HTTP istemcisi.
 """
 
 import os
+import hashlib
+import logging
+import tempfile
+import threading
 import requests
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
+from .logging_config import log_payload
+from .resilience import CircuitBreaker, CircuitOpenError, call_with_retries, hedged_call
+from .json_stream import iter_json_array
+from .records import ProductSaleRecord, CustomerRecord, CustomerPerformanceRecord
+from .jwt_auth import token_verifier
+from .shared_cache import shared_cache
 
 load_dotenv()
 
-# Token doğrulama cache'i (token -> (is_valid, expiry_time))
-_token_validation_cache = {}
+logger = logging.getLogger(__name__)
+
+# Token doğrulama sonuçları paylaşımlı cache'te (bkz. shared_cache) token hash'i ile tutulur
 TOKEN_CACHE_DURATION = timedelta(minutes=10)  # 10 dakika cache
+# NeoOne servis hesabı token'ının geçerli sayıldığı süre (güvenlik marjı ile)
+SERVICE_TOKEN_DURATION = timedelta(minutes=55)
+# Yerelde doğrulanamayan token'lar için NeoOne /Users kontrolü
+TOKEN_REMOTE_FALLBACK = os.getenv("NEOONE_TOKEN_REMOTE_FALLBACK", "true").lower() == "true"
+
+# Veri okuma istekleri için timeout (saniye)
+NEOONE_TIMEOUT = float(os.getenv("NEOONE_TIMEOUT", "30"))
+# Büyük raporlar akış halinde bu boyutta parçalarla okunur
+STREAM_CHUNK_SIZE = 64 * 1024
+# previous ile yapılan isteklerde gövde özeti çıkarılırken bu boyuta kadar bellekte, üstü geçici dosyada tutulur
+SPOOL_MAX_MEMORY = 4 * 1024 * 1024
+
+
+class StaleList(list):
+    """
+    NeoOne erişilemezken son başarılı yanıttan dönen veri.
+    Tool'lar `stale` alanına bakarak modele verinin güncel olmadığını bildirir.
+    """
+    stale = True
+
+    def __init__(self, items, fetched_at: datetime):
+        super().__init__(items)
+        self.fetched_at = fetched_at
+
+
+class RecordList(list):
+    """
+    Akış halinde okunan rapor kayıtları. `digest`, okunan gövde baytlarının SHA-256
+    özetidir; değişiklik tespiti için kullanılır (aynı özet = aynı veri). `etag` ve
+    `last_modified` upstream gönderdiyse bir sonraki koşullu istek için tutulur.
+
+    not_modified=True: Veri `previous` ile gönderilen sürümden farklı değil; liste boştur.
+    """
+    stale = False
+
+    def __init__(self, items, digest: str, etag: str = None, last_modified: str = None,
+                 not_modified: bool = False):
+        super().__init__(items)
+        self.digest = digest
+        self.etag = etag
+        self.last_modified = last_modified
+        self.not_modified = not_modified
+
+    @property
+    def validators(self) -> dict:
+        """Bir sonraki _get(previous=...) çağrısı için sürüm bilgisi."""
+        return {"digest": self.digest, "etag": self.etag, "last_modified": self.last_modified}
+
+
+def _success_data(data) -> list:
+    """{"success": true, "data": [...]} formatındaki yanıttan listeyi çıkarır."""
+    if isinstance(data, dict) and data.get("success"):
+        return data.get("data", [])
+    return []
+
+def _hashed(chunks, digest):
+    """Chunk'ları değiştirmeden geçirirken özete ekler."""
+    for chunk in chunks:
+        digest.update(chunk)
+        yield chunk
+
 
 class NeoOneClient:
     """NeoOne API ile iletişim kuran istemci sınıfı."""
@@ -23,14 +95,25 @@ class NeoOneClient:
         self.password = os.getenv("NEOONE_PASSWORD")
         self._token = None
         self._token_expiry = None
+        # Endpoint bazlı circuit breaker'lar ve son başarılı yanıtlar
+        self._breakers = {}
+        self._last_good = {}  # path -> (params, data, fetched_at); endpoint başına son yanıt
+        self._resilience_lock = threading.Lock()
     
     def _get_token(self) -> str:
-        """Token al veya cache'den döndür."""
+        """Token al veya cache'den döndür. Login tüm worker'lar arasında tek seferde yapılır."""
         # Token hala geçerliyse cache'den dön
         if self._token and self._token_expiry and datetime.now() < self._token_expiry:
             return self._token
         
-        # Yeni token al
+        login = shared_cache.get_or_set("neoone:service_token", self._login,
+                                        ttl=SERVICE_TOKEN_DURATION.total_seconds())
+        self._token = login["token"]
+        self._token_expiry = datetime.fromtimestamp(login["expires_at"])
+        return self._token
+    
+    def _login(self) -> dict:
+        """Yeni token al."""
         response = requests.post(
             f"{self.base_url}/Auth/login",
             json={"email": self.email, "password": self.password},
@@ -39,12 +122,10 @@ class NeoOneClient:
         response.raise_for_status()
         
         data = response.json()
-        self._token = data.get("token")
+        logger.info("Yeni token alındı")
         # Token'ı 55 dakika geçerli say (güvenlik marjı)
-        self._token_expiry = datetime.now() + timedelta(minutes=55)
-        
-        print(f"DEBUG: Yeni token alındı")
-        return self._token
+        return {"token": data.get("token"),
+                "expires_at": (datetime.now() + SERVICE_TOKEN_DURATION).timestamp()}
     
     def _headers(self) -> dict:
         """Authorization header'ı ile request headers döndür."""
@@ -53,103 +134,198 @@ class NeoOneClient:
             "Content-Type": "application/json"
         }
     
+    def _breaker(self, path: str) -> CircuitBreaker:
+        with self._resilience_lock:
+            if path not in self._breakers:
+                self._breakers[path] = CircuitBreaker(path)
+            return self._breakers[path]
+
+    def _get(self, path: str, extract=_success_data, params: dict = None,
+             record_type=None, item_path=("data",), remember: bool = True, previous: dict = None) -> list:
+        """
+        Dayanıklı GET isteği.
+        - Endpoint bazlı circuit breaker: devre açıkken upstream'e gidilmez
+        - Tekrar denenebilir hatalarda jitter'lı backoff ile retry
+        - Yavaş isteklerde hedged (paralel ikinci) istek; akışlı okumada sadece header'lar beklenirken
+        - Hata veya açık devre durumunda aynı parametrelerle alınmış son başarılı veri StaleList olarak döner
+
+        record_type verilirse gövde akış halinde okunur: item_path'teki dizinin her
+        elemanı gelir gelmez record_type.from_dict ile kompakt kayda çevrilir,
+        gövdenin tamamı ve dict listesi hiçbir zaman bellekte tutulmaz.
+
+        remember=False: Yanıt stale yedeği olarak tutulmaz (ör. geçmiş senkronizasyonunun
+        gün gün istekleri); hata durumunda doğrudan yükseltilir.
+
+        previous (record_type ile): Önceki yanıtın RecordList.validators'ı. ETag /
+        Last-Modified varsa koşullu istek gönderilir (304 = değişmedi); yoksa gövde
+        önce özetlenir ve özet aynıysa kayıtlar hiç oluşturulmadan not_modified döner.
+        """
+        params_key = tuple(sorted((params or {}).items()))
+        breaker = self._breaker(path)
+
+        def fetch():
+            response = requests.get(
+                f"{self.base_url}{path}",
+                headers=self._headers(),
+                params=params,
+                timeout=NEOONE_TIMEOUT
+            )
+            response.raise_for_status()
+            return extract(response.json())
+
+        conditional = {}
+        if previous:
+            if previous.get("etag"):
+                conditional["If-None-Match"] = previous["etag"]
+            if previous.get("last_modified"):
+                conditional["If-Modified-Since"] = previous["last_modified"]
+
+        def open_stream():
+            response = requests.get(
+                f"{self.base_url}{path}",
+                headers={**self._headers(), **conditional},
+                params=params,
+                timeout=NEOONE_TIMEOUT,
+                stream=True
+            )
+            try:
+                response.raise_for_status()
+            except Exception:
+                response.close()
+                raise
+            return response
+
+        def fetch_records():
+            # Sadece header'lara kadar olan süre hedge edilir; gövde tek bağlantıdan okunur
+            response = hedged_call(open_stream, discard=lambda r: r.close())
+            with response:
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
+                if response.status_code == 304:
+                    return RecordList([], previous["digest"], etag or previous.get("etag"),
+                                      last_modified or previous.get("last_modified"), not_modified=True)
+                digest = hashlib.sha256()
+                if not previous or not previous.get("digest"):
+                    items = iter_json_array(_hashed(response.iter_content(STREAM_CHUNK_SIZE), digest), item_path)
+                    records = [record_type.from_dict(item) for item in items]
+                    return RecordList(records, digest.hexdigest(), etag, last_modified)
+                with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY) as body:
+                    for chunk in _hashed(response.iter_content(STREAM_CHUNK_SIZE), digest):
+                        body.write(chunk)
+                    if digest.hexdigest() == previous["digest"]:
+                        return RecordList([], digest.hexdigest(), etag, last_modified, not_modified=True)
+                    body.seek(0)
+                    items = iter_json_array(iter(lambda: body.read(STREAM_CHUNK_SIZE), b""), item_path)
+                    records = [record_type.from_dict(item) for item in items]
+                    return RecordList(records, digest.hexdigest(), etag, last_modified)
+
+        try:
+            if not breaker.allow():
+                raise CircuitOpenError(f"circuit open for {path}")
+            try:
+                if record_type is None:
+                    result = call_with_retries(lambda: hedged_call(fetch))
+                else:
+                    result = call_with_retries(fetch_records)
+            except Exception:
+                breaker.record_failure()
+                raise
+            breaker.record_success()
+            if remember and not getattr(result, "not_modified", False):
+                self._remember(path, params_key, result)
+            return result
+        except Exception as e:
+            last_good = self._last_good.get(path) if remember else None
+            if last_good is not None and last_good[0] == params_key:
+                _, data, fetched_at = last_good
+                logger.warning("NeoOne %s unavailable (%s), serving stale data from %s", path, e, fetched_at)
+                return StaleList(data, fetched_at)
+            raise
+
+    def _remember(self, path: str, params_key: tuple, result):
+        """Endpoint başına sadece en son başarılı yanıt tutulur (bellek sınırı)."""
+        with self._resilience_lock:
+            self._last_good[path] = (params_key, result, datetime.now())
+
+    def resilience_stats(self) -> dict:
+        """Endpoint bazlı circuit breaker durumları."""
+        with self._resilience_lock:
+            return {path: b.stats() for path, b in self._breakers.items()}
+    
     # ==================== TOKEN VALIDATION ====================
     
     def validate_user_token(self, user_token: str) -> bool:
         """
         Kullanıcının NeoOne token'ının geçerli olup olmadığını kontrol eder.
-        Cache kullanarak gereksiz API çağrılarını önler.
+        JWT'ler yapılandırılmış anahtarlarla yerelde doğrulanır (bkz. jwt_auth); diğer
+        durumlarda /Users çağrısı yapılır ve sonuç cache'lenir.
         """
-        global _token_validation_cache
-        
-        # Cache'de var mı ve hala geçerli mi kontrol et
-        if user_token in _token_validation_cache:
-            is_valid, expiry = _token_validation_cache[user_token]
-            if datetime.now() < expiry:
-                print(f"DEBUG: Token validation from cache: {is_valid}")
-                return is_valid
+        # JWT ise yerelde doğrula (imza, exp, aud); karar verilemezse uzak kontrole düş
+        local_result = token_verifier.verify(user_token)
+        if local_result is not None:
+            logger.debug("Token validation local: %s", local_result)
+            return local_result
+        if not TOKEN_REMOTE_FALLBACK:
+            logger.debug("Token could not be verified locally and remote fallback is disabled")
+            return False
         
-        # Cache'de yok veya süresi dolmuş, API'ye sor
+        # Cache'de yoksa veya süresi dolmuşsa API'ye sor (aynı token için tüm worker'larda tek istek)
+        cache_key = "token_valid:" + hashlib.sha256(user_token.encode("utf-8")).hexdigest()
         try:
-            response = requests.get(
-                f"{self.base_url}/Users",
-                headers={
-                    "Authorization": f"Bearer {user_token}",
-                    "Content-Type": "application/json"
-                },
-                timeout=5  # 5 saniye timeout
-            )
-            
-            is_valid = response.status_code == 200
-            
-            # Cache'e kaydet
-            _token_validation_cache[user_token] = (is_valid, datetime.now() + TOKEN_CACHE_DURATION)
-            
-            print(f"DEBUG: Token validation API call: {is_valid} (status: {response.status_code})")
-            return is_valid
-            
+            return shared_cache.get_or_set(cache_key, lambda: self._check_user_token(user_token),
+                                           ttl=TOKEN_CACHE_DURATION.total_seconds())
         except Exception as e:
-            print(f"ERROR: Token validation failed: {e}")
+            logger.error("Token validation failed: %s", e)
             # Hata durumunda false dön ama cache'leme
             return False
     
+    def _check_user_token(self, user_token: str) -> bool:
+        response = requests.get(
+            f"{self.base_url}/Users",
+            headers={
+                "Authorization": f"Bearer {user_token}",
+                "Content-Type": "application/json"
+            },
+            timeout=5  # 5 saniye timeout
+        )
+        
+        is_valid = response.status_code == 200
+        logger.debug("Token validation API call: %s (status: %s)", is_valid, response.status_code)
+        return is_valid
+    
     # ==================== CUSTOMER GROUPS ====================
     
     def get_customer_groups(self) -> list:
         """Müşteri gruplarını getirir."""
-        response = requests.get(
-            f"{self.base_url}/CustomerGroups",
-            headers=self._headers()
-        )
-        response.raise_for_status()
-        
-        data = response.json()
-        if data.get("success"):
-            return data.get("data", [])
-        return []
+        return self._get("/CustomerGroups")
     
     # ==================== CUSTOMERS ====================
     
-    def get_customers(self) -> list:
-        """Tüm müşterileri getirir."""
-        response = requests.get(
-            f"{self.base_url}/Customers",
-            headers=self._headers()
-        )
-        response.raise_for_status()
-        
-        data = response.json()
-        if data.get("success"):
-            return data.get("data", [])
-        # Bazen direkt liste dönebilir
-        if isinstance(data, list):
-            return data
-        return []
+    def get_customers(self, previous: dict = None) -> list:
+        """
+        Tüm müşterileri CustomerRecord listesi olarak getirir.
+        Yanıt bazen direkt liste olabilir; akış okuyucu bunu da destekler.
+
+        previous: Önceki yanıtın validators'ı; liste değişmediyse boş ve not_modified=True döner.
+        """
+        return self._get("/Customers", record_type=CustomerRecord, item_path=("data",), previous=previous)
     
     # ==================== PRODUCT GROUPS (KATEGORİLER) ====================
     
     def get_product_groups(self) -> list:
         """Ürün gruplarını (kategorileri) getirir."""
-        response = requests.get(
-            f"{self.base_url}/ProductGroups",
-            headers=self._headers()
-        )
-        response.raise_for_status()
-        
-        data = response.json()
-        if data.get("success"):
-            return data.get("data", [])
-        return []
+        return self._get("/ProductGroups")
     
     # ==================== PRODUCT SALES ====================
     
-    def get_product_sales(self, start_date: str = None, end_date: str = None) -> list:
+    def get_product_sales(self, start_date: str = None, end_date: str = None, remember: bool = True) -> list:
         """
-        Ürün satış raporunu getirir.
+        Ürün satış raporunu ProductSaleRecord listesi olarak getirir.
         
         Args:
             start_date: Başlangıç tarihi (YYYY-MM-DD)
             end_date: Bitiş tarihi (YYYY-MM-DD)
+            remember: False ise yanıt stale yedeği olarak tutulmaz
         """
         params = {}
         if start_date:
@@ -157,17 +333,8 @@ class NeoOneClient:
         if end_date:
             params["endDate"] = end_date
         
-        response = requests.get(
-            f"{self.base_url}/orders/reports/product-sales",
-            headers=self._headers(),
-            params=params
-        )
-        response.raise_for_status()
-        
-        data = response.json()
-        if data.get("success"):
-            return data.get("data", {}).get("data", [])
-        return []
+        return self._get("/orders/reports/product-sales", params=params,
+                         record_type=ProductSaleRecord, item_path=("data", "data"), remember=remember)
     
     # ==================== DISCOUNTS ====================
     
@@ -212,12 +379,13 @@ class NeoOneClient:
             ]
         }
         
-        print(f"DEBUG: Discount API'ye gönderilen veri: {discount_data}")
+        log_payload(logger, "Discount API'ye gönderilen veri", discount_data)
         
         response = requests.post(
             f"{self.base_url}/Discounts",
             headers=self._headers(),
-            json=discount_data
+            json=discount_data,
+            timeout=NEOONE_TIMEOUT
         )
         response.raise_for_status()
         
@@ -225,59 +393,24 @@ class NeoOneClient:
     
     def get_discounts(self) -> list:
         """Mevcut iskontoları getirir."""
-        response = requests.get(
-            f"{self.base_url}/Discounts",
-            headers=self._headers()
-        )
-        response.raise_for_status()
-        
-        data = response.json()
-        if data.get("success"):
-            return data.get("data", [])
-        return []
+        return self._get("/Discounts")
     
     def get_active_discounts(self) -> list:
         """Aktif iskontoları getirir."""
-        response = requests.get(
-            f"{self.base_url}/Discounts/active",
-            headers=self._headers()
-        )
-        response.raise_for_status()
-        
-        data = response.json()
-        if data.get("success"):
-            return data.get("data", [])
-        return []
+        return self._get("/Discounts/active")
     
     # ==================== CUSTOMER REPORTS ====================
     
     def get_customer_sales_performance(self) -> list:
-        """Müşteri satış performans raporunu getirir."""
-        response = requests.get(
-            f"{self.base_url}/customers/reports/sales-performance",
-            headers=self._headers()
-        )
-        response.raise_for_status()
-        
-        data = response.json()
-        if data.get("success"):
-            return data.get("data", {}).get("data", [])
-        return []
+        """Müşteri satış performans raporunu CustomerPerformanceRecord listesi olarak getirir."""
+        return self._get("/customers/reports/sales-performance",
+                         record_type=CustomerPerformanceRecord, item_path=("data", "data"))
     
     # ==================== CITIES ====================
     
     def get_cities(self) -> list:
         """Şehirleri getirir."""
-        response = requests.get(
-            f"{self.base_url}/Cities",
-            headers=self._headers()
-        )
-        response.raise_for_status()
-        
-        data = response.json()
-        if data.get("success"):
-            return data.get("data", [])
-        return []
+        return self._get("/Cities")
     
     # ==================== BONUS DISCOUNT ====================
     
@@ -323,12 +456,13 @@ class NeoOneClient:
             ]
         }
         
-        print(f"DEBUG: Bonus Discount API'ye gönderilen veri: {discount_data}")
+        log_payload(logger, "Bonus Discount API'ye gönderilen veri", discount_data)
         
         response = requests.post(
             f"{self.base_url}/Discounts",
             headers=self._headers(),
-            json=discount_data
+            json=discount_data,
+            timeout=NEOONE_TIMEOUT
         )
         response.raise_for_status()
         
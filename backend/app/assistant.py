@@ -1,16 +1,64 @@
 import os
 import time
 import json
+import logging
 from openai import OpenAI
 from dotenv import load_dotenv
 from .tools import tools_schema, available_functions
+from .turn_router import DISCOUNT_FLOW_END_TOOLS, end_discount_flow
+from .discount_queue import set_job_scope, reset_job_scope
+from .logging_config import log_payload
+from .scheduler import TurnCancelled
+from .context_manager import assistants_run_options, after_assistants_turn
+from .conversation_store import conversation_store
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 api_key = os.getenv("OPENAI_API_KEY")
 client = OpenAI(api_key=api_key)
 
 ASSISTANT_ID = os.getenv("ASSISTANT_ID")  # Load from env or create new
+ASSISTANT_MODEL = "gpt-4o"
+
+# "assistants": OpenAI Assistants API (thread/run/polling)
+# "chat": Local conversation store + streaming Chat Completions (see chat_engine.py)
+EXECUTION_ENGINE = os.getenv("NEOBI_EXECUTION_ENGINE", "assistants")
+
+ASSISTANT_INSTRUCTIONS = (
+    "Sen NeoBI'sın. NeoOne şirketi için saha satış ve iskonto yönetim asistanısın. "
+    "Kullanıcılara ürün performansı hakkında bilgi ver, az satan ürünleri bul ve onlar için iskonto öner. "
+    "İskonto tanımlamak istediklerinde ilgili fonksiyonları kullan. "
+    "Her zaman profesyonel, yardımsever ve çözüm odaklı ol. Türkçe konuş. "
+    "ÖNEMLİ: İskonto tanımlama, güncelleme veya silme gibi veritabanını değiştiren kritik işlemlerden önce "
+    "MUTLAKA kullanıcıdan açıkça onay iste. Kullanıcı 'evet' veya 'onaylıyorum' demeden fonksiyonları çağırma. "
+    "İskonto süresi (duration_days) belirtilmemişse kullanıcıya sor. "
+    "İskonto oluşturma istekleri kuyruğa alınır ve bir iş no (job_id) döner; kullanıcıya talebin alındığını söyle, "
+    "iskontonun oluşup oluşmadığı sorulursa get_discount_job_status ile kontrol et. "
+    "İskonto performansı sorulduğunda check_discount_performance veya rank_discounts_by_lift sonucundaki lift'i "
+    "yorumla; değerlerin ürünün tüm müşterilerdeki satışı olduğunu belirt. "
+    "Satışı düşen veya yükselen ürünler sorulduğunda get_product_trends kullan; "
+    "tarih aralıklarıyla get_product_sales'i tekrar tekrar çağırma. "
+    "Kullanıcı bir listeyi dışa aktarmak, Excel veya CSV olarak almak isterse ilgili fonksiyonu export_format ile çağır "
+    "ve dönen indirme linkini paylaş; satırları sohbete yazma. "
+    "GRAFİK GÖSTERİMİ: Eğer kullanıcı bir verinin grafiğini veya dağılımını isterse (örneğin 'satış dağılımını göster'), "
+    "önce ilgili veriyi al (get_product_sales_distribution gibi). "
+    "ÖNEMLI: Veriyi liste halinde YAZMA. Sadece çok kısa bir giriş cümlesi yaz (örn: 'İşte X ürününün satış dağılımı:') ve "
+    "hemen ardından JSON bloğunu ekle. JSON bloğu grafiği otomatik oluşturacak, kullanıcı zaten grafikte tüm detayları görecek. "
+    "JSON formatı: "
+    "```json\n"
+    "{\n"
+    "  \"type\": \"chart\",\n"
+    "  \"title\": \"Grafik Başlığı\",\n"
+    "  \"data\": [\n"
+    "    {\"name\": \"Etiket1\", \"value\": 10},\n"
+    "    {\"name\": \"Etiket2\", \"value\": 20}\n"
+    "  ]\n"
+    "}\n"
+    "```\n"
+    "Örnek cevap: 'İşte Organik Yulaf Ezmesi'nin satış dağılımı:' (sonra JSON bloğu)"
+)
 
 def get_or_create_assistant():
     """
@@ -19,97 +67,133 @@ def get_or_create_assistant():
     global ASSISTANT_ID
     
     if ASSISTANT_ID:
-        print(f"Using existing Assistant ID: {ASSISTANT_ID}")
+        logger.debug("Using existing Assistant ID: %s", ASSISTANT_ID)
         return client.beta.assistants.retrieve(assistant_id=ASSISTANT_ID)
     
     # Create new assistant ONLY if ID is missing
-    print("Assistant ID not found in .env, creating a new one...")
+    logger.warning("Assistant ID not found in .env, creating a new one...")
     assistant = client.beta.assistants.create(
         name="NeoBI",
-        instructions="Sen NeoBI'sın. NeoOne şirketi için saha satış ve iskonto yönetim asistanısın. "
-                     "Kullanıcılara ürün performansı hakkında bilgi ver, az satan ürünleri bul ve onlar için iskonto öner. "
-                     "İskonto tanımlamak istediklerinde ilgili fonksiyonları kullan. "
-                     "Her zaman profesyonel, yardımsever ve çözüm odaklı ol. Türkçe konuş. "
-                     "ÖNEMLİ: İskonto tanımlama, güncelleme veya silme gibi veritabanını değiştiren kritik işlemlerden önce "
-                     "MUTLAKA kullanıcıdan açıkça onay iste. Kullanıcı 'evet' veya 'onaylıyorum' demeden fonksiyonları çağırma. "
-                     "İskonto süresi (duration_days) belirtilmemişse kullanıcıya sor. "
-                     "GRAFİK GÖSTERİMİ: Eğer kullanıcı bir verinin grafiğini veya dağılımını isterse (örneğin 'satış dağılımını göster'), "
-                     "önce ilgili veriyi al (get_product_sales_distribution gibi). "
-                     "ÖNEMLI: Veriyi liste halinde YAZMA. Sadece çok kısa bir giriş cümlesi yaz (örn: 'İşte X ürününün satış dağılımı:') ve "
-                     "hemen ardından JSON bloğunu ekle. JSON bloğu grafiği otomatik oluşturacak, kullanıcı zaten grafikte tüm detayları görecek. "
-                     "JSON formatı: "
-                     "```json\n"
-                     "{\n"
-                     "  \"type\": \"chart\",\n"
-                     "  \"title\": \"Grafik Başlığı\",\n"
-                     "  \"data\": [\n"
-                     "    {\"name\": \"Etiket1\", \"value\": 10},\n"
-                     "    {\"name\": \"Etiket2\", \"value\": 20}\n"
-                     "  ]\n"
-                     "}\n"
-                     "```\n"
-                     "Örnek cevap: 'İşte Organik Yulaf Ezmesi'nin satış dağılımı:' (sonra JSON bloğu)",
+        instructions=ASSISTANT_INSTRUCTIONS,
         tools=tools_schema,
-        model="gpt-4o",
+        model=ASSISTANT_MODEL,
     )
     ASSISTANT_ID = assistant.id
-    print(f"New Assistant Created: {ASSISTANT_ID}")
+    logger.info("New Assistant Created: %s", ASSISTANT_ID)
     return assistant
 
 def create_thread():
+    if EXECUTION_ENGINE == "chat":
+        from .chat_engine import create_local_thread
+        return create_local_thread()
     return client.beta.threads.create()
 
 def add_message_to_thread(thread_id, content):
+    if EXECUTION_ENGINE == "chat":
+        from .chat_engine import add_local_message
+        add_local_message(thread_id, content)
+        return
     client.beta.threads.messages.create(
         thread_id=thread_id,
         role="user",
         content=content
     )
+    # Local transcript for /api/chat/{thread_id}/history
+    conversation_store.append(thread_id, {"role": "user", "content": content})
 
-def run_assistant(thread_id):
+def execute_tool_call(function_name, arguments, thread_id=None):
+    """
+    Executes a tool by name with JSON-encoded arguments.
+    Returns the tool output string, or None if the function is unknown.
+    thread_id: When a discount is created successfully the thread's discount flow
+    in the turn router ends.
+    """
+    function_args = json.loads(arguments) if arguments else {}
+    logger.info("Calling function %s with args: %s", function_name, function_args)
+
+    if function_name not in available_functions:
+        logger.error("Function %s not found in available_functions.", function_name)
+        return None
+
+    # Discount jobs are deduplicated per conversation
+    scope_token = set_job_scope(thread_id)
+    try:
+        output = available_functions[function_name](**function_args)
+    finally:
+        reset_job_scope(scope_token)
+    log_payload(logger, "Function output", output)
+    if thread_id is not None and function_name in DISCOUNT_FLOW_END_TOOLS and '"error"' not in output:
+        end_discount_flow(thread_id)
+    return output
+
+def cancel_run(thread_id, run_id):
+    """Cancels an in-progress run. Errors are logged, not raised."""
+    try:
+        client.beta.threads.runs.cancel(thread_id=thread_id, run_id=run_id)
+        logger.info("Run %s on thread %s cancelled", run_id, thread_id)
+    except Exception as e:
+        logger.warning("Run %s could not be cancelled: %s", run_id, e)
+
+def run_assistant(thread_id, control=None, route=None):
     """
     Runs the assistant on the thread, handles tool calls, and returns the final response.
+    control: Optional TurnControl. When it is cancelled (deadline or client disconnect)
+    the OpenAI run is cancelled and TurnCancelled is raised.
+    route: Optional TurnRoute (see turn_router.route_turn) with the per-run model and
+    tool subset. Token usage of the run is added to it.
     """
+    if EXECUTION_ENGINE == "chat":
+        from .chat_engine import run_chat_turn
+        return run_chat_turn(thread_id, control, route=route)
+
     assistant = get_or_create_assistant()
     
+    # Messages not yet covered by the rolling summary go in verbatim; older history is carried by the summary
+    run_options = assistants_run_options(thread_id)
+    # Instructions and tools always come from this code, so an assistant stored under
+    # ASSISTANT_ID with an older definition still gets new tools and instructions
+    run_options["instructions"] = ASSISTANT_INSTRUCTIONS
+    run_options["tools"] = tools_schema
+    if route is not None:
+        run_options["model"] = route.model
+        if route.tools is not None:
+            run_options["tools"] = route.tools
     run = client.beta.threads.runs.create(
         thread_id=thread_id,
-        assistant_id=assistant.id
+        assistant_id=assistant.id,
+        **run_options
     )
 
     # Polling loop
     while True:
+        if control is not None and control.is_cancelled():
+            cancel_run(thread_id, run.id)
+            raise TurnCancelled(control.reason)
+
         run_status = client.beta.threads.runs.retrieve(
             thread_id=thread_id,
             run_id=run.id
         )
-        print(f"Run status: {run_status.status}")
+        logger.debug("Run status: %s", run_status.status)
 
         if run_status.status == 'completed':
+            after_assistants_turn(thread_id, run_status.usage)
+            if route is not None:
+                route.add_usage(run_status.usage)
             break
         elif run_status.status == 'requires_action':
             # Handle Function Calling
             tool_outputs = []
             try:
                 for tool_call in run_status.required_action.submit_tool_outputs.tool_calls:
-                    function_name = tool_call.function.name
-                    function_args = json.loads(tool_call.function.arguments)
-                    
-                    print(f"DEBUG: Calling function {function_name} with args: {function_args}")
-
-                    if function_name in available_functions:
-                        function_to_call = available_functions[function_name]
-                        output = function_to_call(**function_args)
-                        print(f"DEBUG: Function output: {output}")
-                        
+                    output = execute_tool_call(tool_call.function.name, tool_call.function.arguments, thread_id)
+                    if output is not None:
                         tool_outputs.append({
                             "tool_call_id": tool_call.id,
                             "output": output
                         })
-                    else:
-                        print(f"ERROR: Function {function_name} not found in available_functions.")
             except Exception as e:
-                print(f"ERROR processing tool calls: {e}")
+                logger.exception("Error processing tool calls: %s", e)
             
             # Submit outputs back to the run
             if tool_outputs:
@@ -119,26 +203,34 @@ def run_assistant(thread_id):
                         run_id=run.id,
                         tool_outputs=tool_outputs
                     )
-                    print("DEBUG: Tool outputs submitted successfully.")
+                    logger.debug("Tool outputs submitted successfully.")
                 except Exception as e:
-                    print(f"ERROR submitting tool outputs: {e}")
+                    logger.error("Error submitting tool outputs: %s", e)
 
         elif run_status.status in ['failed', 'cancelled', 'expired']:
-            print(f"Run failed with status: {run_status.status}")
+            logger.warning("Run failed with status: %s", run_status.status)
             if run_status.last_error:
-                print(f"Error details: {run_status.last_error}")
+                logger.warning("Error details: %s", run_status.last_error)
             return "Bir hata oluştu veya işlem zaman aşımına uğradı."
         
-        time.sleep(1) # Wait before polling again
+        # Wait before polling again
+        if control is not None:
+            control.wait(1)
+        else:
+            time.sleep(1)
 
-    # Get the latest message from the assistant
+    # Messages produced by this run. All of them are mirrored locally so the local transcript
+    # stays one-to-one with the OpenAI thread (context_manager counts messages from it);
+    # the newest one is the reply
     messages = client.beta.threads.messages.list(
-        thread_id=thread_id
+        thread_id=thread_id,
+        run_id=run.id,
+        order="asc",
+        limit=100
     )
-    
-    # Return the last message content
-    for msg in messages.data:
-        if msg.role == "assistant":
-            return msg.content[0].text.value
+    replies = [msg.content[0].text.value for msg in messages.data if msg.role == "assistant" and msg.content]
+    if replies:
+        conversation_store.append_many(thread_id, [{"role": "assistant", "content": text} for text in replies])
+        return replies[-1]
             
     return "Yanıt alınamadı."
@@ -0,0 +1,149 @@
+"""
+NeoBI Chat Completions Engine
+Assistants API yerine yerel konuşma deposu + streaming Chat Completions ile çalışan
+alternatif yürütme motoru. NEOBI_EXECUTION_ENGINE=chat ile açılır.
+
+Assistants API'de her turn messages.create, runs.create, runs.retrieve polling,
+submit_tool_outputs ve messages.list çağrıları gerektirir. Burada her tool adımı
+için tek bir streaming model çağrısı yapılır, polling yoktur.
+"""
+
+import os
+import logging
+from types import SimpleNamespace
+
+from .assistant import client, ASSISTANT_INSTRUCTIONS, ASSISTANT_MODEL, execute_tool_call
+from .conversation_store import conversation_store
+from .context_manager import build_chat_context
+from .scheduler import TurnCancelled
+from .tools import tools_schema
+
+logger = logging.getLogger(__name__)
+
+# Bir turn içinde izin verilen maksimum tool çağrısı turu
+MAX_TOOL_ROUNDS = int(os.getenv("NEOBI_MAX_TOOL_ROUNDS", "8"))
+
+MAX_TOOL_ROUNDS_REPLY = "Bir hata oluştu veya işlem zaman aşımına uğradı."
+# İptal / süre aşımı / hata ile yarıda kalan turn'ün geçmişe yazılan kapanış mesajı
+INTERRUPTED_REPLY = "(Bu mesajın işlenmesi yarıda kesildi.)"
+INTERRUPTED_TOOL_OUTPUT = '{"error": "Turn yarıda kesildiği için tool çalıştırılmadı."}'
+
+
+def create_local_thread():
+    """Yerel thread oluşturur. Assistants API ile aynı şekilde .id alanı olan bir nesne döner."""
+    return SimpleNamespace(id=conversation_store.create_thread())
+
+
+def add_local_message(thread_id, content):
+    if not conversation_store.thread_exists(thread_id):
+        raise ValueError(f"Thread bulunamadı: {thread_id}")
+    conversation_store.append(thread_id, {"role": "user", "content": content})
+
+
+def run_chat_turn(thread_id, control=None, route=None):
+    """
+    Thread geçmişi ile modeli çağırır, tool çağrılarını yürütür ve final yanıtı döndürür.
+    Yeni mesajlar (assistant, tool) turn sonunda tek seferde depoya yazılır. Turn yarıda
+    kalırsa (iptal, süre aşımı, hata) geçmiş bir assistant mesajıyla kapatılır; böylece
+    bir sonraki turn'de art arda iki kullanıcı mesajı veya cevapsız tool çağrısı olmaz.
+    route: Bu turn için seçilen model ve tool alt kümesi (TurnRoute); None ise
+    ASSISTANT_MODEL ve tüm tools_schema kullanılır.
+    """
+    model = route.model if route is not None else ASSISTANT_MODEL
+    tools = route.tools if route is not None and route.tools is not None else tools_schema
+    history = conversation_store.get_messages(thread_id)
+    # Eski mesajlar özetlenmiş / kısaltılmış bağlam
+    context = build_chat_context(thread_id, history)
+    new_messages = []
+
+    try:
+        for _ in range(MAX_TOOL_ROUNDS):
+            messages = [{"role": "system", "content": ASSISTANT_INSTRUCTIONS}] + context + new_messages
+            content, tool_calls = _stream_completion(messages, model, tools, route, control)
+
+            if not tool_calls:
+                new_messages.append({"role": "assistant", "content": content})
+                return content or "Yanıt alınamadı."
+
+            new_messages.append({"role": "assistant", "content": content or None, "tool_calls": tool_calls})
+            for tool_call in tool_calls:
+                if control is not None:
+                    control.check()
+                try:
+                    output = execute_tool_call(tool_call["function"]["name"], tool_call["function"]["arguments"],
+                                               thread_id)
+                except Exception as e:
+                    logger.exception("Error processing tool call: %s", e)
+                    output = None
+                # Chat Completions her tool_call_id için bir yanıt bekler
+                if output is None:
+                    output = '{"error": "Tool çalıştırılamadı."}'
+                new_messages.append({"role": "tool", "tool_call_id": tool_call["id"], "content": output})
+
+        logger.warning("Max tool rounds (%d) exceeded on thread %s", MAX_TOOL_ROUNDS, thread_id)
+        new_messages.append({"role": "assistant", "content": MAX_TOOL_ROUNDS_REPLY})
+        return MAX_TOOL_ROUNDS_REPLY
+    finally:
+        if not new_messages or new_messages[-1]["role"] != "assistant" or new_messages[-1].get("tool_calls"):
+            _close_interrupted_turn(new_messages)
+        conversation_store.append_many(thread_id, new_messages)
+
+
+def _close_interrupted_turn(new_messages: list):
+    """
+    Yarıda kalan turn'ün mesajlarını geçerli bir geçmişe tamamlar: çalıştırılmamış tool
+    çağrılarına hata çıktısı ve sona bir assistant mesajı eklenir. Çalışmış tool'ların
+    çıktıları (ör. kuyruğa alınan iskonto) korunur.
+    """
+    answered = {m["tool_call_id"] for m in new_messages if m["role"] == "tool"}
+    for message in list(new_messages):
+        for tool_call in message.get("tool_calls") or ():
+            if tool_call["id"] not in answered:
+                new_messages.append({"role": "tool", "tool_call_id": tool_call["id"],
+                                     "content": INTERRUPTED_TOOL_OUTPUT})
+    new_messages.append({"role": "assistant", "content": INTERRUPTED_REPLY})
+
+
+def _stream_completion(messages, model, tools, route=None, control=None):
+    """
+    Streaming Chat Completions çağrısı yapar.
+    Returns: (content, tool_calls) - tool_calls Chat Completions mesaj formatında liste
+    """
+    options = {"tools": tools} if tools else {}
+    stream = client.chat.completions.create(
+        model=model,
+        messages=messages,
+        stream=True,
+        stream_options={"include_usage": True},
+        **options
+    )
+
+    content_parts = []
+    tool_calls = {}  # index -> tool call
+    try:
+        for chunk in stream:
+            if control is not None and control.is_cancelled():
+                raise TurnCancelled(control.reason)
+            # Son chunk'ta sadece token kullanımı gelir
+            if getattr(chunk, "usage", None) is not None and route is not None:
+                route.add_usage(chunk.usage)
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if delta.content:
+                content_parts.append(delta.content)
+            for tc in delta.tool_calls or []:
+                call = tool_calls.setdefault(tc.index, {
+                    "id": "", "type": "function", "function": {"name": "", "arguments": ""}
+                })
+                if tc.id:
+                    call["id"] = tc.id
+                if tc.function:
+                    if tc.function.name:
+                        call["function"]["name"] += tc.function.name
+                    if tc.function.arguments:
+                        call["function"]["arguments"] += tc.function.arguments
+    finally:
+        stream.close()
+
+    return "".join(content_parts), [tool_calls[i] for i in sorted(tool_calls)]
@@ -0,0 +1,236 @@
+"""
+NeoBI Context Manager
+Uzun süre açık kalan thread'lerde model bağlamını sınırlar.
+
+- Son CONTEXT_RECENT_MESSAGES mesaj olduğu gibi gönderilir
+- Son kullanıcı mesajından önceki tool çıktıları kısa özetleriyle değiştirilir
+- Pencerenin dışında kalan eski mesajlar arka planda rolling özete dönüştürülür;
+  özet yetişene kadar bu mesajlar da gönderilir (hiçbir mesaj düşürülmez)
+- Thread bazlı bağlam boyutu metrik olarak tutulur (/api/admin/context-metrics)
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .conversation_store import conversation_store
+
+logger = logging.getLogger(__name__)
+
+# Olduğu gibi gönderilecek son mesaj sayısı
+CONTEXT_RECENT_MESSAGES = int(os.getenv("NEOBI_CONTEXT_RECENT_MESSAGES", "20"))
+# Eski tool çıktılarının kısaltılacağı maksimum karakter sayısı
+CONTEXT_TOOL_OUTPUT_CHARS = int(os.getenv("NEOBI_CONTEXT_TOOL_OUTPUT_CHARS", "400"))
+# Pencere dışına bu kadar yeni mesaj taşındığında özet güncellenir
+CONTEXT_SUMMARY_BATCH = int(os.getenv("NEOBI_CONTEXT_SUMMARY_BATCH", "10"))
+SUMMARY_MODEL = os.getenv("NEOBI_SUMMARY_MODEL", "gpt-4o-mini")
+
+SUMMARY_PROMPT = (
+    "Aşağıda bir saha satış asistanı ile kullanıcı arasındaki konuşmanın eski bölümü var. "
+    "Mevcut özeti bu mesajlarla güncelle. Kullanıcının hedeflerini, bahsedilen ürün/müşteri/grup ID'lerini, "
+    "alınan kararları ve oluşturulan iskontoları koru. En fazla 15 madde, Türkçe yaz."
+)
+
+# Özetleme işleri istek yolunu bloklamaz
+_summary_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="neobi-summary")
+_summaries_in_progress = set()
+_summaries_lock = threading.Lock()
+
+# thread_id -> son bağlam ölçümü (en fazla CONTEXT_METRICS_MAX_THREADS thread tutulur)
+CONTEXT_METRICS_MAX_THREADS = 1000
+_context_metrics = {}
+_assistants_turn_counts = {}
+
+
+# ==================== COMPACTION ====================
+
+def compact_tool_output(content: str, limit: int = CONTEXT_TOOL_OUTPUT_CHARS) -> str:
+    """Büyük tool çıktısını kısa bir özetle değiştirir."""
+    if content is None or len(content) <= limit:
+        return content
+    try:
+        data = json.loads(content)
+    except ValueError:
+        data = None
+    if isinstance(data, list):
+        sample = json.dumps(data[:2], ensure_ascii=False)[:limit]
+        return json.dumps({"_ozet": f"{len(data)} kayıt döndü (eski tool çıktısı kısaltıldı)",
+                           "ornek": sample}, ensure_ascii=False)
+    return content[:limit] + f"... [eski tool çıktısı kısaltıldı, {len(content)} karakter]"
+
+
+def build_chat_context(thread_id: str, history: list) -> list:
+    """
+    Chat Completions modu için modele gidecek mesaj listesini (system prompt hariç) oluşturur.
+    """
+    start = _window_start(history)
+    summary_row = conversation_store.get_summary(thread_id)
+    summary, covered = (summary_row[0], summary_row[1]) if summary_row else (None, 0)
+    covered = min(covered, start)
+
+    # Özetlenmemiş eski mesajlar: özet yetişene kadar olduğu gibi gönderilir (sadece user/assistant metni)
+    pending = [{"role": m["role"], "content": m["content"]}
+               for m in history[covered:start] if m["role"] in ("user", "assistant") and m.get("content")]
+
+    window = list(history[start:])
+    last_user = max((i for i, m in enumerate(window) if m["role"] == "user"), default=0)
+    window = [_compact_message(m) if i < last_user else m for i, m in enumerate(window)]
+
+    context = []
+    if summary:
+        context.append({"role": "system", "content": f"Önceki konuşmanın özeti:\n{summary}"})
+    context.extend(pending)
+    context.extend(window)
+
+    if start - covered >= CONTEXT_SUMMARY_BATCH:
+        _schedule(thread_id, _summarize_chat_history, thread_id, history[:start], summary, covered)
+
+    record_context_size(thread_id, len(context), sum(len(m.get("content") or "") for m in context))
+    return context
+
+
+def _window_start(history: list) -> int:
+    """Pencere başlangıcı; tool mesajları ait oldukları assistant mesajından ayrılmaz."""
+    start = max(0, len(history) - CONTEXT_RECENT_MESSAGES)
+    while start < len(history) and history[start]["role"] == "tool":
+        start += 1
+    return start
+
+
+def _compact_message(message: dict) -> dict:
+    if message["role"] == "tool":
+        return {**message, "content": compact_tool_output(message.get("content"))}
+    return message
+
+
+# ==================== ROLLING SUMMARY ====================
+
+def assistants_run_options(thread_id: str) -> dict:
+    """
+    Assistants API runs.create için bağlam seçenekleri: rolling özet (additional_instructions)
+    + özetin kapsamadığı tüm mesajlar (truncation_strategy).
+
+    Özet yoksa kesme yapılmaz; hiçbir mesaj hem özetin hem pencerenin dışında kalmaz.
+    Kapsanmayan mesaj sayısı yerel transcript'ten hesaplanır (OpenAI çağrısı yapılmaz):
+    özet anında özete dahil son mesajdan sonra tam CONTEXT_RECENT_MESSAGES mesaj vardı,
+    o zamandan beri eklenenler yerel mesaj sayısındaki artıştır.
+    """
+    summary_row = conversation_store.get_summary(thread_id)
+    if not summary_row:
+        return {}
+    options = {"additional_instructions": f"Önceki konuşmanın özeti:\n{summary_row[0]}"}
+    count_at_summary = summary_row[1]
+    if count_at_summary:
+        added = max(0, conversation_store.count_messages(thread_id) - count_at_summary)
+        options["truncation_strategy"] = {"type": "last_messages",
+                                          "last_messages": CONTEXT_RECENT_MESSAGES + added}
+    return options
+
+
+def after_assistants_turn(thread_id: str, usage=None):
+    """
+    Assistants modunda her turn sonunda çağrılır. Bağlam metriğini kaydeder ve
+    birkaç turn'de bir pencere dışına çıkan mesajları özetlemeyi planlar.
+    """
+    if usage is not None:
+        record_context_size(thread_id, None, None, prompt_tokens=getattr(usage, "prompt_tokens", None))
+    count = _assistants_turn_counts.get(thread_id, 0) + 1
+    _assistants_turn_counts[thread_id] = count
+    # Her turn en az iki mesaj (user + assistant) ekler
+    if count % max(1, CONTEXT_SUMMARY_BATCH // 2) == 0:
+        _schedule(thread_id, _summarize_assistants_thread, thread_id)
+
+
+def _schedule(thread_id: str, fn, *args):
+    with _summaries_lock:
+        if thread_id in _summaries_in_progress:
+            return
+        _summaries_in_progress.add(thread_id)
+
+    def job():
+        try:
+            fn(*args)
+        except Exception as e:
+            logger.warning("Context summary for %s failed: %s", thread_id, e)
+        finally:
+            with _summaries_lock:
+                _summaries_in_progress.discard(thread_id)
+
+    _summary_executor.submit(job)
+
+
+def _summarize_chat_history(thread_id: str, older: list, previous_summary: str, covered: int):
+    new_messages = [m for m in older[covered:] if m["role"] in ("user", "assistant") and m.get("content")]
+    summary = summarize(previous_summary, [(m["role"], m["content"]) for m in new_messages])
+    conversation_store.set_summary(thread_id, summary, covered_count=len(older))
+    logger.info("Context summary updated for %s (%d messages covered)", thread_id, len(older))
+
+
+def _summarize_assistants_thread(thread_id: str):
+    from .assistant import client
+
+    summary_row = conversation_store.get_summary(thread_id)
+    previous_summary, covered_until = (summary_row[0], summary_row[2]) if summary_row else (None, None)
+    # Listelemeden önce sayılır: arada eklenen mesajlar kapsanmayan sayısını sadece büyütür
+    local_count = conversation_store.count_messages(thread_id)
+
+    # Yeniden eskiye; SDK sonraki sayfaları otomatik getirir. Pencere atlanır, özete
+    # dahil son mesaja (veya thread başına) kadar okunur
+    messages = client.beta.threads.messages.list(thread_id=thread_id, order="desc", limit=100)
+    new_messages = []
+    for i, msg in enumerate(messages):
+        if msg.id == covered_until:
+            break
+        if i >= CONTEXT_RECENT_MESSAGES:
+            new_messages.append(msg)
+    if len(new_messages) < CONTEXT_SUMMARY_BATCH:
+        return
+    new_messages.reverse()
+
+    summary = summarize(previous_summary, [(m.role, _message_text(m)) for m in new_messages])
+    conversation_store.set_summary(thread_id, summary, covered_count=local_count, covered_until=new_messages[-1].id)
+    logger.info("Context summary updated for %s (%d new messages)", thread_id, len(new_messages))
+
+
+def _message_text(message) -> str:
+    return "".join(part.text.value for part in message.content if getattr(part, "type", None) == "text")
+
+
+def summarize(previous_summary: str, messages: list) -> str:
+    """(role, text) listesini mevcut özetle birleştirerek yeni özet üretir."""
+    from .assistant import client
+
+    transcript = "\n".join(f"{role}: {compact_tool_output(text, 1000)}" for role, text in messages)
+    content = f"Mevcut özet:\n{previous_summary or '(yok)'}\n\nYeni mesajlar:\n{transcript}"
+    completion = client.chat.completions.create(
+        model=SUMMARY_MODEL,
+        messages=[{"role": "system", "content": SUMMARY_PROMPT}, {"role": "user", "content": content}],
+    )
+    return completion.choices[0].message.content
+
+
+# ==================== METRICS ====================
+
+def record_context_size(thread_id: str, message_count, char_count, prompt_tokens=None):
+    metric = _context_metrics.pop(thread_id, {})
+    _context_metrics[thread_id] = metric
+    if len(_context_metrics) > CONTEXT_METRICS_MAX_THREADS:
+        oldest = next(iter(_context_metrics))
+        del _context_metrics[oldest]
+        _assistants_turn_counts.pop(oldest, None)
+    if message_count is not None:
+        metric["messages"] = message_count
+    if char_count is not None:
+        metric["chars"] = char_count
+        metric["approx_tokens"] = char_count // 4
+    if prompt_tokens is not None:
+        metric["prompt_tokens"] = prompt_tokens
+    metric["updated_at"] = time.time()
+
+
+def context_metrics() -> dict:
+    """Thread bazlı son bağlam boyutları."""
+    return dict(_context_metrics)
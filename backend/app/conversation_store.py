@@ -0,0 +1,156 @@
+"""
+NeoBI Conversation Store
+Chat Completions modunda konuşma geçmişini yerel SQLite veritabanında tutar.
+Assistants modunda da kullanıcı/asistan mesajları transcript olarak yazılır;
+böylece widget geçmişi OpenAI'a gitmeden geri yüklenebilir.
+Her iki modda da uzun thread'lerin rolling özetleri burada saklanır.
+
+Mesajlar OpenAI Chat Completions formatında (role/content/tool_calls/tool_call_id)
+JSON olarak saklanır; thread_id ile sıralı olarak okunur.
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+
+DATA_DIR = os.getenv("NEOBI_DATA_DIR", os.path.join(os.path.dirname(__file__), "..", "data"))
+CONVERSATION_DB_PATH = os.getenv("NEOBI_CONVERSATION_DB", os.path.join(DATA_DIR, "conversations.db"))
+
+LOCAL_THREAD_PREFIX = "thread_local_"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS threads (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    thread_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_thread ON messages (thread_id, id);
+CREATE TABLE IF NOT EXISTS summaries (
+    thread_id TEXT PRIMARY KEY,
+    summary TEXT NOT NULL,
+    covered_count INTEGER NOT NULL DEFAULT 0,
+    covered_until TEXT,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+class ConversationStore:
+    """SQLite tabanlı, thread-safe konuşma deposu."""
+
+    def __init__(self, path: str = CONVERSATION_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def create_thread(self) -> str:
+        thread_id = LOCAL_THREAD_PREFIX + uuid.uuid4().hex
+        with self._lock:
+            conn = self._connection()
+            conn.execute("INSERT INTO threads (id, created_at) VALUES (?, ?)", (thread_id, time.time()))
+            conn.commit()
+        return thread_id
+
+    def thread_exists(self, thread_id: str) -> bool:
+        with self._lock:
+            row = self._connection().execute("SELECT 1 FROM threads WHERE id = ?", (thread_id,)).fetchone()
+        return row is not None
+
+    def append(self, thread_id: str, message: dict):
+        """Thread'e Chat Completions formatında bir mesaj ekler."""
+        self.append_many(thread_id, [message])
+
+    def append_many(self, thread_id: str, messages: list):
+        now = time.time()
+        rows = [(thread_id, m["role"], json.dumps(m, ensure_ascii=False), now) for m in messages]
+        with self._lock:
+            conn = self._connection()
+            conn.executemany("INSERT INTO messages (thread_id, role, payload, created_at) VALUES (?, ?, ?, ?)", rows)
+            conn.commit()
+
+    def get_messages(self, thread_id: str) -> list:
+        """Thread'in tüm mesajlarını eskiden yeniye döndürür."""
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT payload FROM messages WHERE thread_id = ? ORDER BY id", (thread_id,)
+            ).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def count_messages(self, thread_id: str) -> int:
+        """Thread'deki yerel mesaj sayısı (assistants modunda OpenAI thread'inin aynası)."""
+        with self._lock:
+            return self._connection().execute(
+                "SELECT COUNT(*) FROM messages WHERE thread_id = ?", (thread_id,)
+            ).fetchone()[0]
+
+    def get_transcript(self, thread_id: str, limit: int = 20, before_id: int = None):
+        """
+        Thread'in görünür (user/assistant, içerikli) mesajlarını sayfalı döndürür.
+        before_id'den önceki en yeni `limit` mesaj eskiden yeniye sıralı döner.
+
+        Returns: (messages, next_cursor) - next_cursor daha eski sayfa için before_id değeri, yoksa None
+        """
+        query = ("SELECT id, role, json_extract(payload, '$.content'), created_at FROM messages "
+                 "WHERE thread_id = ? AND role IN ('user', 'assistant') "
+                 "AND json_extract(payload, '$.content') IS NOT NULL")
+        params = [thread_id]
+        if before_id is not None:
+            query += " AND id < ?"
+            params.append(before_id)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit + 1)
+
+        with self._lock:
+            rows = self._connection().execute(query, params).fetchall()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        rows.reverse()
+        messages = [{"id": r[0], "role": r[1], "content": r[2], "created_at": r[3]} for r in rows]
+        next_cursor = messages[0]["id"] if has_more and messages else None
+        return messages, next_cursor
+
+    def get_summary(self, thread_id: str):
+        """
+        Thread'in rolling özetini döndürür: (summary, covered_count, covered_until) veya None.
+        covered_count: özetlenen yerel mesaj sayısı (chat modu); assistants modunda özet
+                       oluşturulurken thread'deki yerel mesaj sayısı
+        covered_until: özete dahil edilen son OpenAI mesaj ID'si (assistants modu)
+        """
+        with self._lock:
+            return self._connection().execute(
+                "SELECT summary, covered_count, covered_until FROM summaries WHERE thread_id = ?", (thread_id,)
+            ).fetchone()
+
+    def set_summary(self, thread_id: str, summary: str, covered_count: int = 0, covered_until: str = None):
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO summaries (thread_id, summary, covered_count, covered_until, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (thread_id, summary, covered_count, covered_until, time.time())
+            )
+            conn.commit()
+
+
+# Singleton instance
+conversation_store = ConversationStore()
@@ -0,0 +1,161 @@
+"""
+NeoBI Customer Performance Index
+Müşteri satış performans raporu üzerinde şehir, ilçe ve müşteri grubu bazlı,
+ciroya göre sıralı indeks.
+
+Rapor bir kez ciroya göre sıralanır; her kova (bucket) bu sırayı koruyarak oluşur.
+Böylece "İstanbul'da en çok ciro yapan 10 eczane" gibi sorgular raporun tamamını
+sıralamadan, ilgili kovadan k kayıt okunarak cevaplanır. Şehir/ilçe adları
+get_cities_districts referans verisiyle eşleştirilir; eşleşme varsa filtre tam
+eşleşmedir, yoksa eski davranıştaki gibi parça (substring) eşleşmesine düşülür.
+"""
+
+import os
+import time
+import heapq
+import logging
+import threading
+from functools import lru_cache
+from itertools import islice
+
+from .api_client import neoone_client
+
+logger = logging.getLogger(__name__)
+
+# İndeksin (ve altındaki raporun) yeniden oluşturulma süresi (saniye)
+CUSTOMER_INDEX_TTL = int(os.getenv("NEOBI_CUSTOMER_INDEX_TTL", "300"))
+
+_FOLD_TABLE = str.maketrans("çğıöşüâîû", "cgiosuaiu")
+
+
+@lru_cache(maxsize=8192)
+def normalize_key(value: str) -> str:
+    """
+    Karşılaştırma anahtarı: Türkçe küçük harf + ASCII katlama.
+    "İSTANBUL", "istanbul" ve "Istanbul" aynı anahtara düşer.
+    """
+    if not value:
+        return ""
+    return value.replace("İ", "i").replace("I", "ı").lower().translate(_FOLD_TABLE).strip()
+
+
+def _revenue(record) -> float:
+    return record.total_revenue or 0
+
+
+class CustomerPerformanceIndex:
+    """CustomerPerformanceRecord listesi üzerinde kova bazlı, ciroya göre sıralı indeks."""
+
+    def __init__(self, records: list, reference_cities: list = None):
+        # Kaynak liste StaleList olabilir; tool'lar eskilik uyarısı için buna bakar
+        self.source = records
+        self._all = sorted(records, key=_revenue)
+        self._by_city = {}
+        self._by_district = {}
+        self._by_group = {}
+        for record in self._all:
+            self._by_city.setdefault(normalize_key(record.city), []).append(record)
+            self._by_district.setdefault(normalize_key(record.district), []).append(record)
+            self._by_group.setdefault(normalize_key(record.customer_group_name), []).append(record)
+
+        # Referans veriden bilinen şehir/ilçe anahtarları
+        self._known_cities = set()
+        self._known_districts = set()
+        for city in reference_cities or []:
+            self._known_cities.add(normalize_key(city.get("name", "")))
+            for district in city.get("districts") or []:
+                self._known_districts.add(normalize_key(district.get("name", "")))
+
+    def __len__(self):
+        return len(self._all)
+
+    def query(self, city: str = None, district: str = None, customer_group: str = None,
+              descending: bool = True, limit: int = 10) -> list:
+        """Filtrelere uyan en yüksek (descending) veya en düşük cirolu `limit` kaydı döndürür."""
+        return list(islice(self.iter_query(city, district, customer_group, descending), limit))
+
+    def iter_query(self, city: str = None, district: str = None, customer_group: str = None,
+                   descending: bool = True):
+        """Filtrelere uyan kayıtları ciro sırasında tek tek üretir (export'lar için limitsiz)."""
+        filters = []
+        if city:
+            filters.append((self._by_city, self._match_keys(self._by_city, city, self._known_cities)))
+        if district:
+            filters.append((self._by_district, self._match_keys(self._by_district, district, self._known_districts)))
+        if customer_group:
+            # Grup filtresi eski davranıştaki gibi parça eşleşmesidir ("Eczane" -> "Plus Eczane" dahil)
+            key = normalize_key(customer_group)
+            filters.append((self._by_group, {k for k in self._by_group if key in k}))
+
+        if not filters:
+            return reversed(self._all) if descending else iter(self._all)
+
+        if any(not keys for _, keys in filters):
+            return iter(())
+
+        # En küçük aday kümesini sürücü yap, diğer filtreleri anahtar kontrolüyle uygula
+        filters.sort(key=lambda f: sum(len(f[0][k]) for k in f[1]))
+        driver_buckets, driver_keys = filters[0]
+        others = filters[1:]
+
+        candidates = self._ordered(driver_buckets, driver_keys, descending)
+        if others:
+            candidates = (r for r in candidates if all(self._key_for(b, r) in keys for b, keys in others))
+        return candidates
+
+    def _key_for(self, buckets: dict, record) -> str:
+        if buckets is self._by_city:
+            return normalize_key(record.city)
+        if buckets is self._by_district:
+            return normalize_key(record.district)
+        return normalize_key(record.customer_group_name)
+
+    @staticmethod
+    def _match_keys(buckets: dict, value: str, known: set) -> set:
+        """
+        Şehir/ilçe filtresine karşılık gelen kova anahtarları.
+        Referans veride veya kovalarda tam eşleşme varsa sadece o anahtar, yoksa parça eşleşmeleri.
+        """
+        key = normalize_key(value)
+        if key in buckets or key in known:
+            return {key} if key in buckets else set()
+        return {k for k in buckets if key in k}
+
+    @staticmethod
+    def _ordered(buckets: dict, keys: set, descending: bool):
+        """Seçilen kovaları ciro sırasını koruyarak birleştirir (heap merge, O(k log m))."""
+        lists = [buckets[k] for k in keys]
+        if len(lists) == 1:
+            return reversed(lists[0]) if descending else iter(lists[0])
+        if descending:
+            return heapq.merge(*(reversed(l) for l in lists), key=_revenue, reverse=True)
+        return heapq.merge(*lists, key=_revenue)
+
+
+_index = None
+_index_built_at = 0.0
+_index_lock = threading.Lock()
+
+
+def get_customer_index() -> CustomerPerformanceIndex:
+    """İndeksi cache'den döndürür; süresi dolduysa raporu çekip yeniden oluşturur."""
+    global _index, _index_built_at
+    if _index is not None and time.monotonic() - _index_built_at < CUSTOMER_INDEX_TTL:
+        return _index
+    with _index_lock:
+        # Başka bir istek biz beklerken oluşturmuş olabilir
+        if _index is not None and time.monotonic() - _index_built_at < CUSTOMER_INDEX_TTL:
+            return _index
+        records = neoone_client.get_customer_sales_performance()
+        try:
+            reference_cities = neoone_client.get_cities()
+        except Exception as e:
+            logger.warning("City reference data unavailable, using substring matching: %s", e)
+            reference_cities = []
+        started = time.perf_counter()
+        index = CustomerPerformanceIndex(records, reference_cities)
+        logger.info("Customer index built: %d customers in %.1f ms", len(index), (time.perf_counter() - started) * 1000)
+        # Eski (stale) veriden oluşan indeks cache'lenmez; bir sonraki istekte tekrar denenir
+        if not getattr(records, "stale", False):
+            _index, _index_built_at = index, time.monotonic()
+        return index
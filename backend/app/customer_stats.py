@@ -0,0 +1,143 @@
+"""
+NeoBI Customer Statistics
+Toplam müşteri sayısı ve müşteri grubu histogramını bellekte tutan servis.
+
+get_customer_count her çağrıda tüm müşteri listesini indirmek yerine bu servisten
+cevaplanır. Arka plandaki bir thread listeyi periyodik olarak yeniler:
+- Liste değişmediyse (304 veya gövde özeti aynı) kayıtlar hiç oluşturulmaz, hiçbir şey değişmez
+- Farklıysa önceki müşteri -> grup eşlemesiyle karşılaştırılıp sadece eklenen,
+  silinen veya grubu değişen müşteriler histograma yansıtılır
+Yenileme başarısız olursa son bilinen sayılar `stale` işaretiyle sunulmaya devam eder.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import Counter
+from datetime import datetime
+
+from .api_client import neoone_client
+
+logger = logging.getLogger(__name__)
+
+# Arka plan yenileme periyodu (saniye). 0 = arka plan yenileme kapalı (ilk istekte yüklenir)
+CUSTOMER_STATS_REFRESH_INTERVAL = int(os.getenv("NEOBI_CUSTOMER_STATS_REFRESH", "600"))
+
+
+class CustomerStats:
+    """Müşteri sayısı + grup histogramı. _dumps için `stale` / `fetched_at` alanlarını taşır."""
+
+    def __init__(self, refresh_interval: int = CUSTOMER_STATS_REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self._groups = {}  # customer_id -> grup adı
+        self._histogram = Counter()
+        self._validators = None  # Son uygulanan listenin digest / etag / last_modified bilgisi
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._worker = None
+        self.fetched_at = None  # Son başarılı yenileme
+        self.stale = False      # Son yenileme denemesi başarısız oldu mu
+        self.refreshes = 0
+        self.unchanged = 0
+
+    def start(self):
+        """Arka plan yenileme thread'ini başlatır."""
+        if self.refresh_interval <= 0 or self._worker is not None:
+            return
+        self._worker = threading.Thread(target=self._run, name="neobi-customer-stats", daemon=True)
+        self._worker.start()
+
+    def counts(self) -> tuple:
+        """
+        (toplam, {grup: sayı}) döndürür. Veri hiç yüklenmediyse senkron yükler.
+        """
+        if not self._loaded:
+            self.refresh()
+        with self._lock:
+            return len(self._groups), dict(self._histogram)
+
+    def refresh(self) -> bool:
+        """Müşteri listesini çekip değişiklikleri uygular. Veri değiştiyse True."""
+        with self._refresh_lock:
+            try:
+                customers = neoone_client.get_customers(previous=self._validators if self._loaded else None)
+            except Exception as e:
+                self.stale = self._loaded
+                if not self._loaded:
+                    raise
+                logger.warning("Customer stats refresh failed (%s); serving counts from %s", e, self.fetched_at)
+                return False
+
+            if getattr(customers, "stale", False):
+                # Upstream erişilemez; elimizdeki sayılar zaten bu veriden güncel
+                if not self._loaded:
+                    self._apply(customers)
+                    self.fetched_at = customers.fetched_at
+                self.stale = True
+                return False
+
+            self.stale = False
+            self.fetched_at = datetime.now()
+            self.refreshes += 1
+            if getattr(customers, "not_modified", False):
+                self.unchanged += 1
+                self._validators = customers.validators
+                logger.debug("Customer list unchanged (%s)", customers.digest[:12])
+                return False
+            self._apply(customers)
+            return True
+
+    def _apply(self, customers: list):
+        started = time.perf_counter()
+        current = {}
+        for i, c in enumerate(customers):
+            key = c.customer_id if c.customer_id is not None else ("_", i)
+            current[key] = c.customer_group_name
+
+        with self._lock:
+            previous = self._groups
+            added = removed = moved = 0
+            for key, group in current.items():
+                old = previous.get(key)
+                if old == group:
+                    continue
+                if old is None:
+                    added += 1
+                else:
+                    moved += 1
+                    self._histogram[old] -= 1
+                self._histogram[group] += 1
+            for key, group in previous.items():
+                if key not in current:
+                    removed += 1
+                    self._histogram[group] -= 1
+            self._histogram += Counter()  # Sıfıra düşen grupları temizle
+            self._groups = current
+            self._validators = getattr(customers, "validators", None)
+            self._loaded = True
+        logger.info("Customer stats updated: %d customers (+%d -%d ~%d) in %.1f ms", len(current), added, removed,
+                    moved, (time.perf_counter() - started) * 1000)
+
+    def stats(self) -> dict:
+        return {
+            "loaded": self._loaded,
+            "customers": len(self._groups),
+            "fetched_at": self.fetched_at.isoformat() if self.fetched_at else None,
+            "stale": self.stale,
+            "refreshes": self.refreshes,
+            "unchanged": self.unchanged,
+        }
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error("Customer stats refresh failed: %s", e)
+            time.sleep(self.refresh_interval)
+
+
+# Singleton instance
+customer_stats = CustomerStats()
@@ -0,0 +1,324 @@
+"""
+NeoBI Discount Queue
+İskonto/kampanya oluşturma isteklerini kalıcı (SQLite) bir iş kuyruğunda tutar.
+
+create_discount ve create_bonus_discount tool'ları NeoOne'a beklemeden iş ID'si döner;
+arka plandaki worker /Discounts POST'unu retry'larla gönderir. Böylece yavaş bir
+NeoOne yazma isteği OpenAI run'ını bekletmez.
+
+Tekrar (duplicate) koruması:
+- Aynı sohbette (thread), aynı parametrelerle (tarih aralığı gün olarak dahil) gelen
+  istekler aynı idempotency key'e düşer; bekleyen veya gönderilmekte olan bir iş varsa
+  o döndürülür (model aynı tool çağrısını tekrarlarsa ikinci iskonto oluşmaz).
+  Tamamlanmış işler eşleşmez: yeni bir istek yeni bir iskonto oluşturur
+- İskonto adına iş ID'sinden türetilen bir işaret eklenir. Önceki deneme NeoOne'a
+  ulaşmış olabilirse (timeout, süreç çökmesi) yeniden göndermeden önce bu işaretle
+  mevcut iskontolarda arama yapılır
+"""
+
+import os
+import json
+import time
+import uuid
+import random
+import sqlite3
+import hashlib
+import logging
+import threading
+from contextvars import ContextVar
+
+from .api_client import neoone_client
+from .resilience import is_retryable
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.getenv("NEOBI_DATA_DIR", os.path.join(os.path.dirname(__file__), "..", "data"))
+DISCOUNT_QUEUE_DB_PATH = os.getenv("NEOBI_DISCOUNT_QUEUE_DB", os.path.join(DATA_DIR, "discount_jobs.db"))
+# Bir iş için maksimum gönderim denemesi
+DISCOUNT_MAX_ATTEMPTS = int(os.getenv("NEOBI_DISCOUNT_MAX_ATTEMPTS", "6"))
+# Retry'lar arası taban bekleme (saniye); her denemede iki katına çıkar
+DISCOUNT_RETRY_DELAY = float(os.getenv("NEOBI_DISCOUNT_RETRY_DELAY", "5"))
+DISCOUNT_RETRY_MAX_DELAY = 300
+# "running" durumunda bu süreden uzun kalan iş (çöken worker) tekrar kuyruğa alınır
+DISCOUNT_JOB_LEASE = int(os.getenv("NEOBI_DISCOUNT_JOB_LEASE", "300"))
+POLL_INTERVAL = 5
+
+JOB_KINDS = ("discount", "bonus_discount")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS discount_jobs (
+    id TEXT PRIMARY KEY,
+    idempotency_key TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    result TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+DROP INDEX IF EXISTS idx_discount_jobs_key;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_discount_jobs_active_key
+    ON discount_jobs (idempotency_key) WHERE status IN ('pending', 'running');
+CREATE INDEX IF NOT EXISTS idx_discount_jobs_due ON discount_jobs (status, next_attempt_at);
+"""
+
+
+class _Unverifiable(Exception):
+    """Önceki denemenin sonucu NeoOne'dan doğrulanamadı; iş daha sonra tekrar denenir."""
+
+
+# İsteği yapan sohbet (thread); execute_tool_call tarafından tool çağrısı süresince ayarlanır
+_job_scope = ContextVar("neobi_discount_job_scope", default=None)
+
+
+def set_job_scope(scope):
+    """Mevcut tool çağrısının thread'ini ayarlar. reset_job_scope için token döner."""
+    return _job_scope.set(scope)
+
+
+def reset_job_scope(token):
+    _job_scope.reset(token)
+
+
+def idempotency_key(kind: str, params: dict, scope: str = None) -> str:
+    """
+    Tüm parametreler + isteyen thread üzerinden deterministik anahtar. Tarihler gün
+    hassasiyetinde alınır (tool başlangıcı çağrı anından hesaplar, saniyeler farklıdır).
+    """
+    stable = {k: (v[:10] if k in ("start_date", "end_date") and isinstance(v, str) else v)
+              for k, v in params.items()}
+    raw = json.dumps({"kind": kind, "params": stable, "scope": scope}, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def job_marker(job_id: str) -> str:
+    """İskonto adına eklenen, işe özgü işaret."""
+    return f"#{job_id[-8:]}"
+
+
+class DiscountQueue:
+    """SQLite tabanlı, thread-safe iskonto yazma kuyruğu ve worker'ı."""
+
+    def __init__(self, path: str = DISCOUNT_QUEUE_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._wake = threading.Event()
+        self._worker = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def start(self):
+        """Arka plan gönderim thread'ini başlatır."""
+        if self._worker is not None:
+            return
+        self._worker = threading.Thread(target=self._run, name="neobi-discount-queue", daemon=True)
+        self._worker.start()
+
+    def enqueue(self, kind: str, params: dict) -> tuple:
+        """
+        İşi kuyruğa ekler. Aynı thread'den aynı idempotency key'li bekleyen veya gönderilmekte
+        olan bir iş varsa onu döndürür.
+        Returns: (job dict, yeni oluşturuldu mu)
+        """
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown discount job kind: {kind}")
+        key = idempotency_key(kind, params, _job_scope.get())
+        job_id = "dj_" + uuid.uuid4().hex
+        with self._lock:
+            conn = self._connection()
+            # Eşleşen iş insert ile select arasında tamamlanırsa insert tekrar denenir
+            for _ in range(3):
+                now = time.time()
+                try:
+                    conn.execute(
+                        "INSERT INTO discount_jobs (id, idempotency_key, kind, params, status, next_attempt_at, "
+                        "created_at, updated_at) VALUES (?, ?, ?, ?, 'pending', ?, ?, ?)",
+                        (job_id, key, kind, json.dumps(params, ensure_ascii=False), now, now, now)
+                    )
+                    conn.commit()
+                    created = True
+                    break
+                except sqlite3.IntegrityError:
+                    conn.rollback()
+                    row = conn.execute(
+                        "SELECT id FROM discount_jobs WHERE idempotency_key = ? AND status IN ('pending', 'running')",
+                        (key,)
+                    ).fetchone()
+                    if row is not None:
+                        job_id = row["id"]
+                        created = False
+                        break
+            else:
+                raise RuntimeError("Discount job could not be queued")
+        if created:
+            logger.info("Discount job %s queued (%s)", job_id, kind)
+            self._wake.set()
+        else:
+            logger.info("Duplicate discount request matched existing job %s", job_id)
+        return self.get(job_id), created
+
+    def get(self, job_id: str):
+        """İşin durumunu döndürür; yoksa None."""
+        with self._lock:
+            row = self._connection().execute("SELECT * FROM discount_jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    @staticmethod
+    def _to_dict(row) -> dict:
+        return {
+            "job_id": row["id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "attempts": row["attempts"],
+            "params": json.loads(row["params"]),
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["last_error"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        }
+
+    # ==================== WORKER ====================
+
+    def _run(self):
+        while True:
+            try:
+                self._requeue_expired()
+                while True:
+                    job = self._claim_next()
+                    if job is None:
+                        break
+                    self._process(job)
+            except Exception as e:
+                logger.error("Discount queue worker error: %s", e)
+            self._wake.wait(self._seconds_until_next_due())
+            self._wake.clear()
+
+    def _requeue_expired(self):
+        with self._lock:
+            conn = self._connection()
+            cursor = conn.execute(
+                "UPDATE discount_jobs SET status = 'pending', updated_at = ? "
+                "WHERE status = 'running' AND updated_at < ?",
+                (time.time(), time.time() - DISCOUNT_JOB_LEASE)
+            )
+            conn.commit()
+        if cursor.rowcount:
+            logger.warning("Requeued %d discount jobs with expired lease", cursor.rowcount)
+
+    def _claim_next(self):
+        """Zamanı gelmiş ilk işi 'running' yapıp döndürür (birden fazla süreçte güvenli)."""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT * FROM discount_jobs WHERE status = 'pending' AND next_attempt_at <= ? "
+                "ORDER BY next_attempt_at LIMIT 1", (now,)
+            ).fetchone()
+            if row is None:
+                return None
+            cursor = conn.execute(
+                "UPDATE discount_jobs SET status = 'running', attempts = attempts + 1, updated_at = ? "
+                "WHERE id = ? AND status = 'pending'", (now, row["id"])
+            )
+            conn.commit()
+            if cursor.rowcount == 0:
+                return None
+        job = self._to_dict(row)
+        job["attempts"] += 1
+        return job
+
+    def _seconds_until_next_due(self) -> float:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT MIN(next_attempt_at) FROM discount_jobs WHERE status = 'pending'"
+            ).fetchone()
+        if row[0] is None:
+            return POLL_INTERVAL
+        return min(POLL_INTERVAL, max(0.0, row[0] - time.time()))
+
+    def _process(self, job: dict):
+        try:
+            # Önceki deneme NeoOne'a ulaşmış olabilir; tekrar göndermeden önce kontrol et
+            if job["attempts"] > 1:
+                existing = self._find_submitted(job)
+                if existing is not None:
+                    logger.info("Discount job %s was already created in NeoOne (id %s)", job["job_id"], existing.get("id"))
+                    self._finish(job["job_id"], "succeeded", result={"success": True, "data": existing})
+                    return
+            result = self._submit(job)
+        except Exception as e:
+            retryable = isinstance(e, _Unverifiable) or is_retryable(e)
+            if retryable and job["attempts"] < DISCOUNT_MAX_ATTEMPTS:
+                delay = min(DISCOUNT_RETRY_MAX_DELAY, DISCOUNT_RETRY_DELAY * (2 ** (job["attempts"] - 1)))
+                delay = random.uniform(delay / 2, delay)
+                logger.warning("Discount job %s attempt %d failed (%s), retrying in %.0fs",
+                               job["job_id"], job["attempts"], e, delay)
+                self._retry_later(job["job_id"], str(e), delay)
+            else:
+                logger.error("Discount job %s failed: %s", job["job_id"], e)
+                self._finish(job["job_id"], "failed", error=str(e))
+            return
+
+        if result.get("success"):
+            self._finish(job["job_id"], "succeeded", result=result)
+        else:
+            self._finish(job["job_id"], "failed", result=result,
+                         error=result.get("message") or "NeoOne isteği reddetti")
+
+    def _submit(self, job: dict) -> dict:
+        params = job["params"]
+        marker = job_marker(job["job_id"])
+        if job["kind"] == "discount":
+            return neoone_client.create_discount(
+                name=f"Bot İskonto - {params['product_id']} - {params['customer_group_id']} {marker}", **params
+            )
+        return neoone_client.create_bonus_discount(
+            name=f"Bot Kampanya - {params['product_id']} - {params['buy_quantity']}+{params['bonus_quantity']} {marker}",
+            **params
+        )
+
+    def _find_submitted(self, job: dict):
+        """İşin işaretini taşıyan NeoOne iskontosunu arar."""
+        discounts = neoone_client.get_discounts()
+        if getattr(discounts, "stale", False):
+            raise _Unverifiable("NeoOne iskonto listesi doğrulanamadı")
+        marker = job_marker(job["job_id"])
+        return next((d for d in discounts if marker in (d.get("name") or "")), None)
+
+    def _retry_later(self, job_id: str, error: str, delay: float):
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "UPDATE discount_jobs SET status = 'pending', last_error = ?, next_attempt_at = ?, updated_at = ? "
+                "WHERE id = ?", (error, now + delay, now, job_id)
+            )
+            conn.commit()
+
+    def _finish(self, job_id: str, status: str, result: dict = None, error: str = None):
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "UPDATE discount_jobs SET status = ?, result = ?, last_error = ?, updated_at = ? WHERE id = ?",
+                (status, json.dumps(result, ensure_ascii=False) if result is not None else None, error,
+                 time.time(), job_id)
+            )
+            conn.commit()
+        logger.info("Discount job %s %s", job_id, status)
+
+
+# Singleton instance
+discount_queue = DiscountQueue()
@@ -0,0 +1,292 @@
+"""
+NeoBI Exports
+Ürün satış ve müşteri performans verilerinin CSV / XLSX olarak akış halinde dışa aktarımı.
+
+Satırlar bellekteki ürün kataloğu ve müşteri indeksinden generator ile tek tek
+okunur, çıktı parça parça üretilir; dosyanın tamamı hiçbir zaman bellekte oluşmaz.
+XLSX, openpyxl olmadan zipfile ile yazılır: sayfa XML'i sıkıştırılarak doğrudan
+yanıta akar (inline string'ler, shared strings tablosu yok), bellek kullanımı
+satır sayısından bağımsızdır.
+
+Tool'lar satırları sohbete yazmak yerine imzalı, süreli bir indirme linki döner.
+Link, tarayıcının X-NeoOne-Token gönderemediği indirmeler için HMAC ile imzalanır.
+"""
+
+import io
+import os
+import csv
+import hmac
+import time
+import zipfile
+import hashlib
+import secrets
+import logging
+from datetime import datetime
+from urllib.parse import urlencode
+from xml.sax.saxutils import escape
+
+from .product_catalog import get_product_catalog
+from .customer_index import get_customer_index
+from .shared_cache import shared_cache
+
+logger = logging.getLogger(__name__)
+
+# İndirme linklerini imzalamak için anahtar. Verilmezse üretilip paylaşımlı cache'te tutulur
+# (bkz. _export_secret); cache backend'i paylaşımlı değilse linkler sadece üreten worker'da çalışır
+EXPORT_SECRET = os.getenv("NEOBI_EXPORT_SECRET")
+# Üretilen anahtarın geçerlilik süresi (saniye). Yenilendiğinde eski anahtarla imzalanmış linkler geçersizleşir
+EXPORT_SECRET_TTL = int(os.getenv("NEOBI_EXPORT_SECRET_TTL", str(30 * 24 * 3600)))
+# İndirme linklerinin geçerlilik süresi (saniye)
+EXPORT_LINK_TTL = int(os.getenv("NEOBI_EXPORT_LINK_TTL", "3600"))
+# Linklerin önüne eklenecek adres (örn. https://neobicb.neocortexbe.com). Boşsa göreli link.
+PUBLIC_BASE_URL = os.getenv("NEOBI_PUBLIC_URL", "").rstrip("/")
+# Bu kadar satırda bir çıktı parçası gönderilir
+FLUSH_EVERY = 500
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+class ExportError(ValueError):
+    """Geçersiz dataset, format veya filtre."""
+
+
+# ==================== DATASETS ====================
+
+def _product_rows(category: str = None, q: str = None, threshold: int = None):
+    catalog = get_product_catalog()
+    if threshold is not None:
+        products = catalog.below_quantity(threshold)
+    else:
+        positions = catalog.filter(category, q)
+        products = catalog.products if positions is None else (catalog.products[pos] for pos in positions)
+    header = ("Ürün ID", "Ürün Adı", "Ürün Kodu", "Kategori", "Satış Adedi", "Ciro")
+
+    def rows():
+        for p in products:
+            yield (p.id, p.name, p.code, p.category, p.quantity_sold, p.total_revenue)
+    return header, rows()
+
+
+def _customer_rows(customer_group_name: str = None, city: str = None, district: str = None,
+                   order_by: str = "revenue_desc", limit: int = None):
+    index = get_customer_index()
+    customers = index.iter_query(city=city, district=district, customer_group=customer_group_name,
+                                 descending=(order_by != "revenue_asc"))
+    header = ("Müşteri ID", "Müşteri Adı", "Şehir", "İlçe", "Müşteri Grubu", "Ciro", "Sipariş Sayısı")
+
+    def rows():
+        for i, c in enumerate(customers):
+            if limit is not None and i >= limit:
+                return
+            yield (c.customer_id, c.customer_name, c.city, c.district, c.customer_group_name,
+                   c.total_revenue, c.order_count)
+    return header, rows()
+
+
+# dataset -> (satır fonksiyonu, {filtre: tip})
+EXPORT_DATASETS = {
+    "products": (_product_rows, {"category": str, "q": str}),
+    "low-selling-products": (_product_rows, {"threshold": int}),
+    "customers": (_customer_rows, {"customer_group_name": str, "city": str, "district": str,
+                                   "order_by": str, "limit": int}),
+}
+
+
+def parse_filters(dataset: str, query_params) -> dict:
+    """İstek parametrelerinden dataset'in tanıdığı filtreleri tipleriyle birlikte alır."""
+    if dataset not in EXPORT_DATASETS:
+        raise ExportError(f"Unknown export dataset: {dataset}")
+    _, allowed = EXPORT_DATASETS[dataset]
+    filters = {}
+    for name, kind in allowed.items():
+        value = query_params.get(name)
+        if value in (None, ""):
+            continue
+        try:
+            filters[name] = kind(value)
+        except ValueError:
+            raise ExportError(f"Invalid value for {name}: {value}")
+    return filters
+
+
+def open_export(dataset: str, filters: dict) -> tuple:
+    """(başlık, satır generator'ı). Veri kaynağı burada (çağıran thread'de) yüklenir."""
+    if dataset not in EXPORT_DATASETS:
+        raise ExportError(f"Unknown export dataset: {dataset}")
+    rows_fn, _ = EXPORT_DATASETS[dataset]
+    return rows_fn(**filters)
+
+
+def export_filename(dataset: str, fmt: str) -> str:
+    return f"neobi-{dataset}-{datetime.now().strftime('%Y%m%d-%H%M')}.{fmt}"
+
+
+# ==================== SIGNED LINKS ====================
+
+def _export_secret() -> str:
+    """NEOBI_EXPORT_SECRET veya tüm worker'ların paylaştığı, tek seferde üretilen anahtar."""
+    if EXPORT_SECRET:
+        return EXPORT_SECRET
+    return shared_cache.get_or_set("exports:secret", lambda: secrets.token_hex(32), ttl=EXPORT_SECRET_TTL)
+
+
+def check_export_secret():
+    """Başlangıçta çağrılır; linkler worker'lar arasında doğrulanamayacaksa uyarır."""
+    if not EXPORT_SECRET and not shared_cache.backend.shared:
+        logger.warning("NEOBI_EXPORT_SECRET is not set and the %s cache backend is not shared; "
+                       "export links only verify on the worker that created them", shared_cache.backend.name)
+
+
+def _signature(dataset: str, fmt: str, filters: dict, expires: int) -> str:
+    canonical = f"{dataset}.{fmt}?{urlencode(sorted((k, str(v)) for k, v in filters.items()))}&expires={expires}"
+    return hmac.new(_export_secret().encode("utf-8"), canonical.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def export_link(dataset: str, fmt: str, **filters) -> str:
+    """Filtrelerle birlikte imzalı, EXPORT_LINK_TTL süre geçerli indirme linki."""
+    if fmt not in EXPORT_FORMATS:
+        raise ExportError(f"Unknown export format: {fmt}")
+    filters = {k: v for k, v in filters.items() if v is not None}
+    expires = int(time.time()) + EXPORT_LINK_TTL
+    query = dict(filters, expires=expires, sig=_signature(dataset, fmt, filters, expires))
+    return f"{PUBLIC_BASE_URL}/api/exports/{dataset}.{fmt}?{urlencode(query)}"
+
+
+def verify_link(dataset: str, fmt: str, filters: dict, expires, sig) -> bool:
+    """İmzalı linkin süresi dolmamış ve filtreleri değiştirilmemiş mi?"""
+    if not expires or not sig:
+        return False
+    try:
+        expires = int(expires)
+    except ValueError:
+        return False
+    if expires < time.time():
+        return False
+    return hmac.compare_digest(sig, _signature(dataset, fmt, filters, expires))
+
+
+# ==================== CSV ====================
+
+def iter_csv(header, rows):
+    """CSV çıktısını parça parça üretir. Excel'in Türkçe karakterleri tanıması için UTF-8 BOM ile başlar."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("﻿")
+    writer.writerow(header)
+    for i, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if i % FLUSH_EVERY == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+# ==================== XLSX ====================
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+_SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_SHEET_END = '</sheetData></worksheet>'
+
+# XML 1.0'da izin verilmeyen kontrol karakterleri
+_INVALID_XML_CHARS = dict.fromkeys(c for c in range(32) if c not in (9, 10, 13))
+
+
+class _StreamSink(io.RawIOBase):
+    """zipfile'ın yazdığı baytları biriktiren, seek edilemeyen hedef."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _xlsx_cell(value) -> str:
+    if value is None:
+        return "<c/>"
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f"<c><v>{value}</v></c>"
+    text = escape(str(value).translate(_INVALID_XML_CHARS))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(values) -> str:
+    return "<row>" + "".join(_xlsx_cell(v) for v in values) + "</row>"
+
+
+def iter_xlsx(header, rows, sheet_name: str = "NeoBI"):
+    """Tek sayfalık XLSX dosyasını parça parça üretir."""
+    sink = _StreamSink()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        zf.writestr("_rels/.rels", _ROOT_RELS)
+        zf.writestr("xl/workbook.xml", _WORKBOOK.format(name=escape(sheet_name[:31])))
+        zf.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+        # Boyut önceden bilinmediği için zip64 başlığıyla yazılır
+        with zf.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write((_SHEET_START + _xlsx_row(header)).encode("utf-8"))
+            for i, row in enumerate(rows, 1):
+                sheet.write(_xlsx_row(row).encode("utf-8"))
+                if i % FLUSH_EVERY == 0:
+                    yield sink.drain()
+            sheet.write(_SHEET_END.encode("utf-8"))
+    yield sink.drain()
+
+
+def iter_export(fmt: str, header, rows, sheet_name: str = "NeoBI"):
+    if fmt == "csv":
+        return iter_csv(header, rows)
+    if fmt == "xlsx":
+        return iter_xlsx(header, rows, sheet_name)
+    raise ExportError(f"Unknown export format: {fmt}")
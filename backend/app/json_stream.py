@@ -0,0 +1,129 @@
+"""
+NeoBI Streaming JSON
+Büyük NeoOne yanıtlarındaki kayıt dizisini gövdenin tamamını belleğe almadan,
+parça parça okuyup her kaydı tek tek üretir.
+
+    {"success": true, "data": {"data": [ {...}, {...}, ... ], "totalCount": 123}}
+                                        ^ iter_json_array(chunks, ("data", "data"))
+
+Zarf (envelope) küçüktür ve normal json ile çözülür; sadece hedef dizinin elemanları
+akış halinde çözülür. Gövde doğrudan bir dizi ise path yok sayılır.
+"""
+
+import json
+import codecs
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+# Tüketilen bu kadar karakterden sonra tampon kırpılır
+_COMPACT_THRESHOLD = 1 << 16
+
+
+class _Reader:
+    """Byte chunk'larını UTF-8 olarak çözerek artımlı okunan tampon."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        """Tampona yeni veri ekler; veri kalmadıysa False döner."""
+        if self.eof:
+            return False
+        for chunk in self._chunks:
+            if not chunk:
+                continue
+            text = self._utf8.decode(chunk) if isinstance(chunk, bytes) else chunk
+            if self.pos > _COMPACT_THRESHOLD:
+                self.buf = self.buf[self.pos:]
+                self.pos = 0
+            self.buf += text
+            return True
+        self.buf += self._utf8.decode(b"", final=True)
+        self.eof = True
+        return False
+
+    def peek(self) -> str:
+        """Boşlukları atlayıp sıradaki karakteri döndürür (tüketmez). Veri bittiyse ''."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"JSON stream: '{char}' bekleniyordu, '{self.peek()}' geldi (pos {self.pos})")
+        self.pos += 1
+
+    def value(self):
+        """Sıradaki tam JSON değerini çözer; eksikse daha fazla veri okur."""
+        self.peek()
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self.buf, self.pos)
+                # Tamponun sonunda biten sayı gibi değerler eksik olabilir
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return obj
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self.fill()
+
+
+def iter_json_array(chunks, path=("data",)):
+    """
+    Gövdede path ile gösterilen dizinin elemanlarını sırayla üretir.
+
+    Args:
+        chunks: Byte (veya str) parçaları; örn. response.iter_content(65536)
+        path: Dizinin obje anahtarları üzerinden yolu
+    """
+    reader = _Reader(chunks)
+    if reader.peek() == "[":
+        yield from _iter_array(reader)
+        return
+    yield from _iter_object_path(reader, tuple(path))
+
+
+def _iter_object_path(reader: _Reader, path: tuple):
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+    while True:
+        key = reader.value()
+        reader.expect(":")
+        if key == path[0]:
+            nxt = reader.peek()
+            if len(path) == 1 and nxt == "[":
+                yield from _iter_array(reader)
+            elif len(path) > 1 and nxt == "{":
+                yield from _iter_object_path(reader, path[1:])
+            # Hedef bulundu; gövdenin geri kalanı okunmaz
+            return
+        reader.value()  # İlgisiz zarf alanını atla
+        if reader.peek() == ",":
+            reader.pos += 1
+            continue
+        reader.expect("}")
+        return
+
+
+def _iter_array(reader: _Reader):
+    reader.expect("[")
+    if reader.peek() == "]":
+        reader.pos += 1
+        return
+    while True:
+        yield reader.value()
+        if reader.peek() == ",":
+            reader.pos += 1
+            continue
+        reader.expect("]")
+        return
@@ -0,0 +1,220 @@
+"""
+NeoBI JWT Auth
+NeoOne kullanıcı token'larının (JWT) NeoOne'a gitmeden, yerelde doğrulanması.
+
+- HS256: NEOONE_JWT_SECRET ile HMAC-SHA256
+- RS256: NEOONE_JWKS_URL'den (veya NEOONE_JWKS dosya/JSON) alınan public key'lerle
+  RSASSA-PKCS1-v1_5 + SHA-256. Anahtarlar periyodik olarak, bilinmeyen bir `kid`
+  geldiğinde de yenilenir; her durumda (JWKS erişilemezken dahil) en fazla
+  JWKS_MIN_REFRESH_INTERVAL'de bir istek yapılır
+- exp / nbf (NEOONE_JWT_LEEWAY toleransıyla), aud ve iss kontrolleri
+
+verify() üç sonuçtan birini döner: True (geçerli), False (kesin geçersiz: imza,
+süre, audience...) veya None (yerelde karar verilemiyor: JWT değil, anahtar
+tanımlı değil, bilinmeyen kid/alg). None durumunda NeoOneClient eski /Users
+kontrolüne düşer (NEOONE_TOKEN_REMOTE_FALLBACK=false ile kapatılabilir).
+
+Test için: python -m app.jwt_stub (JWKS sunan ve token üreten yerel sunucu)
+"""
+
+import os
+import json
+import hmac
+import time
+import base64
+import hashlib
+import logging
+import threading
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+JWT_SECRET = os.getenv("NEOONE_JWT_SECRET")
+JWKS_URL = os.getenv("NEOONE_JWKS_URL")
+# JWKS dosya yolu veya doğrudan JSON içeriği (URL yerine statik anahtar için)
+JWKS_STATIC = os.getenv("NEOONE_JWKS")
+JWKS_REFRESH_INTERVAL = int(os.getenv("NEOONE_JWKS_REFRESH", "3600"))
+# Bilinmeyen kid geldiğinde JWKS en fazla bu sıklıkla yeniden çekilir (saniye)
+JWKS_MIN_REFRESH_INTERVAL = 60
+JWT_AUDIENCE = os.getenv("NEOONE_JWT_AUDIENCE")
+JWT_ISSUER = os.getenv("NEOONE_JWT_ISSUER")
+JWT_LEEWAY = int(os.getenv("NEOONE_JWT_LEEWAY", "30"))
+
+# SHA-256 DigestInfo DER öneki (RFC 8017, EMSA-PKCS1-v1_5)
+_SHA256_DIGEST_INFO = bytes.fromhex("3031300d060960864801650304020105000420")
+
+
+def b64url_decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def b64url_encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64url_int(data: str) -> int:
+    return int.from_bytes(b64url_decode(data), "big")
+
+
+def rsa_pkcs1_sha256_verify(message: bytes, signature: bytes, n: int, e: int) -> bool:
+    """RSASSA-PKCS1-v1_5 / SHA-256 imza doğrulaması (sadece public key işlemi)."""
+    k = (n.bit_length() + 7) // 8
+    if len(signature) != k:
+        return False
+    s = int.from_bytes(signature, "big")
+    if s >= n:
+        return False
+    encoded = pow(s, e, n).to_bytes(k, "big")
+    digest_info = _SHA256_DIGEST_INFO + hashlib.sha256(message).digest()
+    expected = b"\x00\x01" + b"\xff" * (k - len(digest_info) - 3) + b"\x00" + digest_info
+    return hmac.compare_digest(encoded, expected)
+
+
+class TokenVerifier:
+    """JWT'leri yapılandırılmış anahtarlarla yerelde doğrular."""
+
+    def __init__(self, secret: str = JWT_SECRET, jwks_url: str = JWKS_URL, jwks_static: str = JWKS_STATIC,
+                 audience: str = JWT_AUDIENCE, issuer: str = JWT_ISSUER, leeway: int = JWT_LEEWAY):
+        self.secret = secret.encode("utf-8") if secret else None
+        self.jwks_url = jwks_url
+        self.audience = audience
+        self.issuer = issuer
+        self.leeway = leeway
+        self._keys = {}  # kid -> (n, e)
+        self._keys_loaded_at = 0.0
+        self._refresh_attempted_at = None  # Son JWKS çekme denemesi (başarılı veya değil)
+        self._keys_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self.counts = {"valid": 0, "invalid": 0, "undecided": 0}
+        if jwks_static:
+            self._set_keys(self._load_static_jwks(jwks_static))
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.secret or self.jwks_url or self._keys)
+
+    def verify(self, token: str):
+        """True: geçerli, False: geçersiz, None: yerelde karar verilemiyor."""
+        result = self._verify(token)
+        self.counts["undecided" if result is None else "valid" if result else "invalid"] += 1
+        return result
+
+    def _verify(self, token: str):
+        if not self.enabled:
+            return None
+        parts = token.split(".")
+        if len(parts) != 3:
+            return None  # JWT değil (opak token)
+        try:
+            header = json.loads(b64url_decode(parts[0]))
+            claims = json.loads(b64url_decode(parts[1]))
+            signature = b64url_decode(parts[2])
+        except (ValueError, UnicodeDecodeError):
+            return None
+        if not isinstance(header, dict) or not isinstance(claims, dict):
+            return None
+
+        signing_input = f"{parts[0]}.{parts[1]}".encode("ascii")
+        alg = header.get("alg")
+        if alg == "HS256":
+            if not self.secret:
+                return None
+            expected = hmac.new(self.secret, signing_input, hashlib.sha256).digest()
+            if not hmac.compare_digest(expected, signature):
+                logger.debug("JWT signature mismatch (HS256)")
+                return False
+        elif alg == "RS256":
+            key = self._rsa_key(header.get("kid"))
+            if key is None:
+                return None
+            if not rsa_pkcs1_sha256_verify(signing_input, signature, *key):
+                logger.debug("JWT signature mismatch (RS256, kid=%s)", header.get("kid"))
+                return False
+        else:
+            # "none" dahil desteklenmeyen algoritmalar yerelde kabul edilmez
+            return None
+
+        return self._check_claims(claims)
+
+    def _check_claims(self, claims: dict) -> bool:
+        now = time.time()
+        exp = claims.get("exp")
+        if not isinstance(exp, (int, float)) or now > exp + self.leeway:
+            logger.debug("JWT expired or without exp")
+            return False
+        nbf = claims.get("nbf")
+        if isinstance(nbf, (int, float)) and now < nbf - self.leeway:
+            return False
+        if self.audience:
+            aud = claims.get("aud")
+            audiences = aud if isinstance(aud, list) else [aud]
+            if self.audience not in audiences:
+                logger.debug("JWT audience mismatch: %s", aud)
+                return False
+        if self.issuer and claims.get("iss") != self.issuer:
+            logger.debug("JWT issuer mismatch: %s", claims.get("iss"))
+            return False
+        return True
+
+    # ==================== JWKS ====================
+
+    def _rsa_key(self, kid):
+        with self._keys_lock:
+            keys = self._keys
+            age = time.monotonic() - self._keys_loaded_at
+        if self.jwks_url and (not keys or age > JWKS_REFRESH_INTERVAL or kid not in keys):
+            self._maybe_refresh()
+            with self._keys_lock:
+                keys = self._keys
+        if kid is None and len(keys) == 1:
+            return next(iter(keys.values()))
+        return keys.get(kid)
+
+    def _maybe_refresh(self):
+        """
+        JWKS'i en fazla JWKS_MIN_REFRESH_INTERVAL'de bir çeker; anahtar hiç yokken
+        (ör. JWKS erişilemezken) de. Başka bir thread zaten çekiyorsa beklemeden döner.
+        """
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            now = time.monotonic()
+            if (self._refresh_attempted_at is not None and
+                    now - self._refresh_attempted_at < JWKS_MIN_REFRESH_INTERVAL):
+                return
+            self._refresh_attempted_at = now
+            self.refresh_keys()
+        finally:
+            self._refresh_lock.release()
+
+    def refresh_keys(self):
+        """JWKS'i URL'den yeniden çeker. Hata durumunda eldeki anahtarlar korunur."""
+        try:
+            response = requests.get(self.jwks_url, timeout=5)
+            response.raise_for_status()
+            self._set_keys(response.json())
+            logger.info("JWKS refreshed: %d keys", len(self._keys))
+        except Exception as e:
+            logger.warning("JWKS refresh failed: %s", e)
+
+    def _set_keys(self, jwks: dict):
+        keys = {}
+        for jwk in jwks.get("keys", []):
+            if jwk.get("kty") != "RSA" or jwk.get("use", "sig") != "sig":
+                continue
+            keys[jwk.get("kid")] = (_b64url_int(jwk["n"]), _b64url_int(jwk["e"]))
+        with self._keys_lock:
+            self._keys = keys
+            self._keys_loaded_at = time.monotonic()
+
+    @staticmethod
+    def _load_static_jwks(value: str) -> dict:
+        if value.lstrip().startswith("{"):
+            return json.loads(value)
+        with open(value, encoding="utf-8") as f:
+            return json.load(f)
+
+
+# Singleton instance
+token_verifier = TokenVerifier()
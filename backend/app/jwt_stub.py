@@ -0,0 +1,141 @@
+"""
+NeoBI JWT Stub
+Yerel JWT doğrulamasını NeoOne olmadan test etmek için anahtar sunucusu.
+
+    python -m app.jwt_stub --port 8765
+
+- GET /.well-known/jwks.json   RS256 public key (JWKS)
+- GET /token?sub=42&aud=neobi&ttl=3600[&iss=...][&alg=HS256]
+      İmzalı test token'ı. alg=HS256 için NEOONE_JWT_SECRET kullanılır.
+
+Backend'i NEOONE_JWKS_URL=http://127.0.0.1:8765/.well-known/jwks.json ile başlatıp
+üretilen token'ı X-NeoOne-Token başlığında gönderin. Anahtar her başlatmada yeniden üretilir.
+"""
+
+import os
+import json
+import time
+import hmac
+import hashlib
+import secrets
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from .jwt_auth import b64url_encode, _SHA256_DIGEST_INFO
+
+_SMALL_PRIMES = [p for p in range(3, 2000, 2) if all(p % d for d in range(3, int(p ** 0.5) + 1, 2))]
+
+
+def _is_probable_prime(n: int, rounds: int = 40) -> bool:
+    if any(n % p == 0 for p in _SMALL_PRIMES):
+        return n in _SMALL_PRIMES
+    d, r = n - 1, 0
+    while d % 2 == 0:
+        d //= 2
+        r += 1
+    for _ in range(rounds):
+        x = pow(secrets.randbelow(n - 3) + 2, d, n)
+        if x in (1, n - 1):
+            continue
+        for _ in range(r - 1):
+            x = pow(x, 2, n)
+            if x == n - 1:
+                break
+        else:
+            return False
+    return True
+
+
+def _random_prime(bits: int) -> int:
+    while True:
+        candidate = secrets.randbits(bits) | (1 << (bits - 1)) | (1 << (bits - 2)) | 1
+        if _is_probable_prime(candidate):
+            return candidate
+
+
+def generate_rsa_key(bits: int = 2048, e: int = 65537) -> tuple:
+    """(n, e, d) - sadece test amaçlı."""
+    while True:
+        p, q = _random_prime(bits // 2), _random_prime(bits // 2)
+        phi = (p - 1) * (q - 1)
+        if p != q and phi % e:
+            n = p * q
+            if n.bit_length() == bits:
+                return n, e, pow(e, -1, phi)
+
+
+def _int_b64(value: int) -> str:
+    return b64url_encode(value.to_bytes((value.bit_length() + 7) // 8, "big"))
+
+
+class StubKeys:
+    def __init__(self, bits: int):
+        self.kid = secrets.token_hex(8)
+        self.n, self.e, self.d = generate_rsa_key(bits)
+
+    def jwks(self) -> dict:
+        return {"keys": [{"kty": "RSA", "use": "sig", "alg": "RS256", "kid": self.kid,
+                          "n": _int_b64(self.n), "e": _int_b64(self.e)}]}
+
+    def issue(self, claims: dict, alg: str = "RS256") -> str:
+        header = {"alg": alg, "typ": "JWT"}
+        if alg == "RS256":
+            header["kid"] = self.kid
+        signing_input = f"{b64url_encode(json.dumps(header).encode())}.{b64url_encode(json.dumps(claims).encode())}"
+        if alg == "HS256":
+            secret = os.getenv("NEOONE_JWT_SECRET", "").encode("utf-8")
+            signature = hmac.new(secret, signing_input.encode("ascii"), hashlib.sha256).digest()
+        else:
+            k = (self.n.bit_length() + 7) // 8
+            digest_info = _SHA256_DIGEST_INFO + hashlib.sha256(signing_input.encode("ascii")).digest()
+            encoded = b"\x00\x01" + b"\xff" * (k - len(digest_info) - 3) + b"\x00" + digest_info
+            signature = pow(int.from_bytes(encoded, "big"), self.d, self.n).to_bytes(k, "big")
+        return f"{signing_input}.{b64url_encode(signature)}"
+
+
+def _handler(keys: StubKeys):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = {k: v[0] for k, v in parse_qs(url.query).items()}
+            if url.path == "/.well-known/jwks.json":
+                self._send(keys.jwks())
+            elif url.path == "/token":
+                now = int(time.time())
+                claims = {"sub": params.get("sub", "test-user"), "iat": now,
+                          "exp": now + int(params.get("ttl", "3600"))}
+                for claim in ("aud", "iss"):
+                    if claim in params:
+                        claims[claim] = params[claim]
+                self._send({"token": keys.issue(claims, params.get("alg", "RS256"))})
+            else:
+                self.send_error(404)
+
+        def _send(self, payload: dict):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NeoBI JWT test key server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--bits", type=int, default=2048)
+    args = parser.parse_args()
+
+    keys = StubKeys(args.bits)
+    server = ThreadingHTTPServer((args.host, args.port), _handler(keys))
+    print(f"JWKS:  http://{args.host}:{args.port}/.well-known/jwks.json")
+    print(f"Token: http://{args.host}:{args.port}/token?sub=42&ttl=3600")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+NeoBI Logging
+Seviyeli, kuyruk tabanlı loglama. Log kayıtları istek thread'inde sadece kuyruğa
+atılır; stdout'a yazma işini arka plandaki QueueListener thread'i yapar.
+
+Tool/API payload'ları (satış raporları, iskonto verileri) varsayılan olarak loglanmaz.
+İstek bazında `X-NeoBI-Debug: 1` header'ı ile veya global DEBUG seviyesinde açılır,
+her durumda kısaltılarak yazılır.
+"""
+
+import os
+import atexit
+import queue
+import random
+import logging
+import logging.handlers
+from contextvars import ContextVar
+
+LOG_LEVEL = os.getenv("NEOBI_LOG_LEVEL", "INFO").upper()
+# Payload loglarında yazılacak maksimum karakter sayısı
+PAYLOAD_LOG_LIMIT = int(os.getenv("NEOBI_PAYLOAD_LOG_LIMIT", "2000"))
+# Global DEBUG modunda payload'ların ne kadarının loglanacağı (0.0 - 1.0)
+PAYLOAD_SAMPLE_RATE = float(os.getenv("NEOBI_PAYLOAD_SAMPLE_RATE", "1.0"))
+
+LOG_FORMAT = "%(asctime)s %(levelname)s [%(name)s] %(message)s"
+
+# İstek bazında payload debug bayrağı
+_payload_debug = ContextVar("neobi_payload_debug", default=False)
+
+_listener = None
+
+
+def setup_logging():
+    """
+    'app' logger'ını kuyruk tabanlı handler ile yapılandırır.
+    Birden fazla çağrılırsa sadece ilk çağrı etkilidir.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    app_logger = logging.getLogger("app")
+    app_logger.setLevel(LOG_LEVEL)
+    app_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    app_logger.propagate = False
+
+
+def enable_payload_debug(enabled: bool = True):
+    """Mevcut istek için payload loglamayı açar. reset_payload_debug için token döner."""
+    return _payload_debug.set(enabled)
+
+
+def reset_payload_debug(token):
+    """enable_payload_debug ile yapılan değişikliği geri alır."""
+    _payload_debug.reset(token)
+
+
+def payload_debug_enabled() -> bool:
+    return _payload_debug.get()
+
+
+class Payload:
+    """
+    Payload'ı sadece log kaydı gerçekten yazılacaksa string'e çevirir ve kısaltır.
+    """
+    __slots__ = ("value", "limit")
+
+    def __init__(self, value, limit: int = PAYLOAD_LOG_LIMIT):
+        self.value = value
+        self.limit = limit
+
+    def __str__(self):
+        text = self.value if isinstance(self.value, str) else repr(self.value)
+        if len(text) <= self.limit:
+            return text
+        return f"{text[:self.limit]}... (+{len(text) - self.limit} karakter)"
+
+
+def log_payload(logger: logging.Logger, label: str, value):
+    """
+    Büyük payload'ları loglar.
+    - İstek bazında debug açıksa: logger seviyesinden bağımsız olarak yazılır
+    - Global DEBUG seviyesindeyse: PAYLOAD_SAMPLE_RATE oranında örneklenir
+    - Aksi halde hiçbir formatlama yapılmaz
+    """
+    if _payload_debug.get():
+        record = logger.makeRecord(logger.name, logging.DEBUG, "(payload)", 0,
+                                   "%s: %s", (label, Payload(value)), None)
+        logger.handle(record)
+    elif logger.isEnabledFor(logging.DEBUG) and random.random() < PAYLOAD_SAMPLE_RATE:
+        logger.debug("%s: %s", label, Payload(value))
@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from typing import List, Optional
 
 class StartChatRequest(BaseModel):
     pass
@@ -9,3 +10,13 @@ class ChatMessageRequest(BaseModel):
 
 class ChatResponse(BaseModel):
     response: str
+
+class HistoryMessage(BaseModel):
+    id: int
+    role: str
+    content: str
+    created_at: float
+
+class ChatHistoryResponse(BaseModel):
+    messages: List[HistoryMessage]
+    next_cursor: Optional[int] = None
@@ -0,0 +1,207 @@
+"""
+NeoBI Prefetch
+Yeni bir sohbet başladığında (/api/chat/start) kullanıcının ilk turn'de büyük
+ihtimalle ihtiyaç duyacağı verileri arka planda önceden yükler: satış raporu
+(ürün kataloğu), müşteri grupları ve aktif iskontolar.
+
+- İstekler kullanıcı anahtarı (token hash'i / IP, bkz. admission.user_key_for)
+  bazında tutulur; aynı kullanıcı için PREFETCH_SESSION_TTL içinde tekrar yapılmaz
+- Tek bir düşük öncelikli worker çalışır. Çalışan turn sayısı PREFETCH_BUSY_TURNS'e
+  ulaştığında bekler, PREFETCH_MAX_DEFER saniye içinde yer açılmazsa iş bırakılır;
+  böylece prefetch devam eden turn'lerle NeoOne bağlantısı ve CPU için yarışmaz
+- Veriler mevcut cache'lere yazılır (NeoOne servis hesabıyla okunduğu için tüm
+  kullanıcılar için aynıdır); kullanıcı bazında sadece neyin ısıtıldığı tutulur
+
+Hit rate: Turn içinde bir veri ilk kez kullanıldığında (record_use) o kullanıcı
+için önceden ısıtılmış ve hala geçerliyse hit, değilse miss sayılır.
+"""
+
+import os
+import time
+import queue
+import logging
+import threading
+from contextvars import ContextVar
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_ENABLED = os.getenv("NEOBI_PREFETCH", "true").lower() == "true"
+# Aynı kullanıcı için prefetch kaydının geçerli olduğu süre (saniye)
+PREFETCH_SESSION_TTL = int(os.getenv("NEOBI_PREFETCH_SESSION_TTL", "600"))
+# Bu kadar turn çalışırken prefetch bekler
+PREFETCH_BUSY_TURNS = int(os.getenv("NEOBI_PREFETCH_BUSY_TURNS", "4"))
+# Yoğunlukta en fazla bu kadar beklenir, sonra prefetch bırakılır (saniye)
+PREFETCH_MAX_DEFER = float(os.getenv("NEOBI_PREFETCH_MAX_DEFER", "10"))
+PREFETCH_MAX_QUEUE = 100
+BUSY_POLL_INTERVAL = 0.25
+
+_scope = ContextVar("neobi_prefetch_scope", default=None)
+
+
+def _sales_snapshot():
+    from .product_catalog import get_product_catalog, catalog_expires_at
+    get_product_catalog()
+    return catalog_expires_at()
+
+
+def _customer_groups():
+    from .tools import _get_customer_groups_cached, CUSTOMER_GROUPS_TTL
+    _get_customer_groups_cached()
+    return time.monotonic() + CUSTOMER_GROUPS_TTL
+
+
+def _active_discounts():
+    from .tools import _get_active_discounts_cached, active_discounts_expires_at
+    _get_active_discounts_cached()
+    return active_discounts_expires_at()
+
+
+# dataset -> yükleme fonksiyonu (cache'in geçerlilik sonunu time.monotonic() cinsinden döner)
+PREFETCH_DATASETS = {
+    "sales_snapshot": _sales_snapshot,
+    "customer_groups": _customer_groups,
+    "active_discounts": _active_discounts,
+}
+
+
+def _busy_turns() -> int:
+    from .admission import admission_controller
+    return admission_controller.stats()["active"]
+
+
+def set_scope(user_key: str):
+    """Mevcut istek (turn) için kullanıcı anahtarını ayarlar. reset_scope için token döner."""
+    return _scope.set(user_key)
+
+
+def reset_scope(token):
+    _scope.reset(token)
+
+
+class Prefetcher:
+    """Kullanıcı bazlı, düşük öncelikli arka plan prefetch'i."""
+
+    def __init__(self, datasets: dict = PREFETCH_DATASETS, busy_turns=_busy_turns):
+        self.datasets = datasets
+        self._busy_turns = busy_turns
+        self._queue = queue.Queue(maxsize=PREFETCH_MAX_QUEUE)
+        self._sessions = {}  # user_key -> {"created": t, "warm": {dataset: geçerlilik sonu}, "used": set()}
+        self._lock = threading.Lock()
+        self._worker = None
+        self.counts = {"requested": 0, "deduplicated": 0, "dropped": 0, "deferred": 0,
+                       "skipped_busy": 0, "failed": 0, "wasted": 0}
+        self.hits = {name: 0 for name in datasets}
+        self.misses = {name: 0 for name in datasets}
+
+    def start(self):
+        if self._worker is None and PREFETCH_ENABLED:
+            self._worker = threading.Thread(target=self._run, name="neobi-prefetch", daemon=True)
+            self._worker.start()
+
+    def request(self, user_key: str) -> bool:
+        """Kullanıcı için prefetch'i kuyruğa alır. Yeni iş eklendiyse True."""
+        if self._worker is None:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            self.counts["requested"] += 1
+            self._expire_sessions(now)
+            if user_key in self._sessions:
+                self.counts["deduplicated"] += 1
+                return False
+            self._sessions[user_key] = {"created": now, "warm": {}, "used": set()}
+        try:
+            self._queue.put_nowait(user_key)
+        except queue.Full:
+            with self._lock:
+                self.counts["dropped"] += 1
+            return False
+        return True
+
+    def record_use(self, dataset: str):
+        """Turn içinde dataset'in ilk kullanımında hit/miss sayar. Turn dışında etkisizdir."""
+        user_key = _scope.get()
+        if user_key is None or dataset not in self.hits:
+            return
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(user_key)
+            if session is None or dataset in session["used"]:
+                return
+            session["used"].add(dataset)
+            valid_until = session["warm"].get(dataset)
+            if valid_until is not None and now < valid_until:
+                self.hits[dataset] += 1
+            else:
+                self.misses[dataset] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            datasets = {}
+            for name in self.datasets:
+                hits, misses = self.hits[name], self.misses[name]
+                datasets[name] = {"hits": hits, "misses": misses,
+                                  "hit_rate": round(hits / (hits + misses), 3) if hits + misses else None}
+            total_hits, total_misses = sum(self.hits.values()), sum(self.misses.values())
+            return {
+                "enabled": self._worker is not None,
+                "queued": self._queue.qsize(),
+                "sessions": len(self._sessions),
+                "hit_rate": (round(total_hits / (total_hits + total_misses), 3)
+                             if total_hits + total_misses else None),
+                "datasets": datasets,
+                **self.counts,
+            }
+
+    def _expire_sessions(self, now: float):
+        expired = [key for key, s in self._sessions.items() if now - s["created"] > PREFETCH_SESSION_TTL]
+        for key in expired:
+            session = self._sessions.pop(key)
+            self.counts["wasted"] += len(set(session["warm"]) - session["used"])
+
+    def _wait_for_idle(self) -> bool:
+        """Çalışan turn sayısı eşiğin altına inene kadar bekler. Süre dolarsa False."""
+        if self._busy_turns() < PREFETCH_BUSY_TURNS:
+            return True
+        with self._lock:
+            self.counts["deferred"] += 1
+        deadline = time.monotonic() + PREFETCH_MAX_DEFER
+        while time.monotonic() < deadline:
+            time.sleep(BUSY_POLL_INTERVAL)
+            if self._busy_turns() < PREFETCH_BUSY_TURNS:
+                return True
+        return False
+
+    def _run(self):
+        while True:
+            user_key = self._queue.get()
+            try:
+                self._prefetch(user_key)
+            except Exception:
+                logger.exception("Prefetch for %s crashed", user_key)
+            finally:
+                self._queue.task_done()
+
+    def _prefetch(self, user_key: str):
+        for name, load in self.datasets.items():
+            if not self._wait_for_idle():
+                with self._lock:
+                    self.counts["skipped_busy"] += 1
+                logger.debug("Prefetch for %s skipped: too many turns in flight", user_key)
+                return
+            try:
+                valid_until = load()
+            except Exception as e:
+                # Turn'ün kendisi veriyi tekrar isteyecek; burada sadece sayılır
+                logger.warning("Prefetch %s failed: %s", name, e)
+                with self._lock:
+                    self.counts["failed"] += 1
+                continue
+            with self._lock:
+                session = self._sessions.get(user_key)
+                if session is not None:
+                    session["warm"][name] = valid_until
+
+
+# Singleton instance
+prefetcher = Prefetcher()
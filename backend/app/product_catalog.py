@@ -0,0 +1,203 @@
+"""
+NeoBI Product Catalog
+Ürün satış raporundan türetilen, bellekte tutulan ürün kataloğu (snapshot).
+
+- Ürünler product_id'ye göre tekilleştirilir; [BONUS]/[BEDELSİZ] satırlar toplamlara
+  dahil edilmez
+- Ürün adları için trigram indeksi: ad araması her ürünü taramak yerine sorgunun
+  trigram'larının kesişimindeki adayları kontrol eder
+- Kategori (ürün grubu) indeksi
+- Her snapshot'ın bir `version`'ı vardır (rapor gövdesinin özeti); /api/products
+  ETag'leri buna bağlıdır
+- Ham rapor paylaşımlı cache'ten (bkz. shared_cache) okunur; birden fazla worker
+  varsa raporu sadece biri NeoOne'dan çeker
+
+/api/products ve search_product tool'u bu katalogdan cevaplanır.
+"""
+
+import os
+import time
+import bisect
+import hashlib
+import logging
+import threading
+
+from .api_client import neoone_client
+from .customer_index import normalize_key
+from .prefetch import prefetcher
+from .shared_cache import shared_cache, not_stale
+
+logger = logging.getLogger(__name__)
+
+# Snapshot'ın yeniden oluşturulma süresi (saniye)
+PRODUCT_SNAPSHOT_TTL = int(os.getenv("NEOBI_PRODUCT_SNAPSHOT_TTL", "300"))
+
+PRODUCT_FIELDS = ("id", "name", "code", "category", "units", "quantity_sold", "total_revenue")
+
+
+class CatalogProduct:
+    """Katalogdaki tekil ürün (birim bazlı rapor satırlarının toplamı)."""
+    __slots__ = ("id", "name", "code", "category", "units", "quantity_sold", "total_revenue")
+
+    def __init__(self, record):
+        self.id = record.product_id
+        self.name = record.product_name
+        self.code = record.product_code
+        self.category = record.product_group_name
+        self.units = []
+        self.quantity_sold = 0
+        self.total_revenue = 0
+
+    def to_dict(self, fields=PRODUCT_FIELDS) -> dict:
+        return {field: getattr(self, field) for field in fields}
+
+
+def _trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class ProductCatalog:
+    """Ürün listesi + kategori ve trigram ad indeksi. Ürünler id sırasındadır."""
+
+    def __init__(self, records: list):
+        self.source = records
+        products = {}
+        for r in records:
+            if r.product_id is None:
+                continue
+            product = products.get(r.product_id)
+            if product is None:
+                product = products[r.product_id] = CatalogProduct(r)
+            # Bonus satırları ayrı isimle gelebilir; ürün adı bedelli satırdan alınır
+            if r.is_free_goods:
+                continue
+            if product.name != r.product_name and ("[BONUS]" in product.name or "[BEDELSİZ]" in product.name):
+                product.name = r.product_name
+            product.quantity_sold += r.quantity_sold or 0
+            product.total_revenue += r.total_sales or 0
+            if r.unit_of_measure_name not in product.units:
+                product.units.append(r.unit_of_measure_name)
+
+        self.products = sorted(products.values(), key=lambda p: p.id)
+        self._ids = [p.id for p in self.products]
+        self._names = [normalize_key(p.name) for p in self.products]
+        self._by_category = {}
+        self._trigram_index = {}
+        for pos, product in enumerate(self.products):
+            self._by_category.setdefault(normalize_key(product.category), []).append(pos)
+            for gram in _trigrams(self._names[pos]):
+                self._trigram_index.setdefault(gram, []).append(pos)
+
+        digest = getattr(records, "digest", None)
+        if digest is None:
+            digest = hashlib.sha256(repr([(p.id, p.name, p.quantity_sold, p.total_revenue)
+                                          for p in self.products]).encode("utf-8")).hexdigest()
+        self.version = digest[:16]
+        self._ranked = None
+        self._ranked_quantities = None
+
+    def __len__(self):
+        return len(self.products)
+
+    def ranked_by_quantity(self) -> list:
+        """
+        Bedelli satışı olan ürünler, satış adedine göre artan sırada.
+        Snapshot başına bir kez sıralanır.
+        """
+        if self._ranked is None:
+            # units sadece bedelli satırlardan dolar; sadece bonus satırı olan ürünler sıralamaya girmez
+            self._ranked = sorted((p for p in self.products if p.units), key=lambda p: p.quantity_sold)
+            self._ranked_quantities = [p.quantity_sold for p in self._ranked]
+        return self._ranked
+
+    def below_quantity(self, threshold) -> list:
+        """Satış adedi threshold'un altındaki ürünler (artan sırada)."""
+        ranked = self.ranked_by_quantity()
+        return ranked[:bisect.bisect_left(self._ranked_quantities, threshold)]
+
+    def search(self, query: str) -> list:
+        """Adında query geçen ürünlerin pozisyonları (id sırasında)."""
+        key = normalize_key(query)
+        if len(key) < 3:
+            return [pos for pos, name in enumerate(self._names) if key in name]
+        postings = sorted((self._trigram_index.get(gram, ()) for gram in _trigrams(key)), key=len)
+        if not postings[0]:
+            return []
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                return []
+        return sorted(pos for pos in candidates if key in self._names[pos])
+
+    def filter(self, category: str = None, query: str = None) -> list:
+        """Kategori (tam eşleşme, yoksa parça) ve ad filtresine uyan pozisyonlar."""
+        positions = None
+        if category:
+            key = normalize_key(category)
+            keys = [key] if key in self._by_category else [k for k in self._by_category if key in k]
+            positions = sorted(pos for k in keys for pos in self._by_category[k])
+        if query:
+            matches = self.search(query)
+            if positions is None:
+                positions = matches
+            else:
+                allowed = set(positions)
+                positions = [pos for pos in matches if pos in allowed]
+        return positions
+
+    def page(self, cursor=None, limit: int = 50, category: str = None, query: str = None) -> tuple:
+        """
+        id sırasında cursor'dan sonraki `limit` ürün.
+        Returns: (ürünler, next_cursor, toplam eşleşme) - next_cursor son ürünün id'si, sayfa yoksa None
+        """
+        positions = self.filter(category, query)
+        start = 0 if cursor is None else bisect.bisect_right(self._ids, cursor)
+        if positions is None:
+            total = len(self.products)
+            selected = range(start, min(start + limit, total))
+            has_more = start + limit < total
+        else:
+            total = len(positions)
+            first = bisect.bisect_left(positions, start)
+            selected = positions[first:first + limit]
+            has_more = first + limit < total
+        items = [self.products[pos] for pos in selected]
+        next_cursor = items[-1].id if has_more and items else None
+        return items, next_cursor, total
+
+
+_catalog = None
+_catalog_built_at = 0.0
+_catalog_lock = threading.Lock()
+
+
+def _fetch_product_sales() -> tuple:
+    return time.time(), neoone_client.get_product_sales()
+
+
+def get_product_catalog() -> ProductCatalog:
+    """Katalog snapshot'ını cache'den döndürür; süresi dolduysa raporu çekip yeniden oluşturur."""
+    global _catalog, _catalog_built_at
+    prefetcher.record_use("sales_snapshot")
+    if _catalog is not None and time.monotonic() - _catalog_built_at < PRODUCT_SNAPSHOT_TTL:
+        return _catalog
+    with _catalog_lock:
+        if _catalog is not None and time.monotonic() - _catalog_built_at < PRODUCT_SNAPSHOT_TTL:
+            return _catalog
+        # Rapor worker'lar arasında paylaşılır; snapshot'ın yaşı raporun çekildiği andan sayılır
+        fetched_at, records = shared_cache.get_or_set("product_sales_report", _fetch_product_sales,
+                                                      ttl=PRODUCT_SNAPSHOT_TTL, cacheable=lambda v: not_stale(v[1]))
+        started = time.perf_counter()
+        catalog = ProductCatalog(records)
+        logger.info("Product catalog built: %d products (version %s) in %.1f ms", len(catalog), catalog.version,
+                    (time.perf_counter() - started) * 1000)
+        # Eski (stale) veriden oluşan snapshot cache'lenmez; bir sonraki istekte tekrar denenir
+        if not getattr(records, "stale", False):
+            _catalog, _catalog_built_at = catalog, time.monotonic() - max(time.time() - fetched_at, 0.0)
+        return catalog
+
+
+def catalog_expires_at() -> float:
+    """Cache'teki snapshot'ın geçerlilik sonu (time.monotonic() cinsinden)."""
+    return _catalog_built_at + PRODUCT_SNAPSHOT_TTL if _catalog is not None else 0.0
@@ -0,0 +1,138 @@
+"""
+NeoBI Turn Profiler
+Tek bir chat turn'ü için isteğe bağlı örnekleme (sampling) profiler'ı.
+
+Profiler açıldığında arka plandaki bir thread, turn'ü çalıştıran thread'in stack'ini
+belirli aralıklarla okur ve "collapsed stack" formatında (flamegraph.pl / speedscope
+ile açılabilir) diske kaydeder. Profil istenmediği sürece hiçbir thread başlatılmaz,
+yani normal isteklerde ek maliyet yoktur.
+"""
+
+import os
+import sys
+import time
+import uuid
+import logging
+import threading
+from collections import Counter
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = os.getenv("NEOBI_PROFILE_DIR", os.path.join(os.path.dirname(__file__), "..", "profiles"))
+PROFILE_INTERVAL = float(os.getenv("NEOBI_PROFILE_INTERVAL", "0.005"))  # 5 ms
+PROFILE_MAX_FILES = int(os.getenv("NEOBI_PROFILE_MAX_FILES", "50"))
+PROFILE_FILE_SUFFIX = ".collapsed.txt"
+
+
+class SamplingProfiler:
+    """
+    Verilen thread'in stack'ini periyodik olarak örnekler.
+    thread_id verilmezse start() çağıran thread profillenir.
+    """
+
+    def __init__(self, thread_id: int = None, interval: float = PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self.sample_count = 0
+        self.started_at = None
+        self.duration = 0.0
+        self._stop_event = threading.Event()
+        self._sampler = None
+
+    def start(self):
+        if self.thread_id is None:
+            self.thread_id = threading.get_ident()
+        self.started_at = time.perf_counter()
+        self._sampler = threading.Thread(target=self._run, name="neobi-profiler", daemon=True)
+        self._sampler.start()
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        self.duration = time.perf_counter() - self.started_at
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            stack.reverse()
+            self.samples[";".join(stack)] += 1
+            self.sample_count += 1
+
+    def collapsed(self) -> str:
+        """Örnekleri 'frame1;frame2;frame3 count' satırları olarak döndürür."""
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common())
+
+
+def save_profile(profiler: SamplingProfiler, label: str = "") -> str:
+    """Profili diske kaydeder ve profil ID'sini döndürür."""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    profile_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    header = (f"# label: {label}\n"
+              f"# duration_ms: {profiler.duration * 1000:.1f}\n"
+              f"# samples: {profiler.sample_count}\n"
+              f"# interval_ms: {profiler.interval * 1000:.1f}\n")
+    with open(_profile_path(profile_id), "w", encoding="utf-8") as f:
+        f.write(header)
+        f.write(profiler.collapsed())
+    _prune_profiles()
+    logger.info("Profile saved: %s (%.1f ms, %d samples)", profile_id, profiler.duration * 1000, profiler.sample_count)
+    return profile_id
+
+
+def list_profiles() -> list:
+    """Kayıtlı profilleri en yeniden eskiye listeler."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    result = []
+    for name in os.listdir(PROFILE_DIR):
+        if not name.endswith(PROFILE_FILE_SUFFIX):
+            continue
+        path = os.path.join(PROFILE_DIR, name)
+        stat = os.stat(path)
+        result.append({
+            "id": name[:-len(PROFILE_FILE_SUFFIX)],
+            "size_bytes": stat.st_size,
+            "created_at": datetime.fromtimestamp(stat.st_mtime).isoformat(),
+        })
+    result.sort(key=lambda p: p["created_at"], reverse=True)
+    return result
+
+
+def get_profile_path(profile_id: str):
+    """Profil dosyasının yolunu döndürür, yoksa None."""
+    # Path traversal'a karşı sadece düz ID kabul et
+    if not profile_id or os.path.basename(profile_id) != profile_id:
+        return None
+    path = _profile_path(profile_id)
+    return path if os.path.isfile(path) else None
+
+
+def _profile_path(profile_id: str) -> str:
+    return os.path.join(PROFILE_DIR, profile_id + PROFILE_FILE_SUFFIX)
+
+
+def _prune_profiles():
+    """PROFILE_MAX_FILES'tan fazla profil varsa en eskileri siler."""
+    for old in list_profiles()[PROFILE_MAX_FILES:]:
+        try:
+            os.remove(_profile_path(old["id"]))
+        except OSError:
+            pass
@@ -0,0 +1,125 @@
+"""
+NeoBI Records
+Büyük NeoOne raporları için kompakt kayıt tipleri.
+
+Her kayıt sadece tool'ların kullandığı alanları __slots__ ile tutar (dict başına
+yüzlerce byte yerine). Şehir, grup, kategori gibi çok tekrar eden string'ler
+intern edilerek tek kopya halinde saklanır.
+"""
+
+from sys import intern
+
+
+def _istr(value) -> str:
+    return intern(value) if isinstance(value, str) else value
+
+
+class _Record:
+    """
+    Ortak taban: kayıtlar pickle'da alan tuple'ı olarak saklanır (paylaşımlı cache'e
+    yazılan büyük raporlar için slot sözlüğünden daha küçük ve hızlı).
+    Alt sınıfların __init__ argüman sırası __slots__ sırasıyla aynıdır.
+    """
+    __slots__ = ()
+
+    def __reduce__(self):
+        return self.__class__, tuple(getattr(self, name) for name in self.__slots__)
+
+
+class ProductSaleRecord(_Record):
+    """/orders/reports/product-sales satırı."""
+    __slots__ = ("product_id", "product_name", "product_code", "product_group_name",
+                 "unit_of_measure_name", "quantity_sold", "total_sales")
+
+    def __init__(self, product_id, product_name, product_code, product_group_name,
+                 unit_of_measure_name, quantity_sold, total_sales):
+        self.product_id = product_id
+        self.product_name = product_name
+        self.product_code = product_code
+        self.product_group_name = product_group_name
+        self.unit_of_measure_name = unit_of_measure_name
+        self.quantity_sold = quantity_sold
+        self.total_sales = total_sales
+
+    @classmethod
+    def from_dict(cls, d: dict):
+        return cls(
+            d.get("productId"),
+            d.get("productName", ""),
+            d.get("productCode"),
+            _istr(d.get("productGroupName", "")),
+            _istr(d.get("unitOfMeasureName", "Birim")),
+            d.get("quantitySold", 0),
+            d.get("totalSales", 0),
+        )
+
+    @property
+    def is_free_goods(self) -> bool:
+        """[BONUS] ve [BEDELSİZ] ürünler satış toplamlarına dahil edilmez."""
+        return "[BONUS]" in self.product_name or "[BEDELSİZ]" in self.product_name
+
+    def to_dict(self) -> dict:
+        """NeoOne rapor formatındaki (camelCase) karşılığı."""
+        return {
+            "productId": self.product_id,
+            "productName": self.product_name,
+            "productCode": self.product_code,
+            "productGroupName": self.product_group_name,
+            "unitOfMeasureName": self.unit_of_measure_name,
+            "quantitySold": self.quantity_sold,
+            "totalSales": self.total_sales,
+        }
+
+
+class CustomerRecord(_Record):
+    """/Customers satırı (sadece sayım için gereken alanlar)."""
+    __slots__ = ("customer_id", "customer_group_name")
+
+    def __init__(self, customer_id, customer_group_name):
+        self.customer_id = customer_id
+        self.customer_group_name = customer_group_name
+
+    @classmethod
+    def from_dict(cls, d: dict):
+        group_info = d.get("customerGroup") or {}
+        return cls(d.get("id"), _istr(group_info.get("customerGroupName", "Tanımsız")))
+
+
+class CustomerPerformanceRecord(_Record):
+    """/customers/reports/sales-performance satırı."""
+    __slots__ = ("customer_id", "customer_name", "city", "district", "customer_group_name",
+                 "total_revenue", "order_count")
+
+    def __init__(self, customer_id, customer_name, city, district, customer_group_name,
+                 total_revenue, order_count):
+        self.customer_id = customer_id
+        self.customer_name = customer_name
+        self.city = city
+        self.district = district
+        self.customer_group_name = customer_group_name
+        self.total_revenue = total_revenue
+        self.order_count = order_count
+
+    @classmethod
+    def from_dict(cls, d: dict):
+        return cls(
+            d.get("customerId"),
+            d.get("customerName"),
+            _istr(d.get("city") or ""),
+            _istr(d.get("district") or ""),
+            _istr(d.get("customerGroupName") or ""),
+            d.get("totalRevenue", 0),
+            d.get("orderCount"),
+        )
+
+    def to_tool_dict(self) -> dict:
+        """Tool çıktısındaki basitleştirilmiş format."""
+        return {
+            "customer_id": self.customer_id,
+            "customer_name": self.customer_name,
+            "city": self.city,
+            "district": self.district,
+            "customer_group": self.customer_group_name,
+            "total_revenue": self.total_revenue,
+            "order_count": self.order_count,
+        }
@@ -0,0 +1,116 @@
+"""
+NeoBI Redis Stub
+Paylaşımlı cache'in redis backend'ini gerçek Redis olmadan test etmek için
+Redis protokolü (RESP) konuşan bellek içi sunucu.
+
+    python -m app.redis_stub --port 6379
+
+Backend'i NEOBI_CACHE_BACKEND=redis NEOBI_CACHE_URL=redis://127.0.0.1:6379/0 ile
+başlatın. Desteklenen komutlar: PING, GET, SET (EX / PX / NX / XX), DEL, EXISTS,
+AUTH, SELECT, FLUSHALL, DBSIZE. Veri kalıcı değildir, tek veritabanı vardır.
+"""
+
+import time
+import argparse
+import threading
+import socketserver
+
+
+class StubStore:
+    def __init__(self):
+        self._data = {}  # key -> (value, expires_at veya None)
+        self._lock = threading.Lock()
+
+    def _live(self, key):
+        entry = self._data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] < time.time():
+            del self._data[key]
+            return None
+        return entry
+
+    def execute(self, args: list):
+        command = args[0].upper()
+        with self._lock:
+            if command == b"PING":
+                return "PONG"
+            if command in (b"AUTH", b"SELECT"):
+                return "OK"
+            if command == b"FLUSHALL":
+                self._data.clear()
+                return "OK"
+            if command == b"DBSIZE":
+                return sum(1 for key in list(self._data) if self._live(key) is not None)
+            if command == b"GET":
+                entry = self._live(args[1])
+                return None if entry is None else entry[0]
+            if command == b"EXISTS":
+                return sum(1 for key in args[1:] if self._live(key) is not None)
+            if command == b"DEL":
+                return sum(1 for key in args[1:] if self._live(key) is not None and self._data.pop(key))
+            if command == b"SET":
+                return self._set(args[1], args[2], [a.upper() for a in args[3:]], args[3:])
+        return RuntimeError(f"ERR unknown command '{command.decode(errors='replace')}'")
+
+    def _set(self, key, value, options, raw):
+        expires_at = None
+        for i, option in enumerate(options):
+            if option == b"EX":
+                expires_at = time.time() + int(raw[i + 1])
+            elif option == b"PX":
+                expires_at = time.time() + int(raw[i + 1]) / 1000
+        exists = self._live(key) is not None
+        if (b"NX" in options and exists) or (b"XX" in options and not exists):
+            return None
+        self._data[key] = (value, expires_at)
+        return "OK"
+
+
+def _encode(reply) -> bytes:
+    if reply is None:
+        return b"$-1\r\n"
+    if isinstance(reply, Exception):
+        return f"-{reply}\r\n".encode("utf-8")
+    if isinstance(reply, str):
+        return f"+{reply}\r\n".encode("utf-8")
+    if isinstance(reply, int):
+        return b":%d\r\n" % reply
+    return b"$%d\r\n%s\r\n" % (len(reply), reply)
+
+
+def _handler(store: StubStore):
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            while True:
+                line = self.rfile.readline()
+                if not line:
+                    return
+                if not line.startswith(b"*"):
+                    self.wfile.write(_encode(RuntimeError("ERR inline commands are not supported")))
+                    continue
+                args = []
+                for _ in range(int(line[1:])):
+                    length = int(self.rfile.readline()[1:])
+                    args.append(self.rfile.read(length + 2)[:-2])
+                self.wfile.write(_encode(store.execute(args)))
+
+    return Handler
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NeoBI Redis protocol stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    args = parser.parse_args()
+
+    server = _Server((args.host, args.port), _handler(StubStore()))
+    print(f"Redis stub: redis://{args.host}:{args.port}/0")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
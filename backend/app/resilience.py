@@ -0,0 +1,134 @@
+"""
+NeoBI Resilience
+NeoOne çağrıları için circuit breaker, jitter'lı retry ve hedged request yardımcıları.
+"""
+
+import os
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Art arda bu kadar hata alınınca devre açılır
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("NEOONE_BREAKER_FAILURE_THRESHOLD", "5"))
+# Açık devre bu kadar saniye sonra tek bir deneme isteğine izin verir (half-open)
+BREAKER_RESET_TIMEOUT = float(os.getenv("NEOONE_BREAKER_RESET_TIMEOUT", "30"))
+# GET istekleri için maksimum ek deneme sayısı
+MAX_RETRIES = int(os.getenv("NEOONE_MAX_RETRIES", "2"))
+RETRY_BASE_DELAY = float(os.getenv("NEOONE_RETRY_BASE_DELAY", "0.3"))
+# İlk istek bu süre içinde dönmezse ikinci (hedge) istek gönderilir. 0 = kapalı
+HEDGE_DELAY = float(os.getenv("NEOONE_HEDGE_DELAY", "2.0"))
+
+_hedge_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="neoone-hedge")
+
+
+class CircuitOpenError(Exception):
+    """Devre açık; upstream'e istek gönderilmedi."""
+
+
+class CircuitBreaker:
+    """closed -> (hatalar) -> open -> (reset_timeout) -> half_open -> closed/open"""
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """İstek gönderilebilir mi? Half-open durumda aynı anda tek deneme isteğine izin verir."""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self._trial_in_flight = False
+            if self.state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                logger.info("Circuit %s closed", self.name)
+            self.state = "closed"
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    logger.warning("Circuit %s opened after %d failures", self.name, self.failures)
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {"state": self.state, "failures": self.failures}
+
+
+def is_retryable(error: Exception) -> bool:
+    """Bağlantı hataları, timeout'lar, 429 ve 5xx tekrar denenebilir; diğer 4xx denenmez."""
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return False
+
+
+def call_with_retries(fn, max_retries: int = MAX_RETRIES, base_delay: float = RETRY_BASE_DELAY):
+    """
+    fn'i çağırır; tekrar denenebilir hatalarda full-jitter exponential backoff ile
+    en fazla max_retries kez daha dener. Sadece idempotent istekler için kullanılmalı.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable(e):
+                raise
+            delay = random.uniform(0, base_delay * (2 ** attempt))
+            logger.debug("Retrying after %s (attempt %d, %.2fs)", e, attempt + 1, delay)
+            time.sleep(delay)
+
+
+def hedged_call(fn, hedge_delay: float = HEDGE_DELAY, discard=None):
+    """
+    fn'i çalıştırır; hedge_delay içinde sonuç gelmezse paralel ikinci bir çağrı başlatır
+    ve ilk başarılı sonucu döndürür. Kuyruk gecikmesini (tail latency) azaltır.
+    discard verilirse kaybeden çağrının sonucu (ör. açık response) geldiğinde ona verilir.
+    """
+    if hedge_delay <= 0:
+        return fn()
+
+    primary = _hedge_executor.submit(fn)
+    done, _ = wait([primary], timeout=hedge_delay)
+    if done:
+        return primary.result()
+
+    logger.debug("Hedging slow request after %.1fs", hedge_delay)
+    pending = {primary, _hedge_executor.submit(fn)}
+    last_error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                if discard is not None:
+                    for loser in (done | pending) - {future}:
+                        loser.add_done_callback(lambda f: f.exception() is None and discard(f.result()))
+                return future.result()
+            last_error = future.exception()
+    raise last_error
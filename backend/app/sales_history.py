@@ -0,0 +1,330 @@
+"""
+NeoBI Sales History
+Ürün bazında günlük satış geçmişi. NeoOne'ın tarih aralıklı ürün satış raporu
+(startDate = endDate = gün) gün gün çekilip yerel SQLite'ta saklanır; kapanmış
+günler SALES_HISTORY_RESYNC_DAYS sonra bir kez daha çekilip (geç girilen/iptal
+edilen siparişler için) kesinleşir, sonra bir daha istenmez. Bugün (henüz
+kapanmamış gün) saklanmaz.
+
+Analizler (iskonto lift'i, trendler) bu geçmişten günde bir oluşturulan SalesMatrix
+üzerinde çalışır: her ürün için günlük adet/ciro ve kümülatif toplam dizileri
+(array('d')). Herhangi bir tarih aralığının toplamı iki okumayla (prefix sum farkı)
+bulunur; yüzlerce iskontonun veya tüm kataloğun karşılaştırması NeoOne'a gitmeden
+tek geçişte yapılır.
+
+Birden fazla worker aynı veritabanını paylaşır; senkronizasyonu sync_state
+tablosundaki kilidi alan tek worker yapar, diğerleri veriyi ve senkronizasyon
+durumunu (stale / fetched_at) veritabanından okur.
+
+Not: Rapor müşteri grubu kırılımı içermez; geçmiş ürün x gün bazındadır.
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import secrets
+import threading
+from array import array
+from itertools import accumulate
+from datetime import date, datetime, timedelta
+
+from .api_client import neoone_client
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.getenv("NEOBI_DATA_DIR", os.path.join(os.path.dirname(__file__), "..", "data"))
+SALES_HISTORY_DB_PATH = os.getenv("NEOBI_SALES_HISTORY_DB", os.path.join(DATA_DIR, "sales_history.db"))
+# Geriye doğru saklanan gün sayısı
+SALES_HISTORY_DAYS = int(os.getenv("NEOBI_SALES_HISTORY_DAYS", "120"))
+# Kapanmış bir gün bu kadar gün sonra son kez yeniden çekilir
+SALES_HISTORY_RESYNC_DAYS = int(os.getenv("NEOBI_SALES_HISTORY_RESYNC_DAYS", "1"))
+# Arka plan senkronizasyon periyodu (saniye). 0 = kapalı
+SALES_HISTORY_REFRESH_INTERVAL = int(os.getenv("NEOBI_SALES_HISTORY_REFRESH", "3600"))
+# Senkronizasyon kilidinin süresi (saniye); her çekilen günde yenilenir, worker çökerse düşer
+SALES_HISTORY_LOCK_TTL = int(os.getenv("NEOBI_SALES_HISTORY_LOCK_TTL", "300"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS daily_product_sales (
+    day TEXT NOT NULL,
+    product_id INTEGER NOT NULL,
+    quantity REAL NOT NULL,
+    revenue REAL NOT NULL,
+    PRIMARY KEY (day, product_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS products (
+    product_id INTEGER PRIMARY KEY,
+    name TEXT,
+    code TEXT,
+    category TEXT
+);
+CREATE TABLE IF NOT EXISTS synced_days (
+    day TEXT PRIMARY KEY,
+    synced_at REAL NOT NULL,
+    final INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    owner TEXT,
+    lock_expires_at REAL NOT NULL DEFAULT 0,
+    fetched_at REAL,
+    stale INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO sync_state (id) VALUES (1);
+"""
+
+
+class SalesMatrix:
+    """
+    [start, end] aralığındaki günlük satışlar, ürün başına kümülatif dizilerle.
+    _dumps için `stale` / `fetched_at` alanlarını taşır.
+    """
+
+    def __init__(self, start: date, end: date, rows, products: dict, synced_days, stale: bool = False,
+                 fetched_at: datetime = None):
+        self.start = start
+        self.end = end
+        self.days = (end - start).days + 1
+        self.products = products  # product_id -> {"name", "code", "category"}
+        self.product_ids = sorted({product_id for _, product_id, _, _ in rows} | set(products))
+        self._index = {product_id: i for i, product_id in enumerate(self.product_ids)}
+        self.stale = stale
+        self.fetched_at = fetched_at
+
+        days = self.days
+        quantity = array("d", bytes(8 * days * len(self.product_ids)))
+        revenue = array("d", bytes(8 * days * len(self.product_ids)))
+        for day, product_id, qty, rev in rows:
+            offset = (date.fromisoformat(day) - start).days
+            if 0 <= offset < days:
+                cell = self._index[product_id] * days + offset
+                quantity[cell] += qty
+                revenue[cell] += rev
+
+        # Ürün başına days+1 uzunluğunda kümülatif toplam: sum[a, b) = cum[b] - cum[a]
+        self._cum_quantity = array("d")
+        self._cum_revenue = array("d")
+        for i in range(len(self.product_ids)):
+            row = slice(i * days, (i + 1) * days)
+            self._cum_quantity.extend(accumulate(quantity[row], initial=0.0))
+            self._cum_revenue.extend(accumulate(revenue[row], initial=0.0))
+
+        synced = array("d", bytes(8 * days))
+        for day in synced_days:
+            offset = (date.fromisoformat(day) - start).days
+            if 0 <= offset < days:
+                synced[offset] = 1.0
+        self._cum_synced = array("d", accumulate(synced, initial=0.0))
+        self.synced_days = int(self._cum_synced[-1])
+
+    def __contains__(self, product_id) -> bool:
+        return product_id in self._index
+
+    def _offsets(self, first: date, last: date) -> tuple:
+        """Tarih aralığını matrisin içine kırpıp [a, b) offset'lerine çevirir."""
+        a = max((first - self.start).days, 0)
+        b = min((last - self.start).days + 1, self.days)
+        return a, max(a, b)
+
+    def coverage(self, first: date, last: date) -> float:
+        """Aralıktaki günlerin ne kadarının geçmişte bulunduğu (0.0 - 1.0)."""
+        requested = (last - first).days + 1
+        if requested <= 0:
+            return 0.0
+        a, b = self._offsets(first, last)
+        return (self._cum_synced[b] - self._cum_synced[a]) / requested
+
+    def window(self, product_id, first: date, last: date) -> tuple:
+        """(adet, ciro) - ürünün [first, last] aralığındaki toplam satışı."""
+        i = self._index.get(product_id)
+        if i is None:
+            return 0.0, 0.0
+        a, b = self._offsets(first, last)
+        base = i * (self.days + 1)
+        return (self._cum_quantity[base + b] - self._cum_quantity[base + a],
+                self._cum_revenue[base + b] - self._cum_revenue[base + a])
+
+    def column(self, first: date, last: date) -> tuple:
+        """([adet], [ciro]) - tüm ürünlerin [first, last] toplamları, product_ids sırasında."""
+        a, b = self._offsets(first, last)
+        stride = self.days + 1
+        bases = range(0, len(self.product_ids) * stride, stride)
+        cq, cr = self._cum_quantity, self._cum_revenue
+        return [cq[i + b] - cq[i + a] for i in bases], [cr[i + b] - cr[i + a] for i in bases]
+
+    def product_name(self, product_id) -> str:
+        info = self.products.get(product_id)
+        return info["name"] if info else f"Ürün {product_id}"
+
+
+class SalesHistoryStore:
+    """SQLite tabanlı günlük satış geçmişi ve senkronizasyon worker'ı."""
+
+    def __init__(self, path: str = SALES_HISTORY_DB_PATH, history_days: int = SALES_HISTORY_DAYS,
+                 refresh_interval: int = SALES_HISTORY_REFRESH_INTERVAL):
+        self.path = path
+        self.history_days = history_days
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._conn = None
+        self._worker = None
+        self._matrix = None
+        self._matrix_key = None
+        self._owner = f"{os.getpid()}:{secrets.token_hex(4)}"  # sync_state kilidindeki kimlik
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def start(self):
+        """Arka plan senkronizasyon thread'ini başlatır (ilk çalışmada geçmişi doldurur)."""
+        if self.refresh_interval <= 0 or self._worker is not None:
+            return
+        self._worker = threading.Thread(target=self._run, name="neobi-sales-history", daemon=True)
+        self._worker.start()
+
+    def pending_days(self, today: date = None) -> list:
+        """Çekilmesi gereken kapanmış günler, en yeniden eskiye."""
+        today = today or date.today()
+        with self._lock:
+            final = {row[0] for row in self._connection().execute(
+                "SELECT day FROM synced_days WHERE final = 1 AND day >= ?",
+                ((today - timedelta(days=self.history_days)).isoformat(),))}
+        days = (today - timedelta(days=i) for i in range(1, self.history_days + 1))
+        return [d for d in days if d.isoformat() not in final]
+
+    def sync(self, today: date = None) -> int:
+        """
+        Eksik günleri NeoOne'dan çeker. Çekilen gün sayısını döner.
+        Kilit başka bir worker'daysa hiçbir şey yapmadan 0 döner.
+        """
+        today = today or date.today()
+        with self._sync_lock:
+            if not self._acquire_sync_lock():
+                logger.debug("Sales history sync skipped: another worker holds the lock")
+                return 0
+            fetched = 0
+            stale = True
+            try:
+                for day in self.pending_days(today):
+                    try:
+                        # Gün gün istekler NeoOne istemcisinin stale yedeğinde birikmez
+                        records = neoone_client.get_product_sales(day.isoformat(), day.isoformat(),
+                                                                  remember=False)
+                    except Exception as e:
+                        logger.warning("Sales history sync stopped at %s: %s", day, e)
+                        break
+                    self._store_day(day, records, final=(today - day).days > SALES_HISTORY_RESYNC_DAYS)
+                    fetched += 1
+                    self._acquire_sync_lock()  # Uzun doldurmalarda kilidi yenile
+                else:
+                    stale = False
+            finally:
+                self._release_sync_lock(stale)
+            if fetched:
+                logger.info("Sales history synced: %d days", fetched)
+            return fetched
+
+    def _acquire_sync_lock(self) -> bool:
+        """sync_state kilidini alır veya (zaten bu worker'daysa) süresini uzatır."""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                cursor = conn.execute("UPDATE sync_state SET owner = ?, lock_expires_at = ? "
+                                      "WHERE id = 1 AND (lock_expires_at < ? OR owner = ?)",
+                                      (self._owner, now + SALES_HISTORY_LOCK_TTL, now, self._owner))
+        return cursor.rowcount == 1
+
+    def _release_sync_lock(self, stale: bool):
+        """Kilidi bırakır ve senkronizasyon durumunu tüm worker'lar için yazar."""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                if stale:
+                    conn.execute("UPDATE sync_state SET lock_expires_at = 0, stale = 1 "
+                                 "WHERE id = 1 AND owner = ?", (self._owner,))
+                else:
+                    conn.execute("UPDATE sync_state SET lock_expires_at = 0, stale = 0, fetched_at = ? "
+                                 "WHERE id = 1 AND owner = ?", (time.time(), self._owner))
+
+    def sync_status(self) -> dict:
+        """Paylaşılan senkronizasyon durumu ve veri sürümü (herhangi bir worker'ın yazdığı gün)."""
+        with self._lock:
+            conn = self._connection()
+            fetched_at, stale = conn.execute("SELECT fetched_at, stale FROM sync_state WHERE id = 1").fetchone()
+            version = conn.execute("SELECT COUNT(*), MAX(synced_at) FROM synced_days").fetchone()
+        return {"fetched_at": datetime.fromtimestamp(fetched_at) if fetched_at else None,
+                "stale": bool(stale), "version": version}
+
+    def _store_day(self, day: date, records, final: bool):
+        totals = {}
+        products = {}
+        for r in records:
+            if r.is_free_goods or r.product_id is None:
+                continue
+            qty, rev = totals.get(r.product_id, (0.0, 0.0))
+            totals[r.product_id] = (qty + (r.quantity_sold or 0), rev + (r.total_sales or 0))
+            products[r.product_id] = (r.product_name, r.product_code, r.product_group_name)
+        key = day.isoformat()
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM daily_product_sales WHERE day = ?", (key,))
+                conn.executemany("INSERT INTO daily_product_sales (day, product_id, quantity, revenue) "
+                                 "VALUES (?, ?, ?, ?)",
+                                 [(key, pid, qty, rev) for pid, (qty, rev) in totals.items()])
+                conn.executemany("INSERT OR REPLACE INTO products (product_id, name, code, category) "
+                                 "VALUES (?, ?, ?, ?)",
+                                 [(pid, *info) for pid, info in products.items()])
+                conn.execute("INSERT OR REPLACE INTO synced_days (day, synced_at, final) VALUES (?, ?, ?)",
+                             (key, time.time(), int(final)))
+                cutoff = (day - timedelta(days=self.history_days * 2)).isoformat()
+                conn.execute("DELETE FROM daily_product_sales WHERE day < ?", (cutoff,))
+                conn.execute("DELETE FROM synced_days WHERE day < ?", (cutoff,))
+
+    def matrix(self, today: date = None) -> SalesMatrix:
+        """Dünle biten geçmişin matrisi. Gün değişene veya veri güncellenene kadar cache'lenir."""
+        today = today or date.today()
+        status = self.sync_status()
+        key = (today, status["version"], status["stale"], status["fetched_at"])
+        if self._matrix is not None and self._matrix_key == key:
+            return self._matrix
+        end = today - timedelta(days=1)
+        start = today - timedelta(days=self.history_days)
+        started = time.perf_counter()
+        with self._lock:
+            conn = self._connection()
+            rows = conn.execute("SELECT day, product_id, quantity, revenue FROM daily_product_sales "
+                                "WHERE day BETWEEN ? AND ?", (start.isoformat(), end.isoformat())).fetchall()
+            products = {pid: {"name": name, "code": code, "category": category}
+                        for pid, name, code, category in conn.execute("SELECT * FROM products")}
+            synced = [row[0] for row in conn.execute("SELECT day FROM synced_days WHERE day BETWEEN ? AND ?",
+                                                     (start.isoformat(), end.isoformat()))]
+        # Hiç tam senkronizasyon olmadıysa eksik günler stale yerine coverage ile görünür
+        matrix = SalesMatrix(start, end, rows, products, synced,
+                             stale=status["stale"] and status["fetched_at"] is not None,
+                             fetched_at=status["fetched_at"])
+        logger.info("Sales matrix built: %d products x %d days (%d synced) in %.1f ms", len(matrix.product_ids),
+                    matrix.days, matrix.synced_days, (time.perf_counter() - started) * 1000)
+        self._matrix, self._matrix_key = matrix, key
+        return matrix
+
+    def _run(self):
+        while True:
+            try:
+                self.sync()
+            except Exception as e:
+                logger.error("Sales history sync failed: %s", e)
+            time.sleep(self.refresh_interval)
+
+
+# Singleton instance
+sales_history = SalesHistoryStore()
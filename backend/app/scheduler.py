@@ -0,0 +1,157 @@
+"""
+NeoBI Turn Scheduler
+Aynı OpenAI thread'i üzerinde aynı anda tek bir run çalışmasını sağlar.
+
+- Aynı thread_id'ye gelen mesajlar sıraya alınır (FIFO), aynı anda sadece biri çalışır
+- Her turn'ün kuyrukta bekleme dahil toplam bir süre sınırı (deadline) vardır
+- Süre dolduğunda veya istemci bağlantıyı kopardığında turn iptal edilir ve
+  HTTP isteği hemen döner; çalışan worker bir sonraki kontrol noktasında OpenAI run'ını iptal eder
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+# Bir turn'ün kuyrukta bekleme dahil maksimum süresi (saniye)
+TURN_TIMEOUT = float(os.getenv("NEOBI_TURN_TIMEOUT", "120"))
+# Aynı thread için çalışan turn dışında kuyrukta bekleyebilecek maksimum mesaj sayısı
+MAX_QUEUED_TURNS = int(os.getenv("NEOBI_MAX_QUEUED_TURNS", "3"))
+# İstemci bağlantısının kontrol edilme aralığı (saniye)
+DISCONNECT_POLL_INTERVAL = 0.5
+
+
+class TurnCancelled(Exception):
+    """Turn süre aşımı veya istemci kopması nedeniyle iptal edildi."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class TurnQueueFull(Exception):
+    """Aynı thread için kuyrukta çok fazla mesaj bekliyor."""
+
+
+class TurnControl:
+    """
+    Worker thread'e geçirilen iptal/deadline kontrolü.
+    Uzun süren döngüler check() ve wait() ile iptale hızlı tepki verir.
+    """
+    __slots__ = ("deadline", "reason", "_event")
+
+    def __init__(self, deadline: float):
+        self.deadline = deadline
+        self.reason = None
+        self._event = threading.Event()
+
+    @property
+    def remaining(self) -> float:
+        return max(0.0, self.deadline - time.monotonic())
+
+    def cancel(self, reason: str):
+        if self.reason is None:
+            self.reason = reason
+        self._event.set()
+
+    def is_cancelled(self) -> bool:
+        if not self._event.is_set() and time.monotonic() >= self.deadline:
+            self.cancel("deadline")
+        return self._event.is_set()
+
+    def check(self):
+        """İptal edildiyse TurnCancelled fırlatır."""
+        if self.is_cancelled():
+            raise TurnCancelled(self.reason)
+
+    def wait(self, seconds: float):
+        """seconds kadar bekler; iptal veya deadline durumunda hemen uyanır."""
+        self._event.wait(min(seconds, self.remaining))
+
+
+class TurnScheduler:
+    """Thread bazlı turn sıralayıcı."""
+
+    def __init__(self, turn_timeout: float = TURN_TIMEOUT, max_queued: int = MAX_QUEUED_TURNS):
+        self.turn_timeout = turn_timeout
+        self.max_queued = max_queued
+        self._locks = {}    # thread_id -> asyncio.Lock
+        self._pending = {}  # thread_id -> çalışan + bekleyen turn sayısı
+
+    async def run(self, thread_id: str, turn_fn, is_disconnected=None):
+        """
+        turn_fn(control) fonksiyonunu worker thread'de, thread_id için sıralı olarak çalıştırır.
+
+        Args:
+            thread_id: OpenAI thread ID'si
+            turn_fn: TurnControl alan senkron fonksiyon
+            is_disconnected: İstemci bağlantısı koptuysa True dönen async fonksiyon
+        """
+        if self._pending.get(thread_id, 0) > self.max_queued:
+            raise TurnQueueFull(thread_id)
+
+        control = TurnControl(time.monotonic() + self.turn_timeout)
+        lock = self._locks.setdefault(thread_id, asyncio.Lock())
+        self._pending[thread_id] = self._pending.get(thread_id, 0) + 1
+        handed_off = False
+        try:
+            acquire = asyncio.ensure_future(lock.acquire())
+            await asyncio.wait({acquire}, timeout=control.remaining)
+            if not acquire.done():
+                acquire.cancel()
+                raise TurnCancelled("deadline")
+
+            task = asyncio.ensure_future(run_in_threadpool(turn_fn, control))
+            # Kilit, worker gerçekten bitene kadar tutulur; böylece iptal edilmiş
+            # bir run hala çalışırken aynı thread'e yeni mesaj eklenmez.
+            task.add_done_callback(lambda _: self._release(thread_id, lock))
+            handed_off = True
+
+            while not task.done():
+                await asyncio.wait({task}, timeout=min(DISCONNECT_POLL_INTERVAL, control.remaining))
+                if task.done():
+                    break
+                if is_disconnected is not None and await is_disconnected():
+                    control.cancel("client_disconnected")
+                if control.is_cancelled():
+                    logger.warning("Turn on thread %s cancelled: %s", thread_id, control.reason)
+                    # Worker'ın sonucunu (veya hatasını) arka planda sessizce tüket
+                    task.add_done_callback(_consume_result)
+                    raise TurnCancelled(control.reason)
+            return task.result()
+        except asyncio.CancelledError:
+            # İstek handler'ı iptal edildi (ör. sunucu kapanıyor); worker'ı da durdur
+            control.cancel("client_disconnected")
+            raise
+        finally:
+            if not handed_off:
+                if not acquire.done():
+                    acquire.cancel()
+                elif not acquire.cancelled() and acquire.exception() is None:
+                    lock.release()
+                self._decrement(thread_id)
+
+    def _release(self, thread_id: str, lock: asyncio.Lock):
+        lock.release()
+        self._decrement(thread_id)
+
+    def _decrement(self, thread_id: str):
+        count = self._pending.get(thread_id, 0) - 1
+        if count <= 0:
+            self._pending.pop(thread_id, None)
+            self._locks.pop(thread_id, None)
+        else:
+            self._pending[thread_id] = count
+
+
+def _consume_result(task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.debug("Cancelled turn finished with: %s", task.exception())
+
+
+# Singleton instance
+turn_scheduler = TurnScheduler()
@@ -0,0 +1,543 @@
+"""
+NeoBI Shared Cache
+Worker'lar (uvicorn --workers N) arasında paylaşılabilen cache katmanı.
+
+Backend NEOBI_CACHE_BACKEND ile seçilir:
+- memory: Süreç içi sözlük (varsayılan, tek worker). Değerler serileştirilmeden tutulur
+- sqlite: Aynı makinedeki worker'ların paylaştığı SQLite dosyası (NEOBI_CACHE_PATH)
+- shm:    /dev/shm (RAM üzerindeki tmpfs) altında anahtar başına bir dosya; yazma
+          atomik rename ile, kilitler O_EXCL ile. Aynı makinede en hızlı paylaşımlı seçenek.
+          Dizin (varsayılan /dev/shm/neobi-cache-<uid>) süreç kullanıcısına ait ve 0700 olmalı
+- redis:  Redis protokolü (NEOBI_CACHE_URL=redis://host:6379/0). Birden fazla makine için.
+          Yerel test için: python -m app.redis_stub --port 6379
+
+Paylaşımlı backend'lerde değerler pickle (protokol 5) ile serileştirilir, büyük
+değerler (CACHE_COMPRESS_MIN_BYTES üstü) zlib ile sıkıştırılır.
+
+get_or_set() single-flight çalışır: anahtar yoksa yükleme kilidini alan tek worker
+NeoOne'a gider, diğerleri değerin yazılmasını bekler. Böylece worker sayısı arttıkça
+NeoOne'a giden istek sayısı artmaz.
+"""
+
+import os
+import time
+import zlib
+import pickle
+import stat
+import socket
+import sqlite3
+import hashlib
+import logging
+import secrets
+import tempfile
+import threading
+from concurrent.futures import Future
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+CACHE_BACKEND = os.getenv("NEOBI_CACHE_BACKEND", "memory").lower()
+CACHE_URL = os.getenv("NEOBI_CACHE_URL", "redis://127.0.0.1:6379/0")
+CACHE_PATH = os.getenv("NEOBI_CACHE_PATH")
+CACHE_PREFIX = os.getenv("NEOBI_CACHE_PREFIX", "neobi:")
+# Bu boyuttan büyük serileştirilmiş değerler sıkıştırılır (byte)
+CACHE_COMPRESS_MIN_BYTES = int(os.getenv("NEOBI_CACHE_COMPRESS_MIN_BYTES", "65536"))
+# Yükleme kilidinin süresi (yükleyen worker çökerse kilit bu süre sonunda düşer) ve bekleme sınırı
+CACHE_LOCK_TTL = float(os.getenv("NEOBI_CACHE_LOCK_TTL", "60"))
+CACHE_LOCK_WAIT = float(os.getenv("NEOBI_CACHE_LOCK_WAIT", "30"))
+LOCK_POLL_INTERVAL = 0.05
+
+_MISSING = object()
+
+# Serileştirme başlıkları
+_RAW = b"P"
+_COMPRESSED = b"Z"
+
+
+def encode(value) -> bytes:
+    data = pickle.dumps(value, protocol=5)
+    if len(data) >= CACHE_COMPRESS_MIN_BYTES:
+        return _COMPRESSED + zlib.compress(data, 1)
+    return _RAW + data
+
+
+def decode(data: bytes):
+    if data[:1] == _COMPRESSED:
+        return pickle.loads(zlib.decompress(data[1:]))
+    return pickle.loads(data[1:])
+
+
+# ==================== BACKENDS ====================
+
+class MemoryBackend:
+    """Süreç içi backend. Değerleri nesne olarak tutar."""
+    name = "memory"
+    shared = False
+
+    def __init__(self):
+        self._data = {}   # key -> (value, expires_at)
+        self._locks = {}  # key -> (token, expires_at)
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return _MISSING
+            if entry[1] < time.time():
+                del self._data[key]
+                return _MISSING
+            return entry[0]
+
+    def set(self, key: str, value, ttl: float):
+        with self._lock:
+            self._data[key] = (value, time.time() + ttl)
+            if len(self._data) > 10000:
+                now = time.time()
+                self._data = {k: v for k, v in self._data.items() if v[1] >= now}
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def acquire(self, key: str, ttl: float):
+        with self._lock:
+            current = self._locks.get(key)
+            if current is not None and current[1] >= time.time():
+                return None
+            token = secrets.token_hex(8)
+            self._locks[key] = (token, time.time() + ttl)
+            return token
+
+    def release(self, key: str, token: str):
+        with self._lock:
+            if self._locks.get(key, (None,))[0] == token:
+                del self._locks[key]
+
+
+class SQLiteBackend:
+    """Aynı makinedeki worker'lar için SQLite dosyası."""
+    name = "sqlite"
+    shared = True
+
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL);
+    CREATE TABLE IF NOT EXISTS cache_locks (key TEXT PRIMARY KEY, token TEXT NOT NULL, expires_at REAL NOT NULL);
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(self._SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT value FROM cache WHERE key = ? AND expires_at >= ?", (key, time.time())).fetchone()
+        return _MISSING if row is None else row[0]
+
+    def set(self, key: str, value: bytes, ttl: float):
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                             (key, value, now + ttl))
+                conn.execute("DELETE FROM cache WHERE expires_at < ?", (now,))
+
+    def delete(self, key: str):
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def acquire(self, key: str, ttl: float):
+        token = secrets.token_hex(8)
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM cache_locks WHERE key = ? AND expires_at < ?", (key, now))
+                cursor = conn.execute("INSERT OR IGNORE INTO cache_locks (key, token, expires_at) VALUES (?, ?, ?)",
+                                      (key, token, now + ttl))
+        return token if cursor.rowcount == 1 else None
+
+    def release(self, key: str, token: str):
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM cache_locks WHERE key = ? AND token = ?", (key, token))
+
+
+class ShmBackend:
+    """
+    /dev/shm altında dosya tabanlı backend. Her anahtar bir dosyadır:
+    8 byte son geçerlilik zamanı (ms) + değer. Okuyucular hiçbir zaman yarım dosya görmez.
+
+    Değerler pickle ile okunduğu ve servis token'ı da burada tutulduğu için dizin
+    sadece süreç kullanıcısına ait (0700) olmalıdır; değilse backend kullanılmaz.
+    Dosyalar 0600 ile yazılır.
+    """
+    name = "shm"
+    shared = True
+
+    PRUNE_EVERY = 500  # Bu kadar yazmada bir süresi dolmuş dosyalar silinir
+
+    def __init__(self, path: str):
+        self.path = path
+        self._writes = 0
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        self._check_owner()
+
+    def _check_owner(self):
+        """Başka bir kullanıcının önceden oluşturduğu veya erişebildiği dizini reddeder."""
+        st = os.lstat(self.path)
+        if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid():
+            raise PermissionError(f"Cache directory {self.path} is not a directory owned by uid {os.getuid()}")
+        if st.st_mode & 0o077:
+            raise PermissionError(f"Cache directory {self.path} is accessible by other users "
+                                  f"(mode {stat.S_IMODE(st.st_mode):o}); expected 0700")
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, hashlib.sha256(key.encode("utf-8")).hexdigest())
+
+    def get(self, key: str):
+        try:
+            with open(self._file(key), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return _MISSING
+        if len(data) < 8 or int.from_bytes(data[:8], "big") / 1000 < time.time():
+            return _MISSING
+        return data[8:]
+
+    def set(self, key: str, value: bytes, ttl: float):
+        path = self._file(key)
+        tmp = f"{path}.{os.getpid()}.{secrets.token_hex(4)}.tmp"
+        fd = os.open(tmp, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(int((time.time() + ttl) * 1000).to_bytes(8, "big"))
+            f.write(value)
+        os.replace(tmp, path)
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self._prune()
+
+    def _prune(self):
+        now = time.time()
+        for entry in os.scandir(self.path):
+            if "." in entry.name:
+                continue
+            try:
+                with open(entry.path, "rb") as f:
+                    if int.from_bytes(f.read(8), "big") / 1000 < now:
+                        os.unlink(entry.path)
+            except OSError:
+                pass
+
+    def delete(self, key: str):
+        try:
+            os.unlink(self._file(key))
+        except FileNotFoundError:
+            pass
+
+    def acquire(self, key: str, ttl: float):
+        path = self._file(key) + ".lock"
+        token = secrets.token_hex(8)
+        for _ in range(2):
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600)
+            except FileExistsError:
+                try:
+                    if time.time() - os.stat(path).st_mtime < ttl:
+                        return None
+                    # Süresi dolmuş kilit (çöken worker); kaldırıp tekrar dene
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                continue
+            with os.fdopen(fd, "w") as f:
+                f.write(token)
+            return token
+        return None
+
+    def release(self, key: str, token: str):
+        path = self._file(key) + ".lock"
+        try:
+            with open(path) as f:
+                if f.read() != token:
+                    return
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+class RedisError(Exception):
+    """Redis sunucusunun döndürdüğü hata (-ERR ...)."""
+
+
+class RedisBackend:
+    """Redis protokolü (RESP) üzerinden çalışan, bağımlılıksız minimal istemci."""
+    name = "redis"
+    shared = True
+
+    def __init__(self, url: str, timeout: float = 5.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._sock = None
+        self._reader = None
+
+    def _connect(self):
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._reader = self._sock.makefile("rb")
+        if self.password:
+            self._roundtrip("AUTH", self.password)
+        if self.db:
+            self._roundtrip("SELECT", self.db)
+
+    def _close(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = self._reader = None
+
+    def _roundtrip(self, *args):
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        self._sock.sendall(b"".join(parts))
+        return self._read_reply()
+
+    def _read_reply(self):
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode("utf-8")
+        if kind == b"-":
+            raise RedisError(rest.decode("utf-8"))
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = self._reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            count = int(rest)
+            return None if count < 0 else [self._read_reply() for _ in range(count)]
+        raise RedisError(f"Unexpected reply: {line!r}")
+
+    def command(self, *args):
+        """Komutu gönderir; bağlantı kopmuşsa bir kez yeniden bağlanır."""
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    return self._roundtrip(*args)
+                except (OSError, ConnectionError):
+                    self._close()
+                    if attempt:
+                        raise
+
+    def get(self, key: str):
+        value = self.command("GET", key)
+        return _MISSING if value is None else value
+
+    def set(self, key: str, value: bytes, ttl: float):
+        self.command("SET", key, value, "PX", max(int(ttl * 1000), 1))
+
+    def delete(self, key: str):
+        self.command("DEL", key)
+
+    def acquire(self, key: str, ttl: float):
+        token = secrets.token_hex(8)
+        ok = self.command("SET", "lock:" + key, token, "NX", "PX", max(int(ttl * 1000), 1))
+        return token if ok == "OK" else None
+
+    def release(self, key: str, token: str):
+        # Kilit süresi dolup başka worker'a geçtiyse silinmez. GET ile DEL arasındaki
+        # kısa pencerede kilit el değiştirirse en kötü ihtimalle bir yükleme tekrarlanır.
+        if self.command("GET", "lock:" + key) == token.encode("ascii"):
+            self.command("DEL", "lock:" + key)
+
+
+def create_backend(kind: str = CACHE_BACKEND, url: str = CACHE_URL, path: str = CACHE_PATH):
+    if kind == "memory":
+        return MemoryBackend()
+    if kind == "sqlite":
+        default = os.path.join(os.path.dirname(__file__), "..", "data", "shared_cache.db")
+        return SQLiteBackend(path or default)
+    if kind == "shm":
+        default_root = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+        # Kullanıcı başına ayrı dizin: başka kullanıcının oluşturduğu dizinle çakışmaz
+        return ShmBackend(path or os.path.join(default_root, f"neobi-cache-{os.getuid()}"))
+    if kind == "redis":
+        return RedisBackend(url)
+    raise ValueError(f"Unknown cache backend: {kind}")
+
+
+# ==================== CACHE ====================
+
+class SharedCache:
+    """Backend üzerinde serileştirme, anahtar öneki ve single-flight yükleme."""
+
+    def __init__(self, backend, prefix: str = CACHE_PREFIX, lock_ttl: float = CACHE_LOCK_TTL,
+                 lock_wait: float = CACHE_LOCK_WAIT):
+        self.backend = backend
+        self.prefix = prefix
+        self.lock_ttl = lock_ttl
+        self.lock_wait = lock_wait
+        # Aynı süreçte yüklenmekte olan anahtarlar: key -> Future. Sadece aynı anahtarı
+        # isteyen thread'ler birbirini bekler
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self.counts = {"hits": 0, "misses": 0, "loads": 0, "lock_waits": 0, "errors": 0}
+
+    def _key(self, key: str) -> str:
+        return self.prefix + key
+
+    def get(self, key: str, default=None):
+        value = self._get(key)
+        return default if value is _MISSING else value
+
+    def _get(self, key: str):
+        try:
+            value = self.backend.get(self._key(key))
+            if value is not _MISSING and self.backend.shared:
+                value = decode(value)
+        except Exception as e:
+            # Cache erişilemezse veri kaynağından okunmaya devam edilir
+            self.counts["errors"] += 1
+            logger.warning("Cache get %s failed: %s", key, e)
+            return _MISSING
+        self.counts["hits" if value is not _MISSING else "misses"] += 1
+        return value
+
+    def set(self, key: str, value, ttl: float):
+        try:
+            self.backend.set(self._key(key), encode(value) if self.backend.shared else value, ttl)
+        except Exception as e:
+            self.counts["errors"] += 1
+            logger.warning("Cache set %s failed: %s", key, e)
+
+    def delete(self, key: str):
+        try:
+            self.backend.delete(self._key(key))
+        except Exception as e:
+            self.counts["errors"] += 1
+            logger.warning("Cache delete %s failed: %s", key, e)
+
+    def get_or_set(self, key: str, loader, ttl: float, cacheable=None):
+        """
+        Değeri cache'den döndürür; yoksa loader() ile yükleyip yazar. Yükleme tüm
+        worker'larda tek seferde yapılır; aynı süreçte aynı anahtarı isteyen thread'ler
+        yükleyenin sonucunu bekler, farklı anahtarlar birbirini beklemez.
+        cacheable(value) False dönerse (örn. stale veri) değer döndürülür ama cache'e yazılmaz.
+        """
+        value = self._get(key)
+        if value is not _MISSING:
+            return value
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            return future.result()
+        try:
+            value = self._load(key, loader, ttl, cacheable)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+
+    def _load(self, key: str, loader, ttl: float, cacheable):
+        """Worker'lar arası kilitle yükler; kilit başka worker'daysa değerin yazılmasını bekler."""
+        value = self._get(key)
+        if value is not _MISSING:
+            return value
+        token = self._acquire(key)
+        if token is None:
+            # Başka bir worker yüklüyor; değerin yazılmasını veya kilidin düşmesini bekle
+            self.counts["lock_waits"] += 1
+            deadline = time.monotonic() + self.lock_wait
+            while time.monotonic() < deadline:
+                time.sleep(LOCK_POLL_INTERVAL)
+                value = self._get(key)
+                if value is not _MISSING:
+                    return value
+                token = self._acquire(key)
+                if token is not None:
+                    break
+            else:
+                logger.warning("Cache lock wait for %s timed out; loading locally", key)
+        try:
+            if token is not None:
+                value = self._get(key)
+                if value is not _MISSING:
+                    return value
+            value = loader()
+            self.counts["loads"] += 1
+            if cacheable is None or cacheable(value):
+                self.set(key, value, ttl)
+            return value
+        finally:
+            if token is not None:
+                self._release(key, token)
+
+    def _acquire(self, key: str):
+        try:
+            return self.backend.acquire(self._key(key), self.lock_ttl)
+        except Exception as e:
+            # Kilit alınamıyorsa (backend erişilemez) yerelde yükle
+            self.counts["errors"] += 1
+            logger.warning("Cache lock %s failed: %s", key, e)
+            return ""
+
+    def _release(self, key: str, token: str):
+        if not token:
+            return
+        try:
+            self.backend.release(self._key(key), token)
+        except Exception as e:
+            logger.warning("Cache unlock %s failed: %s", key, e)
+
+    def stats(self) -> dict:
+        return {"backend": self.backend.name, **self.counts}
+
+
+def not_stale(value) -> bool:
+    """get_or_set için: NeoOne erişilemezken dönen eski (stale) yanıtlar cache'lenmez."""
+    return not getattr(value, "stale", False)
+
+
+# Singleton instance
+shared_cache = SharedCache(create_backend())
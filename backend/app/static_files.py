@@ -0,0 +1,162 @@
+"""
+NeoBI Static Files
+Frontend build çıktısını (frontend/dist) başlangıçta belleğe yükleyip sıkıştırılmış
+halleriyle birlikte sunar.
+
+- Metin tabanlı dosyalar gzip (ve brotli paketi kuruluysa br) ile bir kez sıkıştırılır;
+  istemcinin Accept-Encoding başlığına göre uygun temsil döner
+- Her temsil içeriğin SHA-256 özetinden türetilen strong ETag taşır;
+  If-None-Match eşleşirse gövdesiz 304 döner
+- /assets altındaki dosyaların adı içerik hash'i içerdiğinden (Vite) bir yıl
+  immutable cache'lenir; index.html her seferinde, embed.js kısa aralıklarla
+  yeniden doğrulanır (yeni deploy hemen görünür)
+"""
+
+import os
+import gzip
+import hashlib
+import logging
+import mimetypes
+
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# embed.js her NeoSales Web sayfasında yüklenir; bu süre boyunca tarayıcı cache'inden kullanılır
+EMBED_MAX_AGE = int(os.getenv("NEOBI_EMBED_MAX_AGE", "300"))
+# Bu boyuttan küçük dosyalar sıkıştırılmaz (kazanç başlık maliyetinden az)
+MIN_COMPRESS_SIZE = 1024
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+DEFAULT_CACHE = "public, max-age=86400"
+
+_MEDIA_TYPES = {
+    ".js": "application/javascript",
+    ".mjs": "application/javascript",
+    ".css": "text/css",
+    ".html": "text/html; charset=utf-8",
+    ".json": "application/json",
+    ".svg": "image/svg+xml",
+    ".ico": "image/x-icon",
+    ".png": "image/png",
+    ".woff2": "font/woff2",
+    ".map": "application/json",
+}
+_COMPRESSIBLE = ("text/", "application/javascript", "application/json", "image/svg+xml", "image/x-icon")
+
+
+class StaticAsset:
+    """Bir dosyanın bellekteki temsilleri: encoding -> (gövde, ETag)."""
+    __slots__ = ("media_type", "cache_control", "variants")
+
+    def __init__(self, body: bytes, media_type: str, cache_control: str):
+        self.media_type = media_type
+        self.cache_control = cache_control
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.variants = {"identity": (body, f'"{digest}"')}
+        if len(body) >= MIN_COMPRESS_SIZE and media_type.startswith(_COMPRESSIBLE):
+            compressed = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(compressed) < len(body):
+                self.variants["gzip"] = (compressed, f'"{digest}-gz"')
+            if brotli is not None:
+                compressed = brotli.compress(body, quality=11)
+                if len(compressed) < len(body):
+                    self.variants["br"] = (compressed, f'"{digest}-br"')
+
+    def etags(self) -> set:
+        return {etag for _, etag in self.variants.values()}
+
+
+def _cache_control(rel_path: str) -> str:
+    if rel_path.startswith("assets/"):
+        return IMMUTABLE_CACHE
+    if rel_path == "embed.js":
+        return f"public, max-age={EMBED_MAX_AGE}, must-revalidate"
+    if rel_path.endswith(".html"):
+        return REVALIDATE_CACHE
+    return DEFAULT_CACHE
+
+
+def _accepted_encodings(accept_encoding: str) -> set:
+    """Accept-Encoding başlığındaki q>0 encoding'ler."""
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if name:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+def _etag_matches(if_none_match: str, etags: set) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match weak karşılaştırma kullanır: W/ öneki yok sayılır
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return not candidates.isdisjoint(etags)
+
+
+class StaticBundle:
+    """Build klasöründeki dosyaların bellekteki kopyası."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self._assets = {}
+
+    def load(self):
+        """Build klasörünü tarar; tüm dosyaları okuyup sıkıştırır."""
+        assets = {}
+        raw_bytes = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                rel_path = os.path.relpath(path, self.root).replace(os.sep, "/")
+                ext = os.path.splitext(filename)[1].lower()
+                media_type = _MEDIA_TYPES.get(ext) or mimetypes.guess_type(filename)[0] or "application/octet-stream"
+                with open(path, "rb") as f:
+                    body = f.read()
+                raw_bytes += len(body)
+                assets[rel_path] = StaticAsset(body, media_type, _cache_control(rel_path))
+        self._assets = assets
+        logger.info("Static bundle loaded: %d files, %.1f KB (brotli %s)", len(assets), raw_bytes / 1024,
+                    "enabled" if brotli is not None else "unavailable")
+
+    def __contains__(self, rel_path: str) -> bool:
+        return rel_path in self._assets
+
+    def response(self, rel_path: str, headers) -> Response:
+        """
+        Dosya için HTTP yanıtı; dosya yoksa None.
+        headers: İstek başlıkları (If-None-Match, Accept-Encoding)
+        """
+        asset = self._assets.get(rel_path)
+        if asset is None:
+            return None
+
+        accepted = _accepted_encodings(headers.get("accept-encoding"))
+        encoding = next((e for e in ("br", "gzip") if e in accepted and e in asset.variants), "identity")
+        body, etag = asset.variants[encoding]
+        response_headers = {"ETag": etag, "Cache-Control": asset.cache_control}
+        if len(asset.variants) > 1:
+            response_headers["Vary"] = "Accept-Encoding"
+
+        if _etag_matches(headers.get("if-none-match"), asset.etags()):
+            return Response(status_code=304, headers=response_headers)
+
+        if encoding != "identity":
+            response_headers["Content-Encoding"] = encoding
+        return Response(content=body, media_type=asset.media_type, headers=response_headers)
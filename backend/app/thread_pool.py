@@ -0,0 +1,110 @@
+"""
+NeoBI Thread Pool
+Önceden oluşturulmuş OpenAI thread'lerinden oluşan havuz.
+
+/api/chat/start her widget açılışında çağrılır; thread'i o anda oluşturmak yerine
+havuzdan O(1) ile alıyoruz. Arka plandaki bir thread havuzu hedef boyutta tutar
+ve süresi dolan (hiç kullanılmamış) thread'leri OpenAI tarafında siler.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+
+from .assistant import client, create_thread, EXECUTION_ENGINE
+
+logger = logging.getLogger(__name__)
+
+# Havuzda hazır tutulacak thread sayısı (0 = havuz kapalı)
+THREAD_POOL_SIZE = int(os.getenv("NEOBI_THREAD_POOL_SIZE", "5"))
+# Kullanılmayan thread'in havuzda kalabileceği maksimum süre (saniye)
+THREAD_POOL_MAX_AGE = int(os.getenv("NEOBI_THREAD_POOL_MAX_AGE", "3600"))
+# Arka plan bakım döngüsünün periyodu (saniye)
+THREAD_POOL_MAINTENANCE_INTERVAL = int(os.getenv("NEOBI_THREAD_POOL_MAINTENANCE_INTERVAL", "60"))
+
+
+class ThreadPool:
+    """Hazır OpenAI thread ID'lerini tutan FIFO havuz."""
+
+    def __init__(self, size: int = THREAD_POOL_SIZE, max_age: int = THREAD_POOL_MAX_AGE):
+        self.size = size
+        self.max_age = max_age
+        self._threads = deque()  # (thread_id, created_at)
+        self._expired = []       # take() sırasında atlanan, silinmeyi bekleyen thread ID'leri
+        self._lock = threading.Lock()
+        self._refill_event = threading.Event()
+        self._worker = None
+        self.hits = 0
+        self.misses = 0
+
+    def start(self):
+        """Arka plan dolum thread'ini başlatır."""
+        # Chat Completions modunda thread'ler yerel oluşturulur, havuza gerek yok
+        if self.size <= 0 or EXECUTION_ENGINE == "chat" or self._worker is not None:
+            return
+        self._worker = threading.Thread(target=self._run, name="neobi-thread-pool", daemon=True)
+        self._worker.start()
+        self._refill_event.set()
+
+    def take(self) -> str:
+        """
+        Havuzdan bir thread ID'si alır. Havuz boşsa thread'i senkron oluşturur.
+        """
+        now = time.monotonic()
+        with self._lock:
+            while self._threads:
+                thread_id, created_at = self._threads.popleft()
+                if now - created_at < self.max_age:
+                    self.hits += 1
+                    self._refill_event.set()
+                    return thread_id
+                # Süresi dolmuş; OpenAI tarafında silinmesi bakım döngüsüne bırakılır
+                self._expired.append(thread_id)
+        self.misses += 1
+        self._refill_event.set()
+        return create_thread().id
+
+    def stats(self) -> dict:
+        with self._lock:
+            available = len(self._threads)
+        return {"available": available, "target_size": self.size, "hits": self.hits, "misses": self.misses}
+
+    def _run(self):
+        while True:
+            self._refill_event.wait(THREAD_POOL_MAINTENANCE_INTERVAL)
+            self._refill_event.clear()
+            try:
+                self._evict_expired()
+                self._refill()
+            except Exception as e:
+                logger.error("Thread pool maintenance failed: %s", e)
+
+    def _refill(self):
+        while True:
+            with self._lock:
+                missing = self.size - len(self._threads)
+            if missing <= 0:
+                return
+            thread = create_thread()
+            with self._lock:
+                self._threads.append((thread.id, time.monotonic()))
+            logger.debug("Thread pool refilled: %s", thread.id)
+
+    def _evict_expired(self):
+        now = time.monotonic()
+        with self._lock:
+            expired, self._expired = self._expired, []
+            # En eski thread'ler solda; ilk taze thread'de dur
+            while self._threads and now - self._threads[0][1] >= self.max_age:
+                expired.append(self._threads.popleft()[0])
+        for thread_id in expired:
+            try:
+                client.beta.threads.delete(thread_id)
+            except Exception as e:
+                logger.warning("Expired pooled thread %s could not be deleted: %s", thread_id, e)
+
+
+# Singleton instance
+thread_pool = ThreadPool()
@@ -3,20 +3,66 @@ NeoBot Tools - NeoOne API Entegrasyonu
 Gerçek NeoOne sistemine bağlı tool fonksiyonları.
 """
 
+import os
 import json
+import time
+import logging
 from .api_client import neoone_client
+from . import analytics
+from .exports import export_link, EXPORT_LINK_TTL
+from .discount_queue import discount_queue
+from .product_catalog import get_product_catalog
+from .prefetch import prefetcher
+from .shared_cache import shared_cache, not_stale
 
-# Cache for customer groups (to avoid repeated API calls)
-_customer_groups_cache = None
+logger = logging.getLogger(__name__)
+
+# Müşteri grupları paylaşımlı cache'te tutulur (tüm worker'larda tek API çağrısı)
+CUSTOMER_GROUPS_TTL = int(os.getenv("NEOBI_CUSTOMER_GROUPS_TTL", "3600"))
+
+# Aktif iskontolar kısa süre cache'lenir (bot'un oluşturduğu iskontolar PASİF başlar)
+ACTIVE_DISCOUNTS_TTL = int(os.getenv("NEOBI_ACTIVE_DISCOUNTS_TTL", "60"))
+_active_discounts_cache = None
+_active_discounts_fetched_at = 0.0
 
 # --- Helper Functions ---
 
 def _get_customer_groups_cached():
     """Müşteri gruplarını cache'den veya API'den al."""
-    global _customer_groups_cache
-    if _customer_groups_cache is None:
-        _customer_groups_cache = neoone_client.get_customer_groups()
-    return _customer_groups_cache
+    prefetcher.record_use("customer_groups")
+    return shared_cache.get_or_set("customer_groups", neoone_client.get_customer_groups,
+                                   ttl=CUSTOMER_GROUPS_TTL, cacheable=not_stale)
+
+def _get_active_discounts_cached():
+    """Aktif iskontoları cache'den veya API'den al. Eski (stale) yanıt cache'lenmez."""
+    global _active_discounts_cache, _active_discounts_fetched_at
+    prefetcher.record_use("active_discounts")
+    if _active_discounts_cache is not None and time.monotonic() < active_discounts_expires_at():
+        return _active_discounts_cache
+    discounts = neoone_client.get_active_discounts()
+    if not getattr(discounts, "stale", False):
+        _active_discounts_cache, _active_discounts_fetched_at = discounts, time.monotonic()
+    return discounts
+
+def active_discounts_expires_at() -> float:
+    """Cache'teki aktif iskonto listesinin geçerlilik sonu (time.monotonic() cinsinden)."""
+    return _active_discounts_fetched_at + ACTIVE_DISCOUNTS_TTL if _active_discounts_cache is not None else 0.0
+
+def _dumps(result, *sources):
+    """
+    Tool çıktısını JSON'a çevirir. Kaynak verilerden biri NeoOne erişilemezken
+    son başarılı yanıttan geldiyse (StaleList) çıktıya uyarı eklenir.
+    """
+    stale = [src for src in sources if getattr(src, "stale", False)]
+    if stale:
+        fetched_at = min(src.fetched_at for src in stale)
+        result = {
+            "uyari": f"NeoOne şu anda yanıt vermiyor; veriler {fetched_at.strftime('%d.%m.%Y %H:%M')} "
+                     f"tarihli son başarılı yanıttan alındı.",
+            "stale": True,
+            "data": result
+        }
+    return json.dumps(result, ensure_ascii=False)
 
 def _get_group_name(group_id: int) -> str:
     """Grup ID'sinden grup adını bul."""
@@ -26,20 +72,61 @@ def _get_group_name(group_id: int) -> str:
             return g.get("customerGroupName", f"Grup {group_id}")
     return f"Grup {group_id}"
 
+_JOB_STATUS_MESSAGES = {
+    "pending": "NeoOne'a gönderilmek üzere kuyrukta bekliyor.",
+    "running": "NeoOne'a gönderiliyor.",
+    "succeeded": "Başarıyla oluşturuldu (PASİF durumda). Yönetici onayı ile aktif edilecektir.",
+    "failed": "Oluşturulamadı.",
+}
+
+def _job_status(job: dict) -> dict:
+    """Kuyruk işinin tool çıktısındaki formatı."""
+    status = {
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "message": _JOB_STATUS_MESSAGES[job["status"]],
+        "attempts": job["attempts"],
+    }
+    if job["status"] == "succeeded":
+        status["data"] = (job["result"] or {}).get("data")
+    elif job["error"]:
+        status["error"] = job["error"]
+    return status
+
+def _job_response(job: dict, created: bool, label: str) -> str:
+    """create_discount / create_bonus_discount çıktısı: iş ID'si ve kuyruk durumu."""
+    result = _job_status(job)
+    result["success"] = job["status"] != "failed"
+    if created:
+        result["message"] = (f"{label} talebi alındı (iş no: {job['job_id']}). NeoOne'a arka planda gönderilecek "
+                             f"ve PASİF olarak oluşturulacak; sonucu get_discount_job_status ile kontrol edebilirsin.")
+    else:
+        result["message"] = f"{label} talebi zaten alınmış (iş no: {job['job_id']}). " + result["message"]
+    return json.dumps(result, ensure_ascii=False)
+
+def _export_response(dataset: str, export_format: str, **filters) -> str:
+    """Export tool çıktısı: satırlar yerine imzalı indirme linki."""
+    return json.dumps({
+        "download_url": export_link(dataset, export_format, **filters),
+        "format": export_format,
+        "expires_in_minutes": EXPORT_LINK_TTL // 60,
+        "message": "Dosya indirme linki hazır. Satırları sohbete yazma, linki kullanıcıyla paylaş."
+    }, ensure_ascii=False)
+
 # --- Tool Functions ---
 
 def get_customer_groups():
     """
     Mevcut müşteri gruplarını listeler.
     """
-    print("DEBUG: get_customer_groups çağrıldı (API).")
+    logger.debug("get_customer_groups çağrıldı (API).")
     try:
         groups = neoone_client.get_customer_groups()
         # Format for AI
         formatted = [{"id": g["id"], "name": g.get("customerGroupName", "")} for g in groups]
-        return json.dumps(formatted, ensure_ascii=False)
+        return _dumps(formatted, groups)
     except Exception as e:
-        print(f"ERROR: get_customer_groups failed: {e}")
+        logger.error("get_customer_groups failed: %s", e)
         return json.dumps({"error": str(e)})
 
 def get_customer_count(group_by: str = None):
@@ -47,87 +134,62 @@ def get_customer_count(group_by: str = None):
     Müşteri sayısını getirir. Grup bazlı veya toplam olarak.
     group_by: 'group' ise müşteri grubu bazlı sayım yapar.
     """
-    print(f"DEBUG: get_customer_count çağrıldı. group_by: {group_by}")
+    logger.debug("get_customer_count çağrıldı. group_by: %s", group_by)
     try:
-        customers = neoone_client.get_customers()
-        total_count = len(customers)
-        
-        if group_by == "group":
-            # Grup bazlı sayım
-            group_counts = {}
-            for c in customers:
-                group_info = c.get("customerGroup", {})
-                group_name = group_info.get("customerGroupName", "Tanımsız")
-                group_counts[group_name] = group_counts.get(group_name, 0) + 1
-            
-            result = {
-                "total_customers": total_count,
-                "by_group": [{"group_name": k, "count": v} for k, v in sorted(group_counts.items(), key=lambda x: x[1], reverse=True)]
-            }
-        else:
-            result = {"total_customers": total_count}
-        
-        return json.dumps(result, ensure_ascii=False)
+        # Sayılar bellekteki istatistik servisinden gelir (bkz. customer_stats)
+        return _dumps(*analytics.customer_counts(group_by=group_by))
     except Exception as e:
-        print(f"ERROR: get_customer_count failed: {e}")
+        logger.error("get_customer_count failed: %s", e)
         return json.dumps({"error": str(e)})
 
 def get_product_groups():
     """
     Ürün gruplarını (kategorileri) listeler.
     """
-    print("DEBUG: get_product_groups çağrıldı (API).")
+    logger.debug("get_product_groups çağrıldı (API).")
     try:
         groups = neoone_client.get_product_groups()
         # Format for AI
         formatted = [{"id": g.get("id"), "name": g.get("name", g.get("productGroupName", ""))} for g in groups]
-        return json.dumps(formatted, ensure_ascii=False)
+        return _dumps(formatted, groups)
     except Exception as e:
-        print(f"ERROR: get_product_groups failed: {e}")
+        logger.error("get_product_groups failed: %s", e)
         return json.dumps({"error": str(e)})
 
 def get_product_sales(start_date: str = None, end_date: str = None):
     """
     Ürün satış raporunu getirir.
     """
-    print(f"DEBUG: get_product_sales çağrıldı. Başlangıç: {start_date}, Bitiş: {end_date}")
+    logger.debug("get_product_sales çağrıldı. Başlangıç: %s, Bitiş: %s", start_date, end_date)
     try:
         sales = neoone_client.get_product_sales(start_date, end_date)
-        return json.dumps(sales, ensure_ascii=False)
+        return _dumps([p.to_dict() for p in sales], sales)
     except Exception as e:
-        print(f"ERROR: get_product_sales failed: {e}")
+        logger.error("get_product_sales failed: %s", e)
         return json.dumps({"error": str(e)})
 
 def search_product(query: str):
     """
     Ürün ismine göre arama yapar ve eşleşen ürünleri getirir.
     """
-    print(f"DEBUG: search_product çağrıldı. Sorgu: {query}")
+    logger.debug("search_product çağrıldı. Sorgu: %s", query)
     try:
-        all_products = neoone_client.get_product_sales()
-        # Filter by name (case-insensitive)
+        # Ürün kataloğunun ad indeksinden ara (ürünler id'ye göre tekil)
+        catalog = get_product_catalog()
         results = [
             {
-                "id": p["productId"],
-                "name": p["productName"],
-                "code": p["productCode"],
-                "category": p.get("productGroupName", ""),
-                "total_sales": p.get("quantitySold", 0),
-                "total_revenue": p.get("totalSales", 0)
+                "id": p.id,
+                "name": p.name,
+                "code": p.code,
+                "category": p.category,
+                "total_sales": p.quantity_sold,
+                "total_revenue": p.total_revenue
             }
-            for p in all_products 
-            if query.lower() in p.get("productName", "").lower()
+            for p in (catalog.products[pos] for pos in catalog.search(query))
         ]
-        # Remove duplicates by productId
-        seen = set()
-        unique_results = []
-        for r in results:
-            if r["id"] not in seen:
-                seen.add(r["id"])
-                unique_results.append(r)
-        return json.dumps(unique_results, ensure_ascii=False)
+        return _dumps(results, catalog.source)
     except Exception as e:
-        print(f"ERROR: search_product failed: {e}")
+        logger.error("search_product failed: %s", e)
         return json.dumps({"error": str(e)})
 
 def get_top_bottom_products(limit: int = 3, order: str = "asc", customer_group_id: int = None):
@@ -136,79 +198,39 @@ def get_top_bottom_products(limit: int = 3, order: str = "asc", customer_group_i
     order='asc' -> En az satanlar (küçükten büyüğe)
     order='desc' -> En çok satanlar (büyükten küçüğe)
     """
-    print(f"DEBUG: get_top_bottom_products çağrıldı. Limit: {limit}, Sıra: {order}, Grup: {customer_group_id}")
+    logger.debug("get_top_bottom_products çağrıldı. Limit: %s, Sıra: %s, Grup: %s", limit, order, customer_group_id)
     try:
-        all_products = neoone_client.get_product_sales()
-        
-        # Aggregate by product (sum quantities for same product)
-        product_totals = {}
-        for p in all_products:
-            pid = p["productId"]
-            # Skip bonus/bedelsiz products
-            if "[BONUS]" in p.get("productName", "") or "[BEDELSİZ]" in p.get("productName", ""):
-                continue
-            
-            if pid not in product_totals:
-                product_totals[pid] = {
-                    "id": pid,
-                    "name": p["productName"],
-                    "code": p["productCode"],
-                    "category": p.get("productGroupName", ""),
-                    "quantity_sold": 0,
-                    "total_revenue": 0
-                }
-            product_totals[pid]["quantity_sold"] += p.get("quantitySold", 0)
-            product_totals[pid]["total_revenue"] += p.get("totalSales", 0)
-        
-        products_list = list(product_totals.values())
-        
-        # Sort
-        reverse = (order == "desc")
-        sorted_products = sorted(products_list, key=lambda x: x["quantity_sold"], reverse=reverse)
-        
-        # Limit
-        result = sorted_products[:limit]
-        
-        return json.dumps(result, ensure_ascii=False)
+        # customer_group_id: satış raporunda müşteri grubu kırılımı yok, filtre uygulanmaz
+        return _dumps(*analytics.top_bottom_products(limit=limit, order=order))
     except Exception as e:
-        print(f"ERROR: get_top_bottom_products failed: {e}")
+        logger.error("get_top_bottom_products failed: %s", e)
         return json.dumps({"error": str(e)})
 
-def get_low_selling_products(threshold: int = 100, customer_group_id: int = None):
+def get_low_selling_products(threshold: int = 100, customer_group_id: int = None, export_format: str = None):
     """
     Satış adedi belirli bir eşiğin altında olan ürünleri getirir.
+    export_format ('csv' / 'xlsx') verilirse satırlar yerine indirme linki döner.
     """
-    print(f"DEBUG: get_low_selling_products çağrıldı. Eşik: {threshold}, Grup: {customer_group_id}")
+    logger.debug("get_low_selling_products çağrıldı. Eşik: %s, Grup: %s, Export: %s", threshold, customer_group_id, export_format)
     try:
-        all_products = neoone_client.get_product_sales()
-        
-        # Aggregate by product
-        product_totals = {}
-        for p in all_products:
-            pid = p["productId"]
-            # Skip bonus/bedelsiz products
-            if "[BONUS]" in p.get("productName", "") or "[BEDELSİZ]" in p.get("productName", ""):
-                continue
-            
-            if pid not in product_totals:
-                product_totals[pid] = {
-                    "id": pid,
-                    "name": p["productName"],
-                    "code": p["productCode"],
-                    "category": p.get("productGroupName", ""),
-                    "quantity_sold": 0
-                }
-            product_totals[pid]["quantity_sold"] += p.get("quantitySold", 0)
-        
-        # Filter below threshold
-        low_selling = [p for p in product_totals.values() if p["quantity_sold"] < threshold]
-        
-        # Sort by quantity (lowest first)
-        low_selling.sort(key=lambda x: x["quantity_sold"])
-        
-        return json.dumps(low_selling, ensure_ascii=False)
+        if export_format:
+            return _export_response("low-selling-products", export_format, threshold=threshold)
+        return _dumps(*analytics.low_selling_products(threshold=threshold))
+    except Exception as e:
+        logger.error("get_low_selling_products failed: %s", e)
+        return json.dumps({"error": str(e)})
+
+def get_product_trends(direction: str = "declining", period: str = "mom", category: str = None, limit: int = 20):
+    """
+    Ürünlerin dönemsel satış trendlerini getirir (haftalık/aylık değişim, hareketli ortalamalar, düşüş işaretleri).
+    direction: 'declining' (düşüştekiler), 'rising' (yükselenler), 'all'
+    period: sıralama için 'wow' (haftalık) veya 'mom' (aylık) değişim
+    """
+    logger.debug("get_product_trends çağrıldı. Yön: %s, Dönem: %s, Kategori: %s, Limit: %s", direction, period, category, limit)
+    try:
+        return _dumps(*analytics.product_trends(direction=direction, period=period, category=category, limit=limit))
     except Exception as e:
-        print(f"ERROR: get_low_selling_products failed: {e}")
+        logger.error("get_product_trends failed: %s", e)
         return json.dumps({"error": str(e)})
 
 def get_product_sales_distribution(product_id: int = None, limit: int = 5, order: str = "asc"):
@@ -218,13 +240,13 @@ def get_product_sales_distribution(product_id: int = None, limit: int = 5, order
     - product_id verilirse: O ürünün birim bazlı dağılımı
     - order='asc': En az satanlar, order='desc': En çok satanlar
     """
-    print(f"DEBUG: get_product_sales_distribution çağrıldı. Ürün: {product_id}, Limit: {limit}, Order: {order}")
+    logger.debug("get_product_sales_distribution çağrıldı. Ürün: %s, Limit: %s, Order: %s", product_id, limit, order)
     try:
         all_products = neoone_client.get_product_sales()
         
         # Eğer product_id verilmişse, o ürünün detayını göster
         if product_id is not None:
-            product_sales = [p for p in all_products if p["productId"] == product_id]
+            product_sales = [p for p in all_products if p.product_id == product_id]
             
             if not product_sales:
                 return json.dumps({"error": "Ürün bulunamadı."})
@@ -232,11 +254,9 @@ def get_product_sales_distribution(product_id: int = None, limit: int = 5, order
             # Aggregate by unit of measure
             unit_totals = {}
             for p in product_sales:
-                if "[BONUS]" in p.get("productName", "") or "[BEDELSİZ]" in p.get("productName", ""):
+                if p.is_free_goods:
                     continue
-                unit = p.get("unitOfMeasureName", "Birim")
-                qty = p.get("quantitySold", 0)
-                unit_totals[unit] = unit_totals.get(unit, 0) + qty
+                unit_totals[p.unit_of_measure_name] = unit_totals.get(p.unit_of_measure_name, 0) + p.quantity_sold
             
             distribution = [{"name": unit, "value": int(qty)} for unit, qty in unit_totals.items() if qty > 0]
             distribution.sort(key=lambda x: x["value"], reverse=True)
@@ -244,21 +264,21 @@ def get_product_sales_distribution(product_id: int = None, limit: int = 5, order
             if not distribution:
                 return json.dumps({"error": "Bu ürün için satış verisi bulunamadı."})
             
-            return json.dumps(distribution, ensure_ascii=False)
+            return _dumps(distribution, all_products)
         
         # product_id yoksa: En az/çok satan ürünlerin karşılaştırması
         product_totals = {}
         for p in all_products:
-            pid = p["productId"]
-            if "[BONUS]" in p.get("productName", "") or "[BEDELSİZ]" in p.get("productName", ""):
+            pid = p.product_id
+            if p.is_free_goods:
                 continue
             
             if pid not in product_totals:
                 product_totals[pid] = {
-                    "name": p["productName"],
+                    "name": p.product_name,
                     "value": 0
                 }
-            product_totals[pid]["value"] += int(p.get("quantitySold", 0))
+            product_totals[pid]["value"] += int(p.quantity_sold)
         
         products_list = list(product_totals.values())
         
@@ -269,9 +289,9 @@ def get_product_sales_distribution(product_id: int = None, limit: int = 5, order
         # Limit kadar al
         distribution = products_list[:limit]
         
-        return json.dumps(distribution, ensure_ascii=False)
+        return _dumps(distribution, all_products)
     except Exception as e:
-        print(f"ERROR: get_product_sales_distribution failed: {e}")
+        logger.error("get_product_sales_distribution failed: %s", e)
         return json.dumps({"error": str(e)})
 
 def create_discount(product_id: int, customer_group_id: int, discount_rate: int, duration_days: int, confirmed: bool = False):
@@ -279,7 +299,7 @@ def create_discount(product_id: int, customer_group_id: int, discount_rate: int,
     Belirli bir ürün ve müşteri grubu için iskonto tanımlar.
     İskonto PASİF olarak oluşturulur, yönetici onayı ile aktif edilir.
     """
-    print(f"DEBUG: create_discount çağrıldı. Ürün: {product_id}, Grup: {customer_group_id}, Oran: %{discount_rate}, Süre: {duration_days} gün, Onay: {confirmed}")
+    logger.debug("create_discount çağrıldı. Ürün: %s, Grup: %s, Oran: %%%s, Süre: %s gün, Onay: %s", product_id, customer_group_id, discount_rate, duration_days, confirmed)
     
     if not confirmed:
         return json.dumps({"error": "İşlem kullanıcı tarafından onaylanmadı. Lütfen kullanıcıdan açıkça onay isteyin."})
@@ -291,34 +311,26 @@ def create_discount(product_id: int, customer_group_id: int, discount_rate: int,
         start_date = datetime.now()
         end_date = start_date + timedelta(days=duration_days)
         
-        # API client'ı yeni formatla çağır
-        result = neoone_client.create_discount(
-            product_id=product_id,
-            customer_group_id=customer_group_id,
-            discount_percent=discount_rate,
-            start_date=start_date.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
-            end_date=end_date.strftime("%Y-%m-%dT%H:%M:%S.000Z")
-        )
-        
-        # Add helpful message
-        if result.get("success"):
-            return json.dumps({
-                "success": True,
-                "message": f"İskonto başarıyla oluşturuldu (PASİF durumda). Yönetici onayı ile aktif edilecektir.",
-                "data": result.get("data")
-            }, ensure_ascii=False)
-        else:
-            return json.dumps(result, ensure_ascii=False)
+        # NeoOne'a gönderim arka plandaki kuyruk worker'ı tarafından yapılır
+        job, created = discount_queue.enqueue("discount", {
+            "product_id": product_id,
+            "customer_group_id": customer_group_id,
+            "discount_percent": discount_rate,
+            "start_date": start_date.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+            "end_date": end_date.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        })
+        return _job_response(job, created, "İskonto")
             
     except Exception as e:
-        print(f"ERROR: create_discount failed: {e}")
+        logger.error("create_discount failed: %s", e)
         return json.dumps({"error": str(e)})
 
 def check_discount_performance(discount_id: int):
     """
-    İskonto performansını kontrol eder.
+    İskonto performansını kontrol eder: iskonto dönemindeki satışları, hemen önceki
+    eşit uzunluktaki dönemle karşılaştırır (adet/ciro değişimi ve lift yüzdesi).
     """
-    print(f"DEBUG: check_discount_performance çağrıldı. ID: {discount_id}")
+    logger.debug("check_discount_performance çağrıldı. ID: %s", discount_id)
     try:
         discounts = neoone_client.get_discounts()
         discount = next((d for d in discounts if d.get("id") == discount_id), None)
@@ -326,63 +338,59 @@ def check_discount_performance(discount_id: int):
         if not discount:
             return json.dumps({"error": "İskonto bulunamadı."})
         
-        return json.dumps(discount, ensure_ascii=False)
+        result, source = analytics.discount_lift(discount)
+        return _dumps(result, discounts, source)
     except Exception as e:
-        print(f"ERROR: check_discount_performance failed: {e}")
+        logger.error("check_discount_performance failed: %s", e)
+        return json.dumps({"error": str(e)})
+
+def rank_discounts_by_lift(metric: str = "quantity", limit: int = 10, order: str = "desc"):
+    """
+    Aktif iskontoları satış etkisine (lift) göre sıralar.
+    metric: 'quantity' (adet) veya 'revenue' (ciro)
+    """
+    logger.debug("rank_discounts_by_lift çağrıldı. Metrik: %s, Limit: %s, Sıra: %s", metric, limit, order)
+    try:
+        discounts = _get_active_discounts_cached()
+        result, source = analytics.rank_discount_lift(list(discounts), metric=metric, limit=limit, order=order)
+        return _dumps(result, discounts, source)
+    except Exception as e:
+        logger.error("rank_discounts_by_lift failed: %s", e)
         return json.dumps({"error": str(e)})
 
 def get_active_discounts():
     """
     Aktif iskontoları listeler.
     """
-    print("DEBUG: get_active_discounts çağrıldı.")
+    logger.debug("get_active_discounts çağrıldı.")
     try:
-        discounts = neoone_client.get_active_discounts()
-        return json.dumps(discounts, ensure_ascii=False)
+        discounts = _get_active_discounts_cached()
+        return _dumps(list(discounts), discounts)
     except Exception as e:
-        print(f"ERROR: get_active_discounts failed: {e}")
+        logger.error("get_active_discounts failed: %s", e)
         return json.dumps({"error": str(e)})
 
-def get_customer_sales_performance(customer_group_name: str = None, city: str = None, 
-                                    order_by: str = "revenue_desc", limit: int = 10):
+def get_customer_sales_performance(customer_group_name: str = None, city: str = None, district: str = None,
+                                    order_by: str = "revenue_desc", limit: int = 10, export_format: str = None):
     """
     Müşteri satış performansını getirir. Bölge ve ciro bazlı filtreleme yapılabilir.
+    export_format ('csv' / 'xlsx') verilirse satırlar yerine indirme linki döner (limit uygulanmaz).
     """
-    print(f"DEBUG: get_customer_sales_performance çağrıldı. Grup: {customer_group_name}, Şehir: {city}, Sıralama: {order_by}, Limit: {limit}")
+    logger.debug("get_customer_sales_performance çağrıldı. Grup: %s, Şehir: %s, İlçe: %s, Sıralama: %s, Limit: %s, Export: %s", customer_group_name, city, district, order_by, limit, export_format)
     try:
-        customers = neoone_client.get_customer_sales_performance()
-        
-        # Filtrele
-        if customer_group_name:
-            customers = [c for c in customers if customer_group_name.lower() in c.get("customerGroupName", "").lower()]
-        
-        if city:
-            customers = [c for c in customers if city.lower() in c.get("city", "").lower()]
-        
-        # Sırala
-        reverse = (order_by == "revenue_desc")
-        customers.sort(key=lambda x: x.get("totalRevenue", 0), reverse=reverse)
-        
-        # Limit uygula
-        customers = customers[:limit]
-        
-        # Basitleştirilmiş çıktı
-        result = [
-            {
-                "customer_id": c.get("customerId"),
-                "customer_name": c.get("customerName"),
-                "city": c.get("city"),
-                "district": c.get("district"),
-                "customer_group": c.get("customerGroupName"),
-                "total_revenue": c.get("totalRevenue"),
-                "order_count": c.get("orderCount")
-            }
-            for c in customers
-        ]
-        
-        return json.dumps(result, ensure_ascii=False)
+        if export_format:
+            return _export_response("customers", export_format, customer_group_name=customer_group_name,
+                                    city=city, district=district, order_by=order_by)
+        result, source = analytics.customer_performance(
+            customer_group_name=customer_group_name,
+            city=city,
+            district=district,
+            order_by=order_by,
+            limit=limit,
+        )
+        return _dumps(result, source)
     except Exception as e:
-        print(f"ERROR: get_customer_sales_performance failed: {e}")
+        logger.error("get_customer_sales_performance failed: %s", e)
         return json.dumps({"error": str(e)})
 
 def create_bonus_discount(product_id: int, customer_group_id: int = None, customer_id: int = None,
@@ -393,7 +401,7 @@ def create_bonus_discount(product_id: int, customer_group_id: int = None, custom
     customer_group_id: Müşteri grubu ID'si (tüm gruba uygulanır)
     customer_id: Belirli bir müşteri ID'si (tek müşteriye uygulanır)
     """
-    print(f"DEBUG: create_bonus_discount çağrıldı. Ürün: {product_id}, Grup: {customer_group_id}, Müşteri: {customer_id}, Al: {buy_quantity}, Bedava: {bonus_quantity}, Süre: {duration_days} gün, Onay: {confirmed}")
+    logger.debug("create_bonus_discount çağrıldı. Ürün: %s, Grup: %s, Müşteri: %s, Al: %s, Bedava: %s, Süre: %s gün, Onay: %s", product_id, customer_group_id, customer_id, buy_quantity, bonus_quantity, duration_days, confirmed)
     
     if not confirmed:
         return json.dumps({"error": "İşlem kullanıcı tarafından onaylanmadı. Lütfen kullanıcıdan açıkça onay isteyin."})
@@ -404,40 +412,46 @@ def create_bonus_discount(product_id: int, customer_group_id: int = None, custom
         start_date = datetime.now()
         end_date = start_date + timedelta(days=duration_days)
         
-        result = neoone_client.create_bonus_discount(
-            product_id=product_id,
-            customer_group_id=customer_group_id,
-            customer_id=customer_id,
-            buy_quantity=buy_quantity,
-            bonus_quantity=bonus_quantity,
-            start_date=start_date.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
-            end_date=end_date.strftime("%Y-%m-%dT%H:%M:%S.000Z")
-        )
-        
-        if result.get("success"):
-            return json.dumps({
-                "success": True,
-                "message": f"'{buy_quantity} al {bonus_quantity} bedava' kampanyası başarıyla oluşturuldu (PASİF durumda). Yönetici onayı ile aktif edilecektir.",
-                "data": result.get("data")
-            }, ensure_ascii=False)
-        else:
-            return json.dumps(result, ensure_ascii=False)
+        job, created = discount_queue.enqueue("bonus_discount", {
+            "product_id": product_id,
+            "customer_group_id": customer_group_id,
+            "customer_id": customer_id,
+            "buy_quantity": buy_quantity,
+            "bonus_quantity": bonus_quantity,
+            "start_date": start_date.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+            "end_date": end_date.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        })
+        return _job_response(job, created, f"'{buy_quantity} al {bonus_quantity} bedava' kampanyası")
             
     except Exception as e:
-        print(f"ERROR: create_bonus_discount failed: {e}")
+        logger.error("create_bonus_discount failed: %s", e)
+        return json.dumps({"error": str(e)})
+
+def get_discount_job_status(job_id: str):
+    """
+    Kuyruğa alınmış iskonto/kampanya oluşturma işinin durumunu getirir.
+    """
+    logger.debug("get_discount_job_status çağrıldı. İş: %s", job_id)
+    try:
+        job = discount_queue.get(job_id)
+        if not job:
+            return json.dumps({"error": "İş bulunamadı."}, ensure_ascii=False)
+        return json.dumps(_job_status(job), ensure_ascii=False)
+    except Exception as e:
+        logger.error("get_discount_job_status failed: %s", e)
         return json.dumps({"error": str(e)})
 
 def get_cities_districts():
     """
     Sistemdeki şehir ve ilçeleri listeler.
     """
-    print("DEBUG: get_cities_districts çağrıldı.")
+    logger.debug("get_cities_districts çağrıldı.")
     try:
         cities = neoone_client.get_cities()
         result = [{"id": c.get("id"), "name": c.get("name")} for c in cities]
-        return json.dumps(result, ensure_ascii=False)
+        return _dumps(result, cities)
     except Exception as e:
-        print(f"ERROR: get_cities_districts failed: {e}")
+        logger.error("get_cities_districts failed: %s", e)
         return json.dumps({"error": str(e)})
 
 # OpenAI Function Definitions (Schema)
@@ -474,6 +488,11 @@ tools_schema = [
                     "customer_group_id": {
                         "type": "integer",
                         "description": "Analiz yapılacak müşteri grubu ID'si. Belirtilmezse tüm gruplardaki toplam satışa bakılır."
+                    },
+                    "export_format": {
+                        "type": "string",
+                        "enum": ["csv", "xlsx"],
+                        "description": "Kullanıcı listeyi dosya olarak (Excel/CSV) isterse verilir; satırlar yerine indirme linki döner."
                     }
                 },
                 "required": []
@@ -548,7 +567,7 @@ tools_schema = [
         "type": "function",
         "function": {
             "name": "create_discount",
-            "description": "Bir ürün ve müşteri grubu için yeni bir iskonto kampanyası oluşturur. İskonto PASİF olarak oluşturulur, yönetici onayı ile aktifleşir.",
+            "description": "Bir ürün ve müşteri grubu için yeni bir iskonto kampanyası oluşturur. İskonto PASİF olarak oluşturulur, yönetici onayı ile aktifleşir. İstek kuyruğa alınır ve bir iş ID'si (job_id) döner; sonuç get_discount_job_status ile sorgulanır.",
             "parameters": {
                 "type": "object",
                 "properties": {
@@ -581,7 +600,7 @@ tools_schema = [
         "type": "function",
         "function": {
             "name": "check_discount_performance",
-            "description": "Var olan bir iskontonun detaylarını ve performans verilerini getirir.",
+            "description": "Var olan bir iskontonun performansını getirir: iskonto dönemindeki satış adedi ve cirosunu, hemen önceki eşit uzunluktaki dönemle karşılaştırır (değişim ve lift yüzdesi). Değerler ürünün tüm müşterilerdeki satışıdır (raporda müşteri grubu kırılımı yoktur).",
             "parameters": {
                 "type": "object",
                 "properties": {
@@ -622,6 +641,10 @@ tools_schema = [
                         "type": "string",
                         "description": "Filtrelenecek şehir adı (örn: 'İstanbul')"
                     },
+                    "district": {
+                        "type": "string",
+                        "description": "Filtrelenecek ilçe adı (örn: 'Kadıköy'). Şehir ile birlikte kullanılabilir."
+                    },
                     "order_by": {
                         "type": "string",
                         "enum": ["revenue_asc", "revenue_desc"],
@@ -630,6 +653,11 @@ tools_schema = [
                     "limit": {
                         "type": "integer",
                         "description": "Kaç müşteri getirileceği. Varsayılan 10."
+                    },
+                    "export_format": {
+                        "type": "string",
+                        "enum": ["csv", "xlsx"],
+                        "description": "Kullanıcı listeyi dosya olarak (Excel/CSV) isterse verilir; filtreye uyan tüm müşteriler için indirme linki döner."
                     }
                 },
                 "required": []
@@ -640,7 +668,7 @@ tools_schema = [
         "type": "function",
         "function": {
             "name": "create_bonus_discount",
-            "description": "X al Y bedava tipi kampanya oluşturur. Örneğin '2 kutu alana 1 kutu hediye' kampanyası. İskonto PASİF olarak oluşturulur. customer_group_id VEYA customer_id'den biri verilmelidir.",
+            "description": "X al Y bedava tipi kampanya oluşturur. Örneğin '2 kutu alana 1 kutu hediye' kampanyası. İskonto PASİF olarak oluşturulur. customer_group_id VEYA customer_id'den biri verilmelidir. İstek kuyruğa alınır ve bir iş ID'si (job_id) döner; sonuç get_discount_job_status ile sorgulanır.",
             "parameters": {
                 "type": "object",
                 "properties": {
@@ -718,6 +746,81 @@ tools_schema = [
                 "required": []
             }
         }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_discount_job_status",
+            "description": "create_discount veya create_bonus_discount ile kuyruğa alınan iskonto/kampanya işinin durumunu getirir (pending, running, succeeded, failed). Kullanıcı iskontonun oluşup oluşmadığını sorduğunda kullanılır.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "job_id": {
+                        "type": "string",
+                        "description": "İskonto oluşturma tool'unun döndürdüğü iş ID'si (örn: 'dj_...')."
+                    }
+                },
+                "required": ["job_id"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "rank_discounts_by_lift",
+            "description": "Aktif iskontoları satış etkisine (iskonto dönemi vs. önceki eşit dönem lift yüzdesi) göre sıralar. 'Hangi iskonto işe yaradı', 'en etkili kampanyalar' gibi sorularda kullanılır.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "metric": {
+                        "type": "string",
+                        "enum": ["quantity", "revenue"],
+                        "description": "Sıralama metriği: 'quantity' (satış adedi) veya 'revenue' (ciro). Varsayılan: quantity"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "Listelenecek iskonto sayısı. Varsayılan: 10"
+                    },
+                    "order": {
+                        "type": "string",
+                        "enum": ["asc", "desc"],
+                        "description": "'desc': en etkili iskontolar, 'asc': en etkisiz iskontolar. Varsayılan: desc"
+                    }
+                },
+                "required": []
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_product_trends",
+            "description": "Tüm ürünlerin satış trendlerini hesaplar: son 7 günün önceki 7 güne (haftalık) ve son 30 günün önceki 30 güne (aylık) göre değişimi, 7/28 günlük hareketli ortalamalar ve düşüş işaretleri. 'Satışı düşen ürünler', 'geçen aya göre azalanlar', 'yükselen ürünler' gibi sorularda kullanılır. Müşteri grubu bazında trend verilemez.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "direction": {
+                        "type": "string",
+                        "enum": ["declining", "rising", "all"],
+                        "description": "'declining': satışı düşen ürünler, 'rising': yükselen ürünler, 'all': hepsi. Varsayılan: declining"
+                    },
+                    "period": {
+                        "type": "string",
+                        "enum": ["wow", "mom"],
+                        "description": "Sıralama dönemi: 'wow' (haftalık) veya 'mom' (aylık) değişim. Varsayılan: mom"
+                    },
+                    "category": {
+                        "type": "string",
+                        "description": "Ürün kategorisi (ürün grubu) filtresi. Opsiyonel."
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "Listelenecek ürün sayısı. Varsayılan: 20"
+                    }
+                },
+                "required": []
+            }
+        }
     }
 ]
 
@@ -736,7 +839,7 @@ available_functions = {
     "get_customer_sales_performance": get_customer_sales_performance,
     "create_bonus_discount": create_bonus_discount,
     "get_cities_districts": get_cities_districts,
+    "get_discount_job_status": get_discount_job_status,
+    "rank_discounts_by_lift": rank_discounts_by_lift,
+    "get_product_trends": get_product_trends,
 }
-
-# Legacy: MOCK_PRODUCTS for /api/products endpoint (will be replaced later)
-MOCK_PRODUCTS = []
@@ -0,0 +1,239 @@
+"""
+NeoBI Turn Router
+Kullanıcı mesajını anahtar kelimelerle sınıflandırıp her run için:
+- sadece ilgili tool alt kümesini seçer ("merhaba" gibi mesajlarda 13 tool'un
+  uzun açıklamaları prompt'a eklenmez)
+- basit sorguları hızlı/ucuz modele, karmaşık ve iskonto akışlarını güçlü modele yönlendirir
+
+Sınıflandırma kasıtlı olarak basit tutulmuştur (model çağrısı yok, mikro saniyeler).
+Emin olunamayan durumlarda tüm tool'lar ve güçlü model kullanılır.
+Route bazlı gecikme ve maliyet metrikleri /api/admin/route-metrics'te görülebilir.
+"""
+
+import os
+import re
+import json
+import logging
+import threading
+from collections import deque
+
+from .tools import tools_schema
+
+logger = logging.getLogger(__name__)
+
+MODEL_ROUTING_ENABLED = os.getenv("NEOBI_MODEL_ROUTING", "true").lower() == "true"
+FAST_MODEL = os.getenv("NEOBI_FAST_MODEL", "gpt-4o-mini")
+STRONG_MODEL = os.getenv("NEOBI_STRONG_MODEL", "gpt-4o")
+# Bu uzunluktan kısa, sadece FAST_CATEGORIES içindeki mesajlar hızlı modele gider
+FAST_MAX_CHARS = int(os.getenv("NEOBI_ROUTER_FAST_MAX_CHARS", "80"))
+# Sadece bu kategorilere giren mesajlar hızlı modele gidebilir
+FAST_CATEGORIES = set(os.getenv("NEOBI_ROUTER_FAST_CATEGORIES", "reference,customers").split(","))
+# Model başına 1M token fiyatı (USD): {"model": [input, output]}
+MODEL_PRICES = json.loads(os.getenv(
+    "NEOBI_MODEL_PRICES", '{"gpt-4o": [2.5, 10.0], "gpt-4o-mini": [0.15, 0.6]}'
+))
+
+# Kategori -> tool isimleri
+TOOL_CATEGORIES = {
+    "analytics": [
+        "search_product", "get_low_selling_products", "get_top_bottom_products",
+        "get_product_sales_distribution", "get_product_groups", "get_customer_groups", "get_product_trends",
+    ],
+    "customers": [
+        "get_customer_sales_performance", "get_customer_count", "get_customer_groups", "get_cities_districts",
+    ],
+    "discounts": [
+        "search_product", "create_discount", "create_bonus_discount", "get_customer_groups",
+        "get_customer_sales_performance", "get_active_discounts", "check_discount_performance",
+        "get_discount_job_status", "rank_discounts_by_lift",
+    ],
+    "reference": [
+        "get_customer_groups", "get_product_groups", "get_cities_districts",
+    ],
+}
+
+# Kategori -> anahtar kelime kökleri (küçük harf, Türkçe)
+CATEGORY_KEYWORDS = {
+    "analytics": ["satış", "satan", "sattı", "ürün", "performans", "grafik", "dağılım", "en çok", "en az",
+                  "düşük", "rapor", "adet", "stok", "excel", "csv", "indir", "aktar",
+                  "trend", "düşen", "düşüş", "azal", "yüksel", "geçen hafta", "geçen ay"],
+    "customers": ["müşteri", "eczane", "ciro", "şehir", "ilçe", "bölge"],
+    "discounts": ["iskonto", "indirim", "kampanya", "bedava", "hediye", "promosyon", "alana", "etki"],
+    "reference": ["grup", "kategori", "liste", "hangi"],
+}
+
+GREETING_PATTERN = re.compile(
+    r"^(merhaba|selam|selamlar|günaydın|iyi günler|iyi akşamlar|teşekkür(ler| ederim)?|sağ ol|sağol|"
+    r"görüşürüz|hoşça kal|nasılsın)[\s!.,?]*$"
+)
+CONFIRMATION_PATTERN = re.compile(
+    r"^(evet|hayır|onaylıyorum|onayla|tamam|olur|peki|iptal|vazgeç|devam|aynen)\b"
+)
+CANCEL_PATTERN = re.compile(r"^(hayır|iptal|vazgeç)")
+
+# Bu tool'lardan biri başarıyla çalıştığında iskonto akışı biter
+DISCOUNT_FLOW_END_TOOLS = ("create_discount", "create_bonus_discount")
+
+# thread_id -> son turn'de seçilen kategoriler (onay mesajları için)
+_last_categories = {}
+# İskonto akışı süren thread'ler. Akış boyunca kategoriler birikir ve güçlü model kullanılır
+_discount_flows = {}
+MAX_TRACKED_THREADS = 1000
+
+_tools_by_name = {t["function"]["name"]: t for t in tools_schema}
+
+
+def normalize(text: str) -> str:
+    """Türkçe büyük harfleri doğru küçültür (İ -> i, I -> ı)."""
+    return text.replace("İ", "i").replace("I", "ı").lower().strip()
+
+
+def classify_message(message: str) -> set:
+    """Mesajın ilgili olduğu tool kategorilerini döndürür. Boş küme: tool gerekmez."""
+    text = normalize(message)
+    if GREETING_PATTERN.match(text):
+        return set()
+    return {category for category, keywords in CATEGORY_KEYWORDS.items() if any(k in text for k in keywords)}
+
+
+class TurnRoute:
+    """Bir turn için seçilen tool alt kümesi ve model; token kullanımı run sırasında eklenir."""
+    __slots__ = ("name", "model", "tools", "categories", "prompt_tokens", "completion_tokens")
+
+    def __init__(self, name: str, model: str, tools, categories: set):
+        self.name = name
+        self.model = model
+        self.tools = tools  # None = tüm tool'lar
+        self.categories = categories
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def add_usage(self, usage):
+        """OpenAI usage nesnesindeki token sayılarını ekler."""
+        if usage is None:
+            return
+        self.prompt_tokens += getattr(usage, "prompt_tokens", 0) or 0
+        self.completion_tokens += getattr(usage, "completion_tokens", 0) or 0
+
+    @property
+    def cost(self) -> float:
+        input_price, output_price = MODEL_PRICES.get(self.model, (0.0, 0.0))
+        return (self.prompt_tokens * input_price + self.completion_tokens * output_price) / 1_000_000
+
+
+def route_turn(thread_id: str, message: str) -> TurnRoute:
+    """Mesajı sınıflandırıp bu turn'ün tool alt kümesini ve modelini seçer."""
+    text = normalize(message)
+    categories = classify_message(message)
+    confirmation = bool(CONFIRMATION_PATTERN.match(text))
+    in_discount_flow = thread_id in _discount_flows
+
+    if in_discount_flow:
+        # İskonto akışı sürerken ara cevaplar (grup, tarih seçimi, onay) akışın tool'larını kaybetmez
+        categories |= _last_categories.get(thread_id, set()) | {"discounts"}
+    elif confirmation:
+        # "evet", "onaylıyorum" gibi cevaplar bir önceki turn'ün akışına devam eder
+        categories |= _last_categories.get(thread_id, set(TOOL_CATEGORIES))
+
+    if not categories and not GREETING_PATTERN.match(text):
+        # Sınıflandırılamadı: tüm tool'lar + güçlü model
+        _remember(thread_id, set(TOOL_CATEGORIES))
+        return TurnRoute("strong", STRONG_MODEL, None, set(TOOL_CATEGORIES))
+
+    if in_discount_flow and CANCEL_PATTERN.match(text):
+        # Kullanıcı vazgeçti; bu turn akışın tool'larıyla cevaplanır, sonraki turn'ler serbest
+        end_discount_flow(thread_id)
+    else:
+        _remember(thread_id, categories)
+        if "discounts" in categories:
+            _track(_discount_flows, thread_id, True)
+    tools = _tools_for(categories)
+    # İskonto akışı sürerken hızlı model seçilmez
+    if not in_discount_flow and _is_simple(text, categories, confirmation):
+        return TurnRoute("fast", FAST_MODEL, tools, categories)
+    return TurnRoute("strong", STRONG_MODEL, tools, categories)
+
+
+def end_discount_flow(thread_id: str):
+    """İskonto oluşturulduğunda veya kullanıcı vazgeçtiğinde thread'in biriken kategorilerini siler."""
+    _discount_flows.pop(thread_id, None)
+    _last_categories.pop(thread_id, None)
+
+
+def _is_simple(text: str, categories: set, confirmation: bool) -> bool:
+    if not MODEL_ROUTING_ENABLED:
+        return False
+    # İskonto akışları (onay mesajları dahil) her zaman güçlü modelde kalır
+    if "discounts" in categories or confirmation:
+        return False
+    if not categories:
+        return True  # selamlaşma
+    return categories <= FAST_CATEGORIES and len(text) <= FAST_MAX_CHARS
+
+
+def _tools_for(categories: set) -> list:
+    names = []
+    for category in sorted(categories):
+        names.extend(n for n in TOOL_CATEGORIES[category] if n not in names)
+    logger.debug("Tool subset for %s: %s (%d tools)", categories or "{}", names, len(names))
+    return [_tools_by_name[n] for n in names]
+
+
+def _remember(thread_id: str, categories: set):
+    _track(_last_categories, thread_id, categories)
+
+
+def _track(store: dict, thread_id: str, value):
+    store.pop(thread_id, None)
+    store[thread_id] = value
+    if len(store) > MAX_TRACKED_THREADS:
+        del store[next(iter(store))]
+
+
+# ==================== METRICS ====================
+
+class RouteMetrics:
+    """Route bazlı turn sayısı, gecikme (p50/p95), token ve maliyet."""
+    WINDOW = 500  # Yüzdelik hesapları için tutulan son gecikme sayısı
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def record(self, route: TurnRoute, latency: float):
+        with self._lock:
+            m = self._routes.setdefault(route.name, {
+                "turns": 0, "latency_total": 0.0, "latencies": deque(maxlen=self.WINDOW),
+                "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0, "models": {},
+            })
+            m["turns"] += 1
+            m["latency_total"] += latency
+            m["latencies"].append(latency)
+            m["prompt_tokens"] += route.prompt_tokens
+            m["completion_tokens"] += route.completion_tokens
+            m["cost_usd"] += route.cost
+            m["models"][route.model] = m["models"].get(route.model, 0) + 1
+        logger.info("Turn routed to %s (%s): %.2fs, %d+%d tokens, $%.5f", route.name, route.model, latency,
+                    route.prompt_tokens, route.completion_tokens, route.cost)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            result = {}
+            for name, m in self._routes.items():
+                latencies = sorted(m["latencies"])
+                result[name] = {
+                    "turns": m["turns"],
+                    "avg_latency_s": round(m["latency_total"] / m["turns"], 3),
+                    "p50_latency_s": round(latencies[len(latencies) // 2], 3),
+                    "p95_latency_s": round(latencies[int(len(latencies) * 0.95)], 3),
+                    "prompt_tokens": m["prompt_tokens"],
+                    "completion_tokens": m["completion_tokens"],
+                    "cost_usd": round(m["cost_usd"], 5),
+                    "avg_cost_usd": round(m["cost_usd"] / m["turns"], 6),
+                    "models": dict(m["models"]),
+                }
+            return result
+
+
+# Singleton instance
+route_metrics = RouteMetrics()
@@ -0,0 +1,126 @@
+"""
+NeoBI Warm-up
+Container başlarken ilk isteklerin ödediği maliyetleri trafik gelmeden önce öder:
+NeoOne login, OpenAI SDK importu + assistant retrieve, müşteri grupları ve satış
+raporu (ürün kataloğu). Görevler paralel çalışır; hepsi başarılı olana kadar
+/readyz 503 döner. Başarısız görevler WARMUP_RETRY_INTERVAL aralıklarla tekrar denenir.
+
+Warm-up arka planda çalışır; /healthz ve static dosyalar bu sırada da sunulur.
+"""
+
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .api_client import neoone_client
+
+logger = logging.getLogger(__name__)
+
+WARMUP_ENABLED = os.getenv("NEOBI_WARMUP", "true").lower() == "true"
+WARMUP_RETRY_INTERVAL = int(os.getenv("NEOBI_WARMUP_RETRY_INTERVAL", "30"))
+
+
+def _neoone_login():
+    neoone_client._get_token()
+
+
+def _start_thread_pool():
+    # OpenAI SDK importu ağır; ilk mesajı bekleyen istek yerine burada yüklenir
+    from .thread_pool import thread_pool
+    thread_pool.start()
+
+
+def _assistant():
+    from .assistant import get_or_create_assistant, EXECUTION_ENGINE
+    _start_thread_pool()
+    if EXECUTION_ENGINE != "chat":
+        get_or_create_assistant()
+
+
+def _customer_groups():
+    from .tools import _get_customer_groups_cached
+    _get_customer_groups_cached()
+
+
+def _sales_report():
+    from .product_catalog import get_product_catalog
+    get_product_catalog()
+
+
+WARMUP_TASKS = {
+    "neoone_login": _neoone_login,
+    "assistant": _assistant,
+    "customer_groups": _customer_groups,
+    "sales_report": _sales_report,
+}
+
+
+class Warmup:
+    """Warm-up görevlerini paralel çalıştırır ve hazır olma durumunu tutar."""
+
+    def __init__(self, tasks: dict = WARMUP_TASKS):
+        self.tasks = tasks
+        self.results = {name: {"ok": False, "error": "pending"} for name in tasks}
+        self.started_at = None
+        self.ready_at = None
+        self._lock = threading.Lock()
+        self._worker = None
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_at is not None
+
+    def start(self):
+        """Warm-up'ı arka plan thread'inde başlatır."""
+        if self._worker is not None:
+            return
+        self.started_at = time.time()
+        if not WARMUP_ENABLED:
+            # Warm-up kapalıysa cache'ler ilk istekte dolar; uygulama hemen hazırdır
+            self.results = {}
+            self.ready_at = self.started_at
+            self._worker = threading.Thread(target=_start_thread_pool, name="neobi-warmup", daemon=True)
+            self._worker.start()
+            return
+        self._worker = threading.Thread(target=self._run, name="neobi-warmup", daemon=True)
+        self._worker.start()
+
+    def status(self) -> dict:
+        with self._lock:
+            checks = {name: dict(result) for name, result in self.results.items()}
+        return {
+            "ready": self.ready,
+            "warmup_seconds": round(self.ready_at - self.started_at, 3) if self.ready else None,
+            "checks": checks,
+        }
+
+    def _run(self):
+        pending = list(self.tasks)
+        with ThreadPoolExecutor(max_workers=len(self.tasks), thread_name_prefix="neobi-warmup") as executor:
+            while pending:
+                list(executor.map(self._run_task, pending))
+                with self._lock:
+                    pending = [name for name in pending if not self.results[name]["ok"]]
+                if pending:
+                    logger.warning("Warm-up incomplete (%s), retrying in %ds", ", ".join(pending), WARMUP_RETRY_INTERVAL)
+                    time.sleep(WARMUP_RETRY_INTERVAL)
+        self.ready_at = time.time()
+        logger.info("Warm-up complete in %.2fs", self.ready_at - self.started_at)
+
+    def _run_task(self, name: str):
+        started = time.perf_counter()
+        try:
+            self.tasks[name]()
+            result = {"ok": True}
+        except Exception as e:
+            logger.warning("Warm-up task %s failed: %s", name, e)
+            result = {"ok": False, "error": str(e)}
+        result["ms"] = round((time.perf_counter() - started) * 1000, 1)
+        with self._lock:
+            self.results[name] = result
+
+
+# Singleton instance
+warmup = Warmup()
@@ -1,18 +1,60 @@
-from fastapi import FastAPI, HTTPException, Header
+from fastapi import FastAPI, HTTPException, Header, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from app.models import StartChatRequest, ChatMessageRequest, ChatResponse
-from app.assistant import create_thread, add_message_to_thread, run_assistant
-from app.tools import MOCK_PRODUCTS
+from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from app.models import StartChatRequest, ChatMessageRequest, ChatResponse, ChatHistoryResponse
+from app.customer_stats import customer_stats
+from app.discount_queue import discount_queue
+from app.sales_history import sales_history
+from app.turn_router import route_turn, route_metrics
+from app.scheduler import turn_scheduler, TurnCancelled, TurnQueueFull
+from app.admission import admission_controller, user_key_for, AdmissionRejected
+from app.product_catalog import get_product_catalog, PRODUCT_FIELDS
+from app import analytics
+from app.tools import _get_active_discounts_cached
+from app.exports import (EXPORT_DATASETS, EXPORT_FORMATS, ExportError, parse_filters, verify_link, open_export,
+                         iter_export, export_filename, check_export_secret)
 from app.api_client import neoone_client
+from app.logging_config import setup_logging, enable_payload_debug, reset_payload_debug
+from app.profiling import SamplingProfiler, save_profile, list_profiles, get_profile_path
+from app.context_manager import context_metrics
+from app.conversation_store import conversation_store
+from app.static_files import StaticBundle
+from app.warmup import warmup
+from app.prefetch import prefetcher, set_scope, reset_scope
+from app.shared_cache import shared_cache
+from contextlib import asynccontextmanager
 from typing import Optional
 import os
+import hmac
+import time
 
-app = FastAPI(title="NeoBI Backend")
+setup_logging()
 
 # Frontend build klasörü (production'da React build dosyaları burada)
 FRONTEND_BUILD_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "../frontend/dist"))
+static_bundle = StaticBundle(FRONTEND_BUILD_PATH) if os.path.exists(FRONTEND_BUILD_PATH) else None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build çıktısını bir kez okuyup gzip/brotli ile sıkıştır
+    if static_bundle is not None:
+        static_bundle.load()
+    # Müşteri sayısı / grup histogramını arka planda güncel tut
+    customer_stats.start()
+    # Kuyruktaki iskonto yazma işlerini NeoOne'a gönder
+    discount_queue.start()
+    # Günlük ürün satış geçmişini (iskonto lift'i / trendler için) doldur ve güncel tut
+    sales_history.start()
+    # NeoOne login, assistant (+ thread havuzu), müşteri grupları ve satış raporunu
+    # paralel ısıt; tamamlanana kadar /readyz 503 döner
+    warmup.start()
+    prefetcher.start()
+    # İmzalı export linkleri tüm worker'larda doğrulanabilmeli
+    check_export_secret()
+    yield
+
+app = FastAPI(title="NeoBI Backend", lifespan=lifespan)
 
 # CORS Configuration
 # Production'da aynı origin olacağı için CORS gereksiz olabilir,
@@ -36,6 +78,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.get("/healthz")
+async def healthz():
+    """Liveness: süreç ayakta ve istek kabul ediyor."""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz(response: Response):
+    """Readiness: warm-up tamamlandı (NeoOne ve OpenAI erişilebilir, cache'ler dolu)."""
+    status = warmup.status()
+    status["upstream"] = neoone_client.resilience_stats()
+    if not status["ready"]:
+        response.status_code = 503
+    return status
+
 def validate_token_if_provided(token: Optional[str], require_token: bool = False) -> bool:
     """
     Token doğrulama helper fonksiyonu.
@@ -53,109 +109,396 @@ def validate_token_if_provided(token: Optional[str], require_token: bool = False
     
     return True
 
+# Admin endpoint'leri ve profiling için anahtar. Tanımlı değilse admin özellikleri kapalıdır.
+ADMIN_KEY = os.getenv("NEOBI_ADMIN_KEY")
+
+def is_admin(admin_key: Optional[str]) -> bool:
+    return bool(ADMIN_KEY and admin_key and hmac.compare_digest(admin_key, ADMIN_KEY))
+
+def require_admin(admin_key: Optional[str]):
+    if not is_admin(admin_key):
+        raise HTTPException(status_code=403, detail="Admin key required")
+
 @app.get("/api/products")
-async def get_products():
+async def get_products(request: Request, response: Response, cursor: Optional[int] = None, limit: int = 50,
+                       category: Optional[str] = None, q: Optional[str] = None, fields: Optional[str] = None,
+                       x_neoone_token: Optional[str] = Header(None)):
+    """
+    Ürün kataloğu (satış raporu snapshot'ından, bkz. app/product_catalog.py).
+    cursor: Önceki yanıttaki next_cursor
+    limit: Sayfa boyutu (en fazla 200)
+    category: Ürün grubu filtresi
+    q: Ürün adı araması
+    fields: Döndürülecek alanlar, virgülle ayrılmış (örn. "id,name")
+    Aynı snapshot için ETag değişmez; If-None-Match eşleşirse 304 döner.
+    """
+    validate_token_if_provided(x_neoone_token, require_token=False)
+    selected_fields = PRODUCT_FIELDS
+    if fields:
+        selected_fields = tuple(f.strip() for f in fields.split(",") if f.strip())
+        unknown = set(selected_fields) - set(PRODUCT_FIELDS)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+
+    catalog = await run_in_threadpool(get_product_catalog)
+    etag = f'W/"{catalog.version}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+
+    items, next_cursor, total = catalog.page(cursor=cursor, limit=max(1, min(limit, 200)), category=category, query=q)
+    response.headers.update(headers)
+    return {
+        "items": [p.to_dict(selected_fields) for p in items],
+        "next_cursor": next_cursor,
+        "total": total,
+        "version": catalog.version,
+        "stale": getattr(catalog.source, "stale", False),
+    }
+
+# ============================================
+# ANALYTICS: LLM'siz dashboard endpoint'leri
+# ============================================
+
+# Analytics yanıtlarının tarayıcıda cache'lenme süresi (saniye)
+ANALYTICS_MAX_AGE = int(os.getenv("NEOBI_ANALYTICS_MAX_AGE", "60"))
+# Satış geçmişi yüklenirken istemcinin tekrar denemesi için önerilen süre (saniye)
+ANALYTICS_RETRY_AFTER = int(os.getenv("NEOBI_ANALYTICS_RETRY_AFTER", "60"))
+
+async def analytics_response(response: Response, token: Optional[str], fn, **kwargs) -> dict:
+    """
+    Tool'larla aynı hesaplamayı (app/analytics.py) çalıştırıp JSON yanıtı oluşturur.
+    fn (result, *sources) döner; kaynaklardan biri NeoOne erişilemezken son başarılı
+    yanıttan geldiyse stale=True döner ve cache'lenmez. Satış geçmişi henüz yükleniyorsa
+    503 + Retry-After döner.
+    """
+    validate_token_if_provided(token, require_token=False)
+    try:
+        result, *sources = await run_in_threadpool(fn, **kwargs)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    if isinstance(result, dict) and result.get("error") == analytics.HISTORY_LOADING:
+        raise HTTPException(status_code=503, detail=result["error"],
+                            headers={"Retry-After": str(ANALYTICS_RETRY_AFTER), "Cache-Control": "no-store"})
+    stale = any(getattr(source, "stale", False) for source in sources)
+    response.headers["Cache-Control"] = "no-store" if stale else f"private, max-age={ANALYTICS_MAX_AGE}"
+    return {"data": result, "stale": stale}
+
+@app.get("/api/analytics/top-products")
+async def analytics_top_products(response: Response, limit: int = 10, order: str = "desc",
+                                 x_neoone_token: Optional[str] = Header(None)):
+    """En çok (order=desc) veya en az (order=asc) satan ürünler (get_top_bottom_products)."""
+    return await analytics_response(response, x_neoone_token, analytics.top_bottom_products,
+                                    limit=max(1, min(limit, 500)), order=order)
+
+@app.get("/api/analytics/low-selling-products")
+async def analytics_low_selling_products(response: Response, threshold: int = 100,
+                                         x_neoone_token: Optional[str] = Header(None)):
+    """Satış adedi eşiğin altındaki ürünler (get_low_selling_products)."""
+    return await analytics_response(response, x_neoone_token, analytics.low_selling_products, threshold=threshold)
+
+@app.get("/api/analytics/customer-counts")
+async def analytics_customer_counts(response: Response, group_by: Optional[str] = None,
+                                    x_neoone_token: Optional[str] = Header(None)):
+    """Toplam ve (group_by=group) grup bazlı müşteri sayıları (get_customer_count)."""
+    return await analytics_response(response, x_neoone_token, analytics.customer_counts, group_by=group_by)
+
+@app.get("/api/analytics/customer-performance")
+async def analytics_customer_performance(response: Response, customer_group_name: Optional[str] = None,
+                                         city: Optional[str] = None, district: Optional[str] = None,
+                                         order_by: str = "revenue_desc", limit: int = 10,
+                                         x_neoone_token: Optional[str] = Header(None)):
+    """Ciroya göre müşteri sıralaması; şehir/ilçe/grup filtreli (get_customer_sales_performance)."""
+    return await analytics_response(response, x_neoone_token, analytics.customer_performance,
+                                    customer_group_name=customer_group_name, city=city, district=district,
+                                    order_by=order_by, limit=max(1, min(limit, 500)))
+
+@app.get("/api/analytics/discount-lift")
+async def analytics_discount_lift(response: Response, metric: str = "quantity", limit: int = 20, order: str = "desc",
+                                  x_neoone_token: Optional[str] = Header(None)):
+    """Aktif iskontoların satış etkisine göre sıralaması (rank_discounts_by_lift)."""
+    def rank(**kwargs):
+        discounts = _get_active_discounts_cached()
+        result, matrix = analytics.rank_discount_lift(list(discounts), **kwargs)
+        return result, matrix, discounts
+    return await analytics_response(response, x_neoone_token, rank, metric=metric,
+                                    limit=max(1, min(limit, 500)), order=order)
+
+@app.get("/api/analytics/product-trends")
+async def analytics_product_trends(response: Response, direction: str = "declining", period: str = "mom",
+                                   category: Optional[str] = None, limit: int = 20,
+                                   x_neoone_token: Optional[str] = Header(None)):
+    """Haftalık/aylık satış değişimi ve düşüş işaretleri (get_product_trends)."""
+    return await analytics_response(response, x_neoone_token, analytics.product_trends, direction=direction,
+                                    period=period, category=category, limit=max(1, min(limit, 500)))
+
+@app.get("/api/exports/{filename}")
+async def download_export(filename: str, request: Request, x_neoone_token: Optional[str] = Header(None)):
     """
-    Returns the current state of products (including live discounts).
+    Ürün / müşteri verisini CSV veya XLSX olarak akış halinde indirir (bkz. app/exports.py).
+    filename: "<dataset>.<format>" (örn. customers.xlsx, low-selling-products.csv)
+    Tool'ların ürettiği imzalı linklerle (expires + sig) veya X-NeoOne-Token ile çağrılır.
+    İkisi de yoksa 401 döner (chat endpoint'lerindeki opsiyonel token burada geçerli değildir).
     """
-    return MOCK_PRODUCTS
+    dataset, _, fmt = filename.rpartition(".")
+    if dataset not in EXPORT_DATASETS or fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=404, detail="Unknown export")
+    try:
+        filters = parse_filters(dataset, request.query_params)
+    except ExportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    sig = request.query_params.get("sig")
+    if sig:
+        if not verify_link(dataset, fmt, filters, request.query_params.get("expires"), sig):
+            raise HTTPException(status_code=403, detail="Invalid or expired export link")
+    else:
+        # Müşteri/satış verisi: imzasız istekler için token zorunlu
+        validate_token_if_provided(x_neoone_token, require_token=True)
+
+    try:
+        header, rows = await run_in_threadpool(open_export, dataset, filters)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    return StreamingResponse(
+        iter_export(fmt, header, rows, sheet_name=dataset),
+        media_type=EXPORT_FORMATS[fmt],
+        headers={
+            "Content-Disposition": f'attachment; filename="{export_filename(dataset, fmt)}"',
+            "Cache-Control": "no-store",
+        },
+    )
 
 @app.post("/api/chat/start")
-async def start_chat(x_neoone_token: Optional[str] = Header(None)):
+async def start_chat(http_request: Request, x_neoone_token: Optional[str] = Header(None)):
     """
     Starts a new chat session (thread).
     x_neoone_token: NeoOne kullanıcı token'ı (embedded modda gönderilir)
+
+    İlk turn'ün ihtiyaç duyacağı veriler arka planda önceden yüklenir (bkz. app/prefetch.py).
     """
     try:
         # Production'da token zorunlu olacak, şimdilik opsiyonel
         # TODO: Canlıya çıkarken require_token=True yap
         validate_token_if_provided(x_neoone_token, require_token=False)
+
+        client_host = http_request.client.host if http_request.client else None
+        prefetcher.request(user_key_for(x_neoone_token, client_host))
         
-        thread = create_thread()
-        return {"thread_id": thread.id}
+        # Thread'i havuzdan al; havuz arka planda yeniden doldurulur
+        # (OpenAI SDK'yı yükleyen modüller static/health isteklerini yavaşlatmasın diye burada import edilir)
+        from app.thread_pool import thread_pool
+        return {"thread_id": await run_in_threadpool(thread_pool.take)}
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/chat/message", response_model=ChatResponse)
-async def send_message(request: ChatMessageRequest, x_neoone_token: Optional[str] = Header(None)):
+async def send_message(request: ChatMessageRequest, response: Response, http_request: Request,
+                       x_neoone_token: Optional[str] = Header(None),
+                       x_neobi_debug: Optional[str] = Header(None),
+                       x_neobi_profile: Optional[str] = Header(None),
+                       x_neobi_admin_key: Optional[str] = Header(None),
+                       profile: bool = False):
     """
     Sends a message to the assistant and gets a response.
     x_neoone_token: NeoOne kullanıcı token'ı (embedded modda gönderilir)
+    x_neobi_debug: "1" ise bu istek için tool/API payload'ları loglanır (admin key gerekir)
+    x_neobi_profile / ?profile=true: Turn'ü profiller (admin key gerekir).
+        Profil ID'si X-NeoBI-Profile-Id header'ında döner.
+
+    Aynı thread'e gelen mesajlar sırayla işlenir. Turn süre sınırını aşarsa 504,
+    thread kuyruğu doluysa 429 döner. Global/kullanıcı bazlı eşzamanlılık limiti
+    aşılırsa 429 + Retry-After döner.
     """
+    # Payload'lar satış/müşteri verisi içerir; sadece admin açabilir
+    debug_token = enable_payload_debug(x_neobi_debug == "1" and is_admin(x_neobi_admin_key))
+    client_host = http_request.client.host if http_request.client else None
+    user_key = user_key_for(x_neoone_token, client_host)
+    # Tool'lar prefetch hit/miss'ini bu kullanıcı için sayar
+    scope_token = set_scope(user_key)
+    profiler = None
+    if (profile or x_neobi_profile == "1") and is_admin(x_neobi_admin_key):
+        profiler = SamplingProfiler()
+    profile_ids = []
+
+    from app.assistant import add_message_to_thread, run_assistant
+
+    def turn(control):
+        # Worker thread'de çalışır; profiler bu thread'i örnekler
+        if profiler is not None:
+            profiler.start()
+        try:
+            add_message_to_thread(request.thread_id, request.message)
+            # Model ve tool alt kümesi seçimi; gecikme/maliyet route bazında kaydedilir
+            route = route_turn(request.thread_id, request.message)
+            started = time.perf_counter()
+            response_text = run_assistant(request.thread_id, control, route=route)
+            route_metrics.record(route, time.perf_counter() - started)
+            return response_text
+        finally:
+            if profiler is not None:
+                profiler.stop()
+                profile_ids.append(save_profile(profiler, label=f"thread={request.thread_id}"))
+
     try:
         # Production'da token zorunlu olacak, şimdilik opsiyonel
         # TODO: Canlıya çıkarken require_token=True yap
         validate_token_if_provided(x_neoone_token, require_token=False)
         
-        add_message_to_thread(request.thread_id, request.message)
-        response_text = run_assistant(request.thread_id)
+        async with admission_controller.slot(user_key):
+            response_text = await turn_scheduler.run(request.thread_id, turn, http_request.is_disconnected)
         return {"response": response_text}
     except HTTPException:
         raise
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail="Sistem şu anda yoğun, lütfen biraz sonra tekrar deneyin.",
+                            headers={"Retry-After": str(e.retry_after)})
+    except TurnQueueFull:
+        raise HTTPException(status_code=429, detail="Bu sohbette işlenmeyi bekleyen çok fazla mesaj var.")
+    except TurnCancelled as e:
+        if e.reason == "deadline":
+            raise HTTPException(status_code=504, detail="İşlem zaman aşımına uğradı.")
+        raise HTTPException(status_code=499, detail="Client disconnected")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        reset_payload_debug(debug_token)
+        reset_scope(scope_token)
+        if profile_ids:
+            response.headers["X-NeoBI-Profile-Id"] = profile_ids[0]
+
+
+@app.get("/api/chat/{thread_id}/history", response_model=ChatHistoryResponse)
+async def get_chat_history(thread_id: str, limit: int = 20, before: Optional[int] = None,
+                           x_neoone_token: Optional[str] = Header(None)):
+    """
+    Sohbet geçmişini yerel transcript'ten sayfalı döndürür (OpenAI'a gitmez).
+    limit: Sayfa boyutu (en fazla 100)
+    before: Önceki yanıttaki next_cursor; daha eski mesajları getirir
+    """
+    validate_token_if_provided(x_neoone_token, require_token=False)
+    messages, next_cursor = conversation_store.get_transcript(thread_id, limit=max(1, min(limit, 100)), before_id=before)
+    return {"messages": messages, "next_cursor": next_cursor}
+
+@app.get("/api/discount-jobs/{job_id}")
+async def get_discount_job(job_id: str, x_neoone_token: Optional[str] = Header(None)):
+    """Kuyruğa alınmış iskonto/kampanya oluşturma işinin durumu."""
+    validate_token_if_provided(x_neoone_token, require_token=False)
+    job = discount_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+# ============================================
+# ADMIN: Turn Profilleri ve Metrikler
+# ============================================
+
+@app.get("/api/admin/profiles")
+async def get_profiles(x_neobi_admin_key: Optional[str] = Header(None)):
+    """Kayıtlı turn profillerini listeler."""
+    require_admin(x_neobi_admin_key)
+    return list_profiles()
+
+@app.get("/api/admin/profiles/{profile_id}")
+async def download_profile(profile_id: str, x_neobi_admin_key: Optional[str] = Header(None)):
+    """Profili collapsed-stack formatında indirir (speedscope / flamegraph.pl ile açılabilir)."""
+    require_admin(x_neobi_admin_key)
+    path = get_profile_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=os.path.basename(path))
+
+@app.get("/api/admin/context-metrics")
+async def get_context_metrics(x_neobi_admin_key: Optional[str] = Header(None)):
+    """Thread bazlı model bağlam boyutları (mesaj, karakter, prompt token)."""
+    require_admin(x_neobi_admin_key)
+    return context_metrics()
+
+@app.get("/api/admin/upstream")
+async def get_upstream_status(x_neobi_admin_key: Optional[str] = Header(None)):
+    """NeoOne endpoint'leri için circuit breaker durumları."""
+    require_admin(x_neobi_admin_key)
+    return neoone_client.resilience_stats()
+
+@app.get("/api/admin/route-metrics")
+async def get_route_metrics(x_neobi_admin_key: Optional[str] = Header(None)):
+    """Hızlı/güçlü model route'ları için turn sayısı, gecikme, token ve maliyet."""
+    require_admin(x_neobi_admin_key)
+    return route_metrics.snapshot()
+
+@app.get("/api/admin/cache")
+async def get_cache_stats(x_neobi_admin_key: Optional[str] = Header(None)):
+    """Paylaşımlı cache backend'i ve hit/miss/yükleme sayaçları."""
+    require_admin(x_neobi_admin_key)
+    return shared_cache.stats()
+
+@app.get("/api/admin/prefetch")
+async def get_prefetch_stats(x_neobi_admin_key: Optional[str] = Header(None)):
+    """Sohbet başında yapılan prefetch'in dataset bazlı hit rate'i ve sayaçları."""
+    require_admin(x_neobi_admin_key)
+    return prefetcher.stats()
 
 
 # ============================================
 # PRODUCTION: React Frontend Static Serving
 # ============================================
 
-# Frontend build varsa static dosyaları mount et
-if os.path.exists(FRONTEND_BUILD_PATH):
-    # Assets klasörünü mount et (JS, CSS, images)
-    assets_path = os.path.join(FRONTEND_BUILD_PATH, "assets")
-    if os.path.exists(assets_path):
-        app.mount("/assets", StaticFiles(directory=assets_path), name="assets")
+# Frontend build varsa static dosyaları bellekten sun (bkz. app/static_files.py)
+if static_bundle is not None:
+    def serve_static(rel_path: str, request: Request):
+        response = static_bundle.response(rel_path, request.headers)
+        if response is None:
+            raise HTTPException(status_code=404)
+        return response
+
+    # Assets klasörü (JS, CSS, images) - hash'li dosya adları, immutable cache
+    @app.get("/assets/{asset_path:path}")
+    async def serve_asset(asset_path: str, request: Request):
+        return serve_static(f"assets/{asset_path}", request)
     
     # Embed script için
     @app.get("/embed.js")
-    async def embed_script():
-        embed_path = os.path.join(FRONTEND_BUILD_PATH, "embed.js")
-        if os.path.exists(embed_path):
-            return FileResponse(embed_path, media_type="application/javascript")
-        raise HTTPException(status_code=404)
+    async def embed_script(request: Request):
+        return serve_static("embed.js", request)
     
     # Diğer static dosyalar için (favicon, manifest vs.)
     @app.get("/favicon.ico")
-    async def favicon():
-        favicon_path = os.path.join(FRONTEND_BUILD_PATH, "favicon.ico")
-        if os.path.exists(favicon_path):
-            return FileResponse(favicon_path)
-        raise HTTPException(status_code=404)
+    async def favicon(request: Request):
+        return serve_static("favicon.ico", request)
     
     @app.get("/neobi-icon.png")
-    async def neobi_icon():
-        icon_path = os.path.join(FRONTEND_BUILD_PATH, "neobi-icon.png")
-        if os.path.exists(icon_path):
-            return FileResponse(icon_path)
-        raise HTTPException(status_code=404)
+    async def neobi_icon(request: Request):
+        return serve_static("neobi-icon.png", request)
     
     # Root path - index.html döndür
     @app.get("/")
-    async def serve_root():
-        index_path = os.path.join(FRONTEND_BUILD_PATH, "index.html")
-        if os.path.exists(index_path):
-            return FileResponse(index_path)
+    async def serve_root(request: Request):
+        if "index.html" in static_bundle:
+            return serve_static("index.html", request)
         return {"message": "NeoBI API is running. Frontend not found - run 'npm run build' in frontend folder."}
     
     # SPA Catch-all Route: API dışındaki tüm istekleri React'a yönlendir
     # Bu en sonda olmalı çünkü tüm path'leri yakalar
     @app.get("/{full_path:path}")
-    async def serve_react_app(full_path: str):
+    async def serve_react_app(full_path: str, request: Request):
         """
         React SPA için catch-all route.
         API endpoint'leri zaten yukarıda tanımlı, onlar öncelikli.
-        Diğer tüm GET istekleri index.html'e yönlendirilir.
+        Build klasöründeki diğer dosyalar (örn. vite.svg) kendisi, diğer tüm GET
+        istekleri index.html olarak döner.
         """
         # API isteklerini 404 döndür (zaten handle edilmiş olmalı)
         if full_path.startswith("api/"):
             raise HTTPException(status_code=404, detail="API endpoint not found")
         
-        index_path = os.path.join(FRONTEND_BUILD_PATH, "index.html")
-        if os.path.exists(index_path):
-            return FileResponse(index_path)
+        if full_path in static_bundle:
+            return serve_static(full_path, request)
+        if "index.html" in static_bundle:
+            return serve_static("index.html", request)
         raise HTTPException(status_code=404, detail="Frontend not built")
 else:
     @app.get("/")
@@ -0,0 +1,101 @@
+import itertools
+import os
+
+import pytest
+
+# assistant modülü import sırasında OpenAI istemcisini oluşturur
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from app import chat_engine
+from app.conversation_store import ConversationStore
+from app.scheduler import TurnCancelled
+
+
+class _CancelAfter:
+    """check() çağrısı sayısı dolunca turn'ü iptal eden TurnControl yerine geçen nesne."""
+
+    reason = "deadline"
+
+    def __init__(self, checks):
+        self.checks = checks
+
+    def check(self):
+        self.checks -= 1
+        if self.checks < 0:
+            raise TurnCancelled(self.reason)
+
+    def is_cancelled(self):
+        return False
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = ConversationStore(str(tmp_path / "conversations.db"))
+    monkeypatch.setattr(chat_engine, "conversation_store", store)
+    monkeypatch.setattr(chat_engine, "execute_tool_call", lambda *args: '{"ok": true}')
+    return store
+
+
+@pytest.fixture
+def tool_calling_model(monkeypatch):
+    ids = itertools.count()
+
+    def stream(*args, **kwargs):
+        calls = [{"id": f"call_{next(ids)}", "type": "function",
+                  "function": {"name": "get_customer_count", "arguments": "{}"}} for _ in range(2)]
+        return None, calls
+    monkeypatch.setattr(chat_engine, "_stream_completion", stream)
+
+
+def _thread(store):
+    thread_id = store.create_thread()
+    store.append(thread_id, {"role": "user", "content": "müşteri sayısı kaç"})
+    return thread_id
+
+
+def _assert_valid_history(messages):
+    assert messages[-1]["role"] == "assistant" and not messages[-1].get("tool_calls")
+    for previous, current in zip(messages, messages[1:]):
+        assert not (previous["role"] == current["role"] == "user")
+    pending = set()
+    for message in messages:
+        if message["role"] == "tool":
+            pending.discard(message["tool_call_id"])
+        else:
+            assert not pending, "tool çağrısının yanıtı eksik"
+            pending = {call["id"] for call in message.get("tool_calls") or ()}
+
+
+def test_cancelled_turn_is_closed_with_assistant_message(store, tool_calling_model):
+    thread_id = _thread(store)
+    # İkinci turun ikinci tool çağrısından önce iptal
+    with pytest.raises(TurnCancelled):
+        chat_engine.run_chat_turn(thread_id, _CancelAfter(3))
+
+    messages = store.get_messages(thread_id)
+    _assert_valid_history(messages)
+    outputs = [m["content"] for m in messages if m["role"] == "tool"]
+    assert outputs.count('{"ok": true}') == 3
+    assert outputs[-1] == chat_engine.INTERRUPTED_TOOL_OUTPUT
+    assert messages[-1]["content"] == chat_engine.INTERRUPTED_REPLY
+
+
+def test_failed_model_call_is_closed_with_assistant_message(store, monkeypatch):
+    def failing_stream(*args, **kwargs):
+        raise RuntimeError("model çağrısı başarısız")
+    monkeypatch.setattr(chat_engine, "_stream_completion", failing_stream)
+    thread_id = _thread(store)
+
+    with pytest.raises(RuntimeError):
+        chat_engine.run_chat_turn(thread_id)
+    assert [m["role"] for m in store.get_messages(thread_id)] == ["user", "assistant"]
+
+
+def test_max_tool_rounds_reply_is_persisted(store, tool_calling_model, monkeypatch):
+    monkeypatch.setattr(chat_engine, "MAX_TOOL_ROUNDS", 2)
+    thread_id = _thread(store)
+
+    reply = chat_engine.run_chat_turn(thread_id)
+    messages = store.get_messages(thread_id)
+    _assert_valid_history(messages)
+    assert messages[-1]["content"] == reply == chat_engine.MAX_TOOL_ROUNDS_REPLY
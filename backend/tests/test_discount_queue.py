@@ -0,0 +1,52 @@
+import pytest
+
+from app.discount_queue import DiscountQueue, set_job_scope, reset_job_scope
+
+
+def _params(end_date="2026-10-26T10:00:00.000Z", start_date="2026-10-19T10:00:00.000Z"):
+    return {"product_id": 7, "customer_group_id": 3, "discount_percent": 10,
+            "start_date": start_date, "end_date": end_date}
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return DiscountQueue(str(tmp_path / "discount_jobs.db"))
+
+
+def _enqueue(queue, params, scope="thread-a"):
+    token = set_job_scope(scope)
+    try:
+        return queue.enqueue("discount", params)
+    finally:
+        reset_job_scope(token)
+
+
+def test_repeated_call_matches_pending_job(queue):
+    first, created = _enqueue(queue, _params())
+    # Model aynı çağrıyı birkaç saniye sonra tekrarlar: başlangıç saati farklı, gün aynı
+    second, created_again = _enqueue(queue, _params(start_date="2026-10-19T10:00:07.000Z",
+                                                    end_date="2026-10-26T10:00:07.000Z"))
+    assert created and not created_again
+    assert second["job_id"] == first["job_id"]
+
+
+def test_different_date_range_is_a_new_job(queue):
+    first, _ = _enqueue(queue, _params())
+    second, created = _enqueue(queue, _params(end_date="2026-11-19T10:00:00.000Z"))
+    assert created
+    assert second["job_id"] != first["job_id"]
+
+
+def test_different_thread_is_a_new_job(queue):
+    first, _ = _enqueue(queue, _params(), scope="thread-a")
+    second, created = _enqueue(queue, _params(), scope="thread-b")
+    assert created
+    assert second["job_id"] != first["job_id"]
+
+
+def test_succeeded_job_is_not_reused(queue):
+    first, _ = _enqueue(queue, _params())
+    queue._finish(first["job_id"], "succeeded", result={"success": True})
+    second, created = _enqueue(queue, _params())
+    assert created
+    assert second["job_id"] != first["job_id"]
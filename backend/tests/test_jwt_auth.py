@@ -0,0 +1,112 @@
+import time
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from app import jwt_auth
+from app.jwt_auth import TokenVerifier
+from app.jwt_stub import StubKeys, _handler
+
+SECRET = "test-secret"
+AUDIENCE = "neobi"
+ISSUER = "https://test.neoone.com.tr"
+
+
+@pytest.fixture(scope="module")
+def stub_keys():
+    return StubKeys(1024)
+
+
+@pytest.fixture(scope="module")
+def jwks_url(stub_keys):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _handler(stub_keys))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/.well-known/jwks.json"
+    server.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def hs256_secret(monkeypatch):
+    # StubKeys.issue HS256 token'larını NEOONE_JWT_SECRET ile imzalar
+    monkeypatch.setenv("NEOONE_JWT_SECRET", SECRET)
+
+
+@pytest.fixture
+def jwks_fetches(monkeypatch):
+    calls = []
+    real_get = jwt_auth.requests.get
+
+    def counting_get(url, **kwargs):
+        calls.append(url)
+        return real_get(url, **kwargs)
+    monkeypatch.setattr(jwt_auth.requests, "get", counting_get)
+    return calls
+
+
+def _claims(**overrides):
+    now = int(time.time())
+    claims = {"sub": "42", "iat": now, "exp": now + 3600, "aud": AUDIENCE, "iss": ISSUER}
+    claims.update(overrides)
+    return {k: v for k, v in claims.items() if v is not None}
+
+
+def _verifier(jwks_url=None):
+    return TokenVerifier(secret=SECRET, jwks_url=jwks_url, jwks_static=None, audience=AUDIENCE, issuer=ISSUER,
+                         leeway=30)
+
+
+def _tamper(token: str) -> str:
+    head, payload, signature = token.split(".")
+    return f"{head}.{payload}.{signature[:-4]}{'AAAA' if signature[-4:] != 'AAAA' else 'BBBB'}"
+
+
+@pytest.mark.parametrize("alg", ["HS256", "RS256"])
+@pytest.mark.parametrize("claims, expected", [
+    (_claims(), True),
+    (_claims(exp=int(time.time()) - 3600), False),
+    (_claims(nbf=int(time.time()) + 3600), False),
+    (_claims(aud="another-app"), False),
+    (_claims(iss="https://evil.example.com"), False),
+], ids=["valid", "expired", "nbf_in_future", "wrong_aud", "wrong_iss"])
+def test_claims(stub_keys, jwks_url, alg, claims, expected):
+    token = stub_keys.issue(claims, alg)
+    assert _verifier(jwks_url).verify(token) is expected
+
+
+@pytest.mark.parametrize("alg", ["HS256", "RS256"])
+def test_tampered_signature(stub_keys, jwks_url, alg):
+    token = stub_keys.issue(_claims(), alg)
+    assert _verifier(jwks_url).verify(_tamper(token)) is False
+
+
+def test_tampered_claims_fail_signature(stub_keys, jwks_url):
+    token = stub_keys.issue(_claims(), "RS256")
+    forged = stub_keys.issue(_claims(sub="1"), "RS256")
+    head, _, signature = token.split(".")
+    assert _verifier(jwks_url).verify(f"{head}.{forged.split('.')[1]}.{signature}") is False
+
+
+def test_unknown_kid_is_undecided(stub_keys, jwks_url, jwks_fetches):
+    verifier = _verifier(jwks_url)
+    assert verifier.verify(stub_keys.issue(_claims(), "RS256")) is True
+
+    other = StubKeys(1024)
+    token = other.issue(_claims(), "RS256")
+    assert verifier.verify(token) is None
+    assert verifier.verify(token) is None
+    # İlk yükleme dışında bilinmeyen kid için hız sınırı içinde tekrar çekilmez
+    assert len(jwks_fetches) == 1
+
+
+def test_jwks_down_fetches_once(stub_keys, jwks_fetches):
+    verifier = _verifier("http://127.0.0.1:9/.well-known/jwks.json")
+    token = stub_keys.issue(_claims(), "RS256")
+    for _ in range(5):
+        assert verifier.verify(token) is None
+    assert len(jwks_fetches) == 1
+
+
+def test_hs256_without_secret_is_undecided(stub_keys, jwks_url):
+    verifier = TokenVerifier(secret=None, jwks_url=jwks_url, jwks_static=None, audience=AUDIENCE, issuer=ISSUER)
+    assert verifier.verify(stub_keys.issue(_claims(), "HS256")) is None
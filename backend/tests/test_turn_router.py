@@ -0,0 +1,52 @@
+from app import turn_router
+from app.turn_router import route_turn, end_discount_flow, STRONG_MODEL
+
+
+def _tool_names(route):
+    return {t["function"]["name"] for t in route.tools}
+
+
+def test_discount_flow_keeps_create_discount_until_confirmation():
+    thread_id = "thread-discount-flow"
+    turns = [
+        "Mustela şampuan için %10 iskonto tanımlamak istiyorum",
+        "Eczaneler grubuna olsun",
+        "evet onaylıyorum",
+    ]
+    for message in turns:
+        route = route_turn(thread_id, message)
+        assert route.model == STRONG_MODEL, message
+        assert "create_discount" in _tool_names(route), message
+    end_discount_flow(thread_id)
+
+
+def test_discount_flow_ends_after_discount_is_created():
+    thread_id = "thread-discount-created"
+    route_turn(thread_id, "Mustela şampuan için %10 iskonto tanımlamak istiyorum")
+    end_discount_flow(thread_id)
+
+    route = route_turn(thread_id, "Eczaneler grubu")
+    assert "discounts" not in route.categories
+    assert "create_discount" not in _tool_names(route)
+
+
+def test_discount_flow_ends_on_cancel():
+    thread_id = "thread-discount-cancel"
+    route_turn(thread_id, "Mustela şampuan için %10 iskonto tanımlamak istiyorum")
+    route = route_turn(thread_id, "vazgeçtim")
+    assert "create_discount" in _tool_names(route)
+    assert thread_id not in turn_router._discount_flows
+
+    route = route_turn(thread_id, "Eczaneler grubu")
+    assert "discounts" not in route.categories
+
+
+def test_no_fast_route_during_discount_flow():
+    thread_id = "thread-discount-fast"
+    route_turn(thread_id, "Bioderma için kampanya yapalım")
+    route = route_turn(thread_id, "müşteri sayısı kaç")
+    assert route.name == "strong"
+    end_discount_flow(thread_id)
+
+    route = route_turn(thread_id, "müşteri sayısı kaç")
+    assert route.name == "fast"